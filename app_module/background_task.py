@@ -0,0 +1,26 @@
+from app_module.qt_modules import *
+
+class BackgroundTask(QThread):
+    """
+    Run a long task (i.e., file ingestion, saving) outside of the GUI thread
+    The task is called as task(*args, progress = callback, **kwargs) when report_progress = True
+    """
+    progress = Signal(int)
+    done = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, task, *args, report_progress : bool = False, parent = None, **kwargs) -> None:
+        super().__init__(parent)
+        self._task = task
+        self._args = args
+        self._kwargs = kwargs
+        if report_progress:
+            self._kwargs["progress"] = self.progress.emit
+
+    def run(self):
+        try:
+            result = self._task(*self._args, **self._kwargs)
+        except Exception as e:
+            self.failed.emit(e.__str__())
+        else:
+            self.done.emit(result)
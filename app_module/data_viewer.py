@@ -8,6 +8,7 @@ from app_module.warehouse_essential.warehouse import (Warehouse,
                                                       VehicleUnit,
                                                       StorageUnit)
 from app_module.support_diaglog import CommonButton
+from app_module.warehouse_essential.renderer import WarehouseRenderer
 import pandas as pd
 
 
@@ -45,6 +46,7 @@ class WarehouseMonitorScreen(QWidget):
         # and plot
         mpl_use("QtAgg")
         self._canvas = MplCanvas(width = 8, height = 6, dpi = 100)
+        self._renderer = WarehouseRenderer(self._canvas.axes)
         
         main_layout = QVBoxLayout()
         main_layout.addWidget(screen_title, alignment = Qt.AlignCenter)
@@ -56,7 +58,15 @@ class WarehouseMonitorScreen(QWidget):
         return self._canvas.axes
     
     def clear_drawing(self):
+        self._renderer.reset()
         self._canvas.clear()
+        self._canvas.draw()
+
+    def render(self, warehouse : Warehouse, heat_display : bool = True, path_display : bool = True) -> str:
+        """
+        Draw a frame of the warehouse, only the changed artists are updated (see WarehouseRenderer)
+        """
+        return self._renderer.render(warehouse, heat_display, path_display)
 
 class OperationInfoView(QHBoxLayout):
     def __init__(self, operation) -> None:
@@ -132,36 +142,36 @@ class WarehouseInfoView(QTabWidget):
         
     def update_storage(self):
         # accessing the warehouse object of the parent widget
-        warehouse_obj : Warehouse = self.parent().__dict__.get("warehouse_obj")
-        storage_list = pd.Series(warehouse_obj.storage.unit_list.index).apply(lambda x : f"Storage Unit ID#{x}").to_list()
+        warehouse_obj : Warehouse = getattr(self.parent(), "warehouse_obj", None)
+        storage_list = [f"Storage Unit ID#{x}" for x in warehouse_obj.storage.ids()]
         self._storage_widget.clear()
         self._storage_widget.addItems(storage_list)
 
     def update_vehicle(self):
         # accessing the warehouse object of the parent widget
-        warehouse_obj : Warehouse = self.parent().__dict__.get("warehouse_obj")
+        warehouse_obj : Warehouse = getattr(self.parent(), "warehouse_obj", None)
         vehicle_list = pd.Series(warehouse_obj.vehicles.unit_list.index).apply(lambda x : f"Vehicle ID#{x}").to_list()
         self._vehicle_widget.clear()
         self._vehicle_widget.addItems(vehicle_list)
 
     def show_storage_detail(self) -> None:
         # accessing the warehouse object of the parent widget
-        warehouse_obj = self.parent().__dict__.get("warehouse_obj")
+        warehouse_obj = getattr(self.parent(), "warehouse_obj", None)
         if not self._storage_widget.currentItem() == None:
             _id = self._storage_widget.currentItem().text().split("ID#")[-1]
             win_name = "Storage Details"
-            unit = warehouse_obj.storage.unit_list["unit"][_id]
+            unit = warehouse_obj.storage.get_unit(_id) # built now if the warehouse was loaded lazily
             detailed_window = self.DetailDialog(unit, win_name)
             detailed_window.exec()
 
     def show_vehicle_detail(self) -> None:
         # accessing the warehouse object of the parent widget
-        warehouse_obj = self.parent().__dict__.get("warehouse_obj")
+        warehouse_obj = getattr(self.parent(), "warehouse_obj", None)
         if not self._vehicle_widget.currentItem() == None:
             _id = self._vehicle_widget.currentItem().text().split("ID#")[-1]
             win_name = "Vehicle Details"
             # Unit
-            warehouse_obj : Warehouse = self.parent().__dict__.get("warehouse_obj")
+            warehouse_obj : Warehouse = getattr(self.parent(), "warehouse_obj", None)
             unit = warehouse_obj.vehicles.unit_list["unit"][_id]
             detailed_window = self.DetailDialog(unit, win_name)
             detailed_window.exec()
@@ -1,6 +1,7 @@
 import pandas as pd
 from datetime import datetime as dt
 from os import makedirs
+from app_module.warehouse_essential.operator_directory import verify_password
 
 DEFAULT_OPERATION_PATH = ".\\Metadata\\OperationData"
 try:
@@ -81,7 +82,7 @@ class Operator():
     def load_operator(self, uid, pwd, file_name = DEFAULT_OPERATION_PATH + "\\employee_data.csv"):
         try:
             employee_df = pd.read_csv(file_name, header = 0, index_col = "user id")
-            if not pwd == employee_df.loc[uid]["password"]:
+            if not verify_password(str(employee_df.loc[uid]["password"]), pwd):
                 raise OperationError("Unauthorized login attempt!!!")
         except KeyError:
             raise OperationError("Unauthorized login attempt!!!")
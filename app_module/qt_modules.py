@@ -2,10 +2,12 @@
 from sys import argv, exit
 from PySide6.QtCore import (Qt, 
                             QSize,
+                            QDate,
                             QCoreApplication, 
                             QAbstractTableModel,
                             QModelIndex,
                             QTimer, 
+                            QThread,
                             Signal, Slot)
 # Widget components
 from PySide6.QtWidgets import (QApplication,
@@ -14,11 +16,12 @@ from PySide6.QtWidgets import (QApplication,
                                QPushButton,
                                QComboBox,
                                QLineEdit, QTextEdit,
+                               QDateEdit,
                                QTabWidget,
                                QToolBar, 
                                QListWidget, 
-                               QDialog, QFileDialog,
-                               QProgressBar,
+                               QDialog, QFileDialog, QInputDialog,
+                               QProgressBar, QProgressDialog,
                                QMessageBox,
                                QTableView,
                                QHeaderView,
@@ -4,8 +4,8 @@ from app_module.warehouse_essential.warehouse import (Warehouse,
                                                     StorageUnit,
                                                     VehicleUnit, 
                                                     DEFAULT_WAREHOUSE_PATH)
+from app_module.warehouse_essential.shift_analytics import ShiftAnalytics
 
-import csv
 import pandas as pd
 
 DEFAULT_DATA_PATH = ".//Metadata//"
@@ -177,6 +177,83 @@ class AddStorageFrom(QDialog):
     def _cancel_pressed(self):
         self.reject()
 
+class AddStorageArrayForm(QDialog):
+    """
+    Form to place an array (rows x columns) of Storage Units at once
+    """
+    def __init__(self, parent = None):
+        super().__init__(parent = parent)
+        self.setWindowTitle("Adding a Storage Array")
+        self.setWindowIcon(QIcon(ICON_PATH + "store--plus.png"))
+        main_layout = QVBoxLayout()
+        # Input parameters
+        form = QFormLayout()
+        self._prefix = QLineEdit("S")
+        self._rows = QLineEdit()
+        self._rows.setValidator(QIntValidator(bottom = 1))
+        self._cols = QLineEdit()
+        self._cols.setValidator(QIntValidator(bottom = 1))
+        self._side = QLineEdit()
+        self._side.setValidator(QDoubleValidator(bottom = 0))
+        self._pitch_x = QLineEdit()
+        self._pitch_x.setValidator(QDoubleValidator(bottom = 0))
+        self._pitch_y = QLineEdit()
+        self._pitch_y.setValidator(QDoubleValidator(bottom = 0))
+        self._cap = QLineEdit()
+        self._cap.setValidator(QDoubleValidator(bottom = 0))
+        self._category = QLineEdit()
+        form.addRow("ID Prefix", self._prefix)
+        form.addRow("Rows", self._rows)
+        form.addRow("Columns", self._cols)
+        form.addRow("Side", self._side)
+        form.addRow("Pitch (x)", self._pitch_x)
+        form.addRow("Pitch (y)", self._pitch_y)
+        form.addRow("Capacity", self._cap)
+        form.addRow("Category", self._category)
+        main_layout.addLayout(form)
+        main_layout.addWidget(QLabel("Center Location of the first unit"))
+        self._x = QLineEdit()
+        self._x.setValidator(QDoubleValidator())
+        self._y = QLineEdit()
+        self._y.setValidator(QDoubleValidator())
+        centroid_ = QHBoxLayout()
+        centroid_.addWidget(QLabel("(x, y) = "), stretch = 7, alignment = Qt.AlignCenter)
+        centroid_.addWidget(QLabel("("), stretch = 1)
+        centroid_.addWidget(self._x, stretch = 3)
+        centroid_.addWidget(QLabel(","), stretch = 1)
+        centroid_.addWidget(self._y, stretch = 3)
+        centroid_.addWidget(QLabel(")"), stretch = 1)
+        main_layout.addLayout(centroid_)
+        # Button
+        buttons = CommonButton(self, "Set", orientation = 1)
+        buttons.ok_btn = self._done_pressed
+        buttons.cancel_btn = self._cancel_pressed
+        main_layout.addWidget(buttons)
+        self.setLayout(main_layout)
+        self._output = None
+
+    def get_output(self):
+        return self._output
+    out = property(fget = get_output)
+    
+    def _done_pressed(self):
+        try:
+            category = self._category.text()
+            self._output = {"origin": (float(self._x.text()), float(self._y.text())),
+                            "pitch": (float(self._pitch_x.text()), float(self._pitch_y.text())),
+                            "rows": int(self._rows.text()),
+                            "cols": int(self._cols.text()),
+                            "side": float(self._side.text()),
+                            "capacity": float(self._cap.text()),
+                            "category": category if not category == "" else "Generic",
+                            "id_prefix": self._prefix.text()}
+            self.accept()
+        except:
+            self.reject()
+    
+    def _cancel_pressed(self):
+        self.reject()
+
 class RemoveStorageFrom(QDialog):
     def __init__(self, parent = None):
         super().__init__(parent)
@@ -187,7 +264,7 @@ class RemoveStorageFrom(QDialog):
         if warehouse_obj == None:
             QMessageBox.warning(self, "Warehouse Warning", "Invalid Warehouse object!!!") # Fail-safe
         try:
-            storage_list = warehouse_obj.storage.unit_list.index.to_list()
+            storage_list = warehouse_obj.storage.ids()
         except:
             storage_list = []
         # Else (continue create a storage list)
@@ -385,6 +462,11 @@ class StorageLoadForm(QDialog):
         self._storage_list = storage_list
         self._form_layout = QVBoxLayout()
         self.add_row()
+        # Commit policy for order files
+        policy_layout = QFormLayout()
+        self._commit_policy = QComboBox()
+        self._commit_policy.addItems(["Commit each chunk", "Commit whole file"])
+        policy_layout.addRow("Order File Policy", self._commit_policy)
         btn_layout = QGridLayout()
         add_row_btn = QPushButton("Add a new Order")
         add_row_btn.clicked.connect(self.add_row)
@@ -402,13 +484,26 @@ class StorageLoadForm(QDialog):
         # Main Layout
         main_layout = QVBoxLayout()
         main_layout.addLayout(self._form_layout)
+        main_layout.addLayout(policy_layout)
         main_layout.addLayout(btn_layout)
         self.setLayout(main_layout)
         self._output = []
+        self._order_file = None
     
     def get_output(self):
         return self._output
     out = property(fget = get_output)
+    def get_order_file(self):
+        """
+        Return the selected order file (None if the orders are manually entered)
+        """
+        return self._order_file
+    order_file = property(fget = get_order_file)
+    def get_commit_policy(self):
+        if self._commit_policy.currentIndex() == 1:
+            return "file"
+        return "chunk"
+    commit_policy = property(fget = get_commit_policy)
     def add_row(self):
         if len(self._row_list) > 10:
             QMessageBox.warning(self, "Addition Limit", "Only 10 row allowed at a time!")
@@ -419,10 +514,11 @@ class StorageLoadForm(QDialog):
     def load_file(self):
         file_dialog = QFileDialog(self)
         filename = file_dialog.getOpenFileName()[0]
-        with open(filename, mode = 'r', newline = "") as file:
-            reader = csv.reader(file)
-            lines = [line for line in reader]
-        self._output = lines
+        if filename == "":
+            return None
+        # The file is streamed into the storage later on (see Warehouse.storage_load_stream)
+        self._order_file = filename
+        self._output = []
         self.accept()
 
     def _done(self):
@@ -469,8 +565,8 @@ class WarehouseSummary(QDialog):
         title.setFont(BOLD_FONT)
         layout_label = QLabel("Layout Shape")
         layout_description = QLabel(warehouse_obj.get_layout(info_type = "description")["description"])
-        max_load = self._monitor_obj.storage.unit_list["unit"].apply(lambda x : x.capacity).sum()
-        current_load = self._monitor_obj.storage.unit_list["unit"].apply(lambda x : x.load).sum()
+        max_load = self._monitor_obj.storage.capacities().sum()
+        current_load = self._monitor_obj.storage.loads().sum()
         load_status_label = QLabel("Loading Status")
         self._load_status = QLabel(str(current_load) + " / " + str(max_load))
         self._load_bar = QProgressBar()
@@ -500,8 +596,8 @@ class WarehouseSummary(QDialog):
         self._timer.timeout.connect(self._update)
     
     def _update(self):
-        max_load = self._monitor_obj.storage.unit_list["unit"].apply(lambda x : x.capacity).sum()
-        current_load = self._monitor_obj.storage.unit_list["unit"].apply(lambda x : x.load).sum()
+        max_load = self._monitor_obj.storage.capacities().sum()
+        current_load = self._monitor_obj.storage.loads().sum()
         self._load_status.setText(str(current_load) + " / " + str(max_load))
         self._load_bar.setValue(int(current_load))
         self.data_table()
@@ -514,11 +610,9 @@ class WarehouseSummary(QDialog):
         self._storage_tab.setSelectionBehavior(QTableView.SelectRows)
         self._storage_tab.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
         # Clean up storage data
-        storage_data : pd.DataFrame = self._monitor_obj.storage.unit_list.copy(deep = True)
-        storage_data["ID"] = storage_data["id"]
-        storage_data["Good Type"] = storage_data["unit"].apply(lambda x : x.category)
-        storage_data["Current Load / Capacity"] = storage_data["unit"].apply(lambda x : str(x.load) + "/" + str(x.capacity))
-        storage_data = storage_data.drop(columns = ["id", "unit"])
+        storage = self._monitor_obj.storage # columns (the lazy units are not built)
+        storage_data = pd.DataFrame({"ID": storage.ids(), "Good Type": storage.categories(),
+                                     "Current Load / Capacity": [f"{load}/{cap}" for load, cap in zip(storage.loads().tolist(), storage.capacities().tolist())]})
         storage_data = self.PandasModel(storage_data)
         self._storage_tab.setModel(storage_data)
         self._storage_tab.show()
@@ -584,4 +678,83 @@ class WarehouseSummary(QDialog):
                     return str(self._dataframe.columns[section])
                 if orientation == Qt.Vertical:
                     return str(self._dataframe.index[section])
-            return None
\ No newline at end of file
+            return None
+
+class ShiftAnalyticsView(QDialog):
+    """
+    Dialog of the shift analytics: hours worked per employee and period, sessions per day
+    """
+    def __init__(self, analytics : ShiftAnalytics, parent : QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._analytics = analytics
+        self.setWindowTitle("Shift Analytics")
+        self.setWindowIcon(QIcon(ICON_PATH + "system-monitor.png"))
+        title = QLabel("SHIFT ANALYTICS")
+        title.setFont(BOLD_FONT)
+        # Query
+        self._analytics.refresh()
+        first_shift = self._analytics.shifts()[:1]["start"].astype("datetime64[s]").astype("datetime64[D]").tolist()
+        self._from_date = QDateEdit(QDate(first_shift[0]) if len(first_shift) > 0 else QDate.currentDate())
+        self._from_date.setCalendarPopup(True)
+        self._to_date = QDateEdit(QDate.currentDate())
+        self._to_date.setCalendarPopup(True)
+        self._view = QComboBox()
+        self._view.addItems(["Hours per Employee", "Sessions per Day"])
+        self._period = QComboBox()
+        self._period.addItems(["Week", "Day", "Month"])
+        form_layout = QFormLayout()
+        form_layout.addRow("From", self._from_date)
+        form_layout.addRow("To", self._to_date)
+        form_layout.addRow("View", self._view)
+        form_layout.addRow("Period", self._period)
+        for widget in (self._from_date, self._to_date):
+            widget.dateChanged.connect(self._update)
+        for widget in (self._view, self._period):
+            widget.currentIndexChanged.connect(self._update)
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self._refresh)
+        # Table
+        self._table = QTableView()
+        self._table.horizontalHeader().setFont(BOLD_FONT)
+        self._table.verticalHeader().setVisible(False)
+        self._table.setSelectionBehavior(QTableView.SelectRows)
+        self._table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self._summary = QLabel()
+        # Main layout
+        main_layout = QVBoxLayout()
+        main_layout.addWidget(title, alignment = Qt.AlignCenter)
+        main_layout.addLayout(form_layout)
+        main_layout.addWidget(refresh_btn)
+        main_layout.addWidget(self._table)
+        main_layout.addWidget(self._summary)
+        self.setLayout(main_layout)
+        self.resize(640, 600)
+        self._update()
+
+    def _refresh(self):
+        """
+        Read the shifts recorded since the last query
+        """
+        try:
+            self._analytics.refresh()
+        except (OSError, ValueError) as e: # unreadable shift records
+            QMessageBox.critical(self, "Shift Analytics Error", f"Unable to read the shift records!!!\n{e}")
+            return None
+        self._update()
+
+    def _update(self):
+        start, end = self._from_date.date().toPython(), self._to_date.date().toPython()
+        self._period.setEnabled(self._view.currentIndex() == 0)
+        if self._view.currentIndex() == 0:
+            result = self._analytics.worked_hours(start, end, self._period.currentText().lower())
+            data = pd.DataFrame({self._period.currentText(): result["period"].astype(str), "Employee ID": result["employee"],
+                                 "Name": result["name"], "Hours": result["hours"].round(2), "Sessions": result["sessions"]})
+        else:
+            result = self._analytics.sessions_per_day(start, end)
+            data = pd.DataFrame({"Day": result["day"].astype(str), "Sessions": result["sessions"],
+                                 "Employees": result["employees"], "Hours": result["hours"].round(2)})
+        self._table.setModel(WarehouseSummary.PandasModel(data))
+        summary = f"{int(result['sessions'].sum())} session(s), {result['hours'].sum():.2f} hour(s)"
+        if self._analytics.malformed > 0:
+            summary += f" ({self._analytics.malformed} malformed record line(s) skipped)"
+        self._summary.setText(summary)
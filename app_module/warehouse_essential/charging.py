@@ -0,0 +1,258 @@
+import heapq
+import numpy as np
+import app_module.warehouse_essential.geometry as geometry
+from app_module.warehouse_essential.vehicle import Vehicles
+from app_module.warehouse_essential.dispatch import Dispatcher, straight_path
+"""
+Charging stations of the warehouse and the scheduler sending the vehicles to charge before their battery runs out
+"""
+class ChargingStation():
+    def __init__(self, id, location : tuple = (0, 0), n_charger : int = 1, spacing : float = 1.5) -> None:
+        '''
+        Charging station with n_charger chargers placed every spacing along x from location\n
+        Every charger keeps its occupant (vehicle id or None) and the estimated time at which it becomes free
+        '''
+        if int(n_charger) < 1:
+            raise ValueError("A charging station needs at least one charger!!!")
+        self._id = id
+        self._location = geometry.Position(location)
+        self._spacing = float(spacing)
+        self._occupant = [None] * int(n_charger)
+        self._free_at = [0.0] * int(n_charger)
+
+    def get_id(self):
+        return self._id
+    id = property(fget = get_id)
+    def get_location(self):
+        return self._location.xy
+    location = property(fget = get_location)
+    def get_n_charger(self):
+        return len(self._occupant)
+    n_charger = property(fget = get_n_charger)
+
+    def charger_location(self, charger : int) -> tuple:
+        x, y = self._location.xy
+        return x + charger * self._spacing, y
+    def free_charger(self):
+        """
+        Index of a charger without occupant (None if all the chargers are taken)
+        """
+        for charger, occupant in enumerate(self._occupant):
+            if occupant == None:
+                return charger
+        return None
+    def next_free(self) -> float:
+        """
+        Estimated time (fleet clock) at which a charger becomes free (0 if a charger is free now)
+        """
+        if not self.free_charger() == None:
+            return 0.0
+        return min(self._free_at)
+    def book(self, charger : int, vehicle_id, until : float):
+        self._occupant[charger] = vehicle_id
+        self._free_at[charger] = until
+    def release(self, charger : int):
+        self._occupant[charger] = None
+        self._free_at[charger] = 0.0
+
+    def unit_info(self):
+        return {"id": self._id, "location": self._location.xy, "n_charger": self.n_charger, "spacing": self._spacing}
+    @classmethod
+    def load_unit(cls, info_dict : dict):
+        return cls(info_dict["id"], info_dict.get("location", (0, 0)), info_dict.get("n_charger", 1), info_dict.get("spacing", 1.5))
+
+    def __repr__(self) -> str:
+        return f"Charging Station ID#{self._id}"
+
+class ChargingScheduler():
+    def __init__(self, vehicles : Vehicles, stations : list, dispatcher : Dispatcher | None = None,
+                 low_level : float = 25, reserve_level : float = 10, full_level : float = 95, speed : float = 1.0, path_resolution : float = 1.0) -> None:
+        '''
+        Keep the vehicles in a min-heap keyed by the predicted time at which their battery falls to low_level:
+            - refresh() re-keys vehicles in O(log n) when their battery/task state changes (the old heap entries are dropped lazily)
+            - schedule() sends the due vehicles to the station where they can start charging the soonest (travel + waiting time),
+              a busy vehicle finishes its task first if its battery still covers the task and the way to the station above reserve_level
+            - without station, the vehicles are sent home (docking location) to charge
+        The vehicles are held (not dispatched) until they are charged up to full_level, speed (m/s) is the travel speed used by the predictions\n
+        A stranded vehicle (empty battery away from a charger) is reported once and left aside until its battery or position changes (i.e., telemetry)
+        '''
+        self._vehicles = vehicles
+        self._stations = stations # shared with the warehouse
+        self._dispatcher = dispatcher
+        self.low_level = low_level
+        self.reserve_level = reserve_level
+        self.full_level = full_level
+        self.speed = speed
+        self.path_resolution = path_resolution
+        self._heap = [] # (deadline, battery, version, vehicle id): among the vehicles due at the same time, the lowest battery first
+        self._version = {} # vehicle id -> version of its valid heap entry
+        self._n_version = 0
+        self._charging = {} # vehicle id -> (station, charger index) or None if sent home
+        self._stranded = {} # vehicle id -> (battery, position) when it was found stranded
+        self.retry = 1.0 # delay (s) before checking again a station whose chargers should already be free
+
+    def get_charging(self):
+        """
+        Vehicles sent to charge: dict of vehicle id -> station id (None if sent home)
+        """
+        return {id: None if booking == None else booking[0].id for id, booking in self._charging.items()}
+    charging = property(fget = get_charging)
+
+    def refresh(self, vehicle_ids):
+        """
+        Re-key the vehicles after a change of their battery or task state (O(log n) per vehicle)
+        """
+        vehicle_ids = [id for id in dict.fromkeys(vehicle_ids) if id in self._vehicles and not id in self._charging and not self._is_stranded(id)]
+        if len(vehicle_ids) == 0:
+            return
+        slots = np.array([self._vehicles.get_unit(id).slot for id in vehicle_ids], dtype = np.int64)
+        deadlines = self._vehicles.energy.depletion_time(self._vehicles.fleet, slots, self.low_level, self.speed)
+        for id, deadline, battery in zip(vehicle_ids, deadlines.tolist(), self._vehicles.fleet.battery[slots].tolist()):
+            self._n_version += 1
+            self._version[id] = self._n_version
+            if deadline < np.inf:
+                heapq.heappush(self._heap, (deadline, battery, self._n_version, id))
+        if len(self._heap) > 4 * max(len(self._version), 16): # too many stale entries
+            self._heap = [entry for entry in self._heap if self._version.get(entry[3], None) == entry[2]]
+            heapq.heapify(self._heap)
+
+    def _state(self, slot : int) -> tuple:
+        fleet = self._vehicles.fleet
+        return float(fleet.battery[slot]), tuple(fleet.pos[slot].tolist())
+
+    def _is_stranded(self, id) -> bool:
+        """
+        True if the vehicle is stranded and did not change since (a changed vehicle is no longer stranded)
+        """
+        if not id in self._stranded:
+            return False
+        if id in self._vehicles and self._stranded[id] == self._state(self._vehicles.get_unit(id).slot):
+            return True
+        del self._stranded[id]
+        return False
+
+    def _strand(self, unit, booking = None):
+        """
+        Set a vehicle aside as stranded: its charger booking and its reservation are released
+        """
+        slot = unit.slot
+        if not booking == None:
+            booking[0].release(booking[1])
+        fleet = self._vehicles.fleet
+        fleet.reserved[slot] = False
+        fleet.charge_point[slot] = np.nan
+        self._stranded[unit.id] = self._state(slot)
+
+    def _pick_station(self, slot : int, now : float):
+        """
+        Station where the vehicle can start charging the soonest: return (station, travel time, start time) or None without station
+        """
+        best = None
+        pos = self._vehicles.fleet.pos[slot]
+        for station in self._stations:
+            travel = np.hypot(*(np.asarray(station.location) - pos)) / self.speed
+            start = max(now + travel, station.next_free())
+            if best == None or start < best[2]:
+                best = (station, travel, start)
+        return best
+
+    def _send(self, unit, target : tuple):
+        fleet, slot = self._vehicles.fleet, unit.slot
+        points = np.array([fleet.pos[slot], target], dtype = np.float64)
+        if np.hypot(*(points[1] - points[0])) > 0:
+            fleet.set_path(slot, straight_path(points, self.path_resolution))
+        else:
+            unit.clear_path()
+
+    def schedule(self) -> list:
+        """
+        Release the charged vehicles and send the due vehicles to charge
+        Return the list of events (vehicle, event type - charge/home/wait/release/stranded, station id or None)
+        """
+        vehicles, fleet = self._vehicles, self._vehicles.fleet
+        now = fleet.clock
+        events = []
+        # Stranded vehicles whose battery or position changed are tracked again
+        changed = [id for id in list(self._stranded.keys()) if not self._is_stranded(id)]
+        # Vehicles which are not yet tracked (i.e., new vehicles)
+        if len(self._version) + len(self._charging) + len(self._stranded) < len(vehicles):
+            changed += [id for id in vehicles.unit_list.index if not id in self._version and not id in self._charging and not id in self._stranded]
+        self.refresh(changed)
+        energy = vehicles.energy
+        # Release the charged vehicles (back to their dock)
+        for id, booking in list(self._charging.items()):
+            if id in vehicles and fleet.battery[vehicles.get_unit(id).slot] < self.full_level:
+                slot = vehicles.get_unit(id).slot
+                if fleet.battery[slot] <= 0 and not energy.at_charger(fleet, [slot])[0]: # ran out on its way to the charger
+                    del self._charging[id]
+                    self._strand(vehicles.get_unit(id), booking)
+                    events.append((vehicles.get_unit(id), "stranded", None if booking == None else booking[0].id))
+                continue
+            del self._charging[id]
+            if not booking == None:
+                booking[0].release(booking[1])
+            if not id in vehicles:
+                continue
+            unit = vehicles.get_unit(id)
+            fleet.reserved[unit.slot] = False
+            fleet.charge_point[unit.slot] = np.nan
+            if not booking == None:
+                self._send(unit, unit.dock_loc)
+            events.append((unit, "release", None if booking == None else booking[0].id))
+            self.refresh([id])
+        # Due vehicles
+        while len(self._heap) > 0 and self._heap[0][0] <= now:
+            _, _, version, id = heapq.heappop(self._heap)
+            if not self._version.get(id, None) == version: # stale entry
+                continue
+            del self._version[id]
+            if not id in vehicles:
+                continue
+            unit = vehicles.get_unit(id)
+            slot = unit.slot
+            if not fleet.active[slot]:
+                continue
+            if fleet.battery[slot] <= 0 and not energy.at_charger(fleet, [slot])[0]: # cannot reach any charger
+                self._strand(unit)
+                events.append((unit, "stranded", None))
+                continue
+            choice = self._pick_station(slot, now)
+            target = unit.dock_loc if choice == None else choice[0].location
+            busy = fleet.path_cursor[slot] < fleet.path_end[slot]
+            if busy and not self._dispatcher == None and not self._dispatcher.get_task(id) == None:
+                # Finish the task first if the battery covers it and the way to the charger
+                path_end = fleet.path_values[fleet.path_end[slot] - 1]
+                needed = energy.predicted_drain(fleet, [slot])[0] + np.hypot(*(np.asarray(target) - path_end)) * energy.drain_rate(fleet, slot)
+                if fleet.battery[slot] - needed >= self.reserve_level:
+                    remaining = fleet.remaining_path_length([slot])[0] / self.speed
+                    self._n_version += 1
+                    self._version[id] = self._n_version
+                    heapq.heappush(self._heap, (now + remaining, float(fleet.battery[slot]), self._n_version, id))
+                    continue
+                self._dispatcher.release(id)
+                unit.clear_path()
+            if choice == None: # no station: charge at home
+                self._send(unit, unit.dock_loc)
+                fleet.reserved[slot] = True
+                self._charging[id] = None
+                events.append((unit, "home", None))
+                continue
+            station, travel, start = choice
+            charger = station.free_charger()
+            if charger == None: # all the chargers are taken: wait (held, not dispatched) and leave just in time
+                fleet.reserved[slot] = True
+                self._n_version += 1
+                self._version[id] = self._n_version
+                heapq.heappush(self._heap, (max(start - travel, now + self.retry), float(fleet.battery[slot]), self._n_version, id))
+                events.append((unit, "wait", station.id))
+                continue
+            arrival_level = fleet.battery[slot] - travel * self.speed * energy.drain_rate(fleet, slot)
+            duration = max(0.0, self.full_level - arrival_level) / max(energy.charge_rate, 1e-9)
+            station.book(charger, id, now + travel + duration)
+            charger_loc = station.charger_location(charger)
+            self._send(unit, charger_loc)
+            fleet.reserved[slot] = True
+            fleet.charge_point[slot] = charger_loc
+            self._charging[id] = (station, charger)
+            events.append((unit, "charge", station.id))
+        return events
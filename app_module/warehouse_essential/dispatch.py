@@ -0,0 +1,226 @@
+import numpy as np
+from app_module.warehouse_essential.storage import Storage
+from app_module.warehouse_essential.vehicle import Vehicles
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError: # optional dependency: the greedy assignment is used instead
+    linear_sum_assignment = None
+"""
+Dispatch of the storage orders (id, action - Load/Unload, amount) to the vehicles as transport tasks
+"""
+TASK_STATUS = ("open", "assigned", "done", "failed")
+OPEN, ASSIGNED, DONE, FAILED = range(4)
+EXACT_LIMIT = 100000 # largest cost matrix (vehicles x tasks) solved exactly (about 20 ms), larger batches use the greedy assignment
+MAX_BATCH = 256 # idle vehicles assigned per round (the others wait for the next round), bounds the cost of a simulation step
+
+def greedy_assignment(cost : np.ndarray):
+    """
+    Greedy assignment on a cost matrix (rows: vehicles, columns: tasks): the pairs are taken cheapest first,
+    skipping the rows and columns already assigned (one sort, no copy of the matrix)
+    Only the k = min(rows, columns) cheapest cells along the longer side are sorted: a row (column) cannot be outbid
+    on more cells than there are other rows (columns)
+    Return (rows, cols) of the assigned pairs
+    """
+    if cost.shape[0] > cost.shape[1]: # more vehicles than tasks: keep the k cheapest vehicles of every task
+        cols, rows = greedy_assignment(cost.T)
+        return rows, cols
+    n_row, n_col = cost.shape
+    k = min(n_row, n_col)
+    if k == 0:
+        return np.zeros(0, dtype = np.int64), np.zeros(0, dtype = np.int64)
+    candidates = np.argpartition(cost, k - 1, axis = 1)[:, :k] if k < n_col else np.broadcast_to(np.arange(n_col), (n_row, n_col))
+    order = np.argsort(np.take_along_axis(cost, candidates, axis = 1), axis = None, kind = "stable")
+    row_free = np.ones(n_row, dtype = bool)
+    col_free = np.ones(n_col, dtype = bool)
+    rows, cols = [], []
+    for row, col in zip((order // k).tolist(), candidates.reshape(-1)[order].tolist()):
+        if row_free[row] and col_free[col]:
+            row_free[row] = col_free[col] = False
+            rows.append(row)
+            cols.append(col)
+            if len(rows) == k:
+                break
+    return np.array(rows, dtype = np.int64), np.array(cols, dtype = np.int64)
+
+def straight_path(points : np.ndarray, resolution : float) -> np.ndarray:
+    """
+    Waypoints along the polyline points (k, 2) spaced by at most resolution (the starting point excluded)
+    """
+    waypoints = []
+    for src, dest in zip(points[:-1], points[1:]):
+        n_step = max(1, int(np.ceil(np.hypot(*(dest - src)) / resolution)))
+        waypoints.append(src + (dest - src) * (np.arange(1, n_step + 1) / n_step)[:, None])
+    return np.concatenate(waypoints)
+
+class Dispatcher():
+    def __init__(self, storage : Storage, vehicles : Vehicles, path_resolution : float = 1.0, exact_limit : int = EXACT_LIMIT, max_batch : int = MAX_BATCH) -> None:
+        '''
+        Turn the storage orders into transport tasks and assign them to the idle vehicles in batches:
+        the cost of a vehicle for a task is the travel from its position to the loading location of the storage unit and back to its dock,
+        the total cost is minimized with the Hungarian algorithm (scipy) or the greedy assignment for large batches,
+        at most max_batch idle vehicles are assigned per round\n
+        The vehicles travel straight lines (waypoints every path_resolution), the order is applied to the storage once the path is finished
+        '''
+        self._storage = storage
+        self._vehicles = vehicles
+        self.path_resolution = path_resolution
+        self.exact_limit = exact_limit
+        self.max_batch = max_batch
+        # Tasks (task id = order of arrival), only the unfinished ones are kept: the cost of a round follows the open tasks, not the history
+        self._tasks = {} # task id -> ((storage id, action, amount), loading location) of the open and assigned tasks
+        self._open_ids = np.zeros(0, dtype = np.int64) # open tasks (queue order)
+        self._open_targets = np.zeros((0, 2), dtype = np.float64) # loading locations of the open tasks
+        self._status = np.zeros(0, dtype = np.int8) # status of every task (one byte per task)
+        self._vehicle_task = {} # vehicle id -> task id
+        self._events = [] # (task id, order, status, message) of the finished tasks not yet collected
+
+    def get_n_open(self):
+        return len(self._open_ids)
+    n_open = property(fget = get_n_open)
+    def get_n_assigned(self):
+        return len(self._vehicle_task)
+    n_assigned = property(fget = get_n_assigned)
+
+    def task_status(self, task_id : int) -> str:
+        return TASK_STATUS[self._status[task_id]]
+
+    def add_orders(self, orders : list):
+        """
+        Queue orders (id, action, amount) as open tasks (the amount has to be a finite, non-negative number)
+        Return (list of task ids, list of errors of the rejected orders)
+        """
+        errors = []
+        accepted = []
+        targets = []
+        for storage_id, action, amount in orders:
+            if not action in ("Load", "Unload"):
+                errors.append(f"Invalid action {action} for the storage unit {storage_id}!!!")
+                continue
+            try:
+                amount = float(amount)
+            except (TypeError, ValueError):
+                amount = np.nan
+            if not np.isfinite(amount) or amount < 0:
+                errors.append(f"Invalid amount for the storage unit {storage_id}!!!")
+                continue
+            try:
+                load_loc = self._storage.load_loc(storage_id)
+            except KeyError:
+                errors.append(f"Storage unit {storage_id} does not exist!!!")
+                continue
+            accepted.append((storage_id, action, amount))
+            targets.append(load_loc)
+        start = len(self._status)
+        task_ids = list(range(start, start + len(accepted)))
+        self._tasks.update(zip(task_ids, zip(accepted, targets)))
+        self._status = np.concatenate([self._status, np.full(len(accepted), OPEN, dtype = np.int8)])
+        self._reopen(task_ids, np.asarray(targets, dtype = np.float64).reshape(-1, 2))
+        return task_ids, errors
+
+    def _reopen(self, task_ids : list, targets : np.ndarray):
+        """
+        Append tasks (and their loading locations) to the open tasks
+        """
+        task_ids = np.asarray(task_ids, dtype = np.int64)
+        self._open_ids = np.concatenate([self._open_ids, task_ids])
+        self._open_targets = np.concatenate([self._open_targets, targets])
+        self._status[task_ids] = OPEN
+
+    def cost_matrix(self, slots : np.ndarray, targets : np.ndarray) -> np.ndarray:
+        """
+        Travel distance of the vehicles (slots) for the tasks (loading locations): position -> loading location -> dock
+        """
+        fleet = self._vehicles.fleet
+        tx, ty = targets.T
+        pos, dock = fleet.pos[slots], fleet.dock[slots]
+        cost = np.hypot(pos[:, 0:1] - tx, pos[:, 1:2] - ty)
+        cost += np.hypot(dock[:, 0:1] - tx, dock[:, 1:2] - ty)
+        return cost
+
+    def idle_vehicles(self) -> list:
+        """
+        Active vehicles with battery, no path, no task and not held by the charging scheduler
+        """
+        fleet = self._vehicles.fleet
+        units = [unit for unit in self._vehicles.units() if not unit.id in self._vehicle_task]
+        slots = np.array([unit.slot for unit in units], dtype = np.int64)
+        if len(slots) == 0:
+            return []
+        idle = fleet.active[slots] & ~fleet.reserved[slots] & (fleet.battery[slots] > 0) & (fleet.path_end[slots] == fleet.path_start[slots])
+        return [unit for unit, is_idle in zip(units, idle.tolist()) if is_idle]
+
+    def assign(self) -> list:
+        """
+        Assign the open tasks to the idle vehicles (one assignment round, at most max_batch vehicles)
+        Return the list of (vehicle id, task id) of the new assignments
+        """
+        task_ids, targets = self._open_ids, self._open_targets
+        units = self.idle_vehicles()[:self.max_batch] if len(task_ids) > 0 else []
+        if len(units) == 0:
+            return []
+        slots = np.array([unit.slot for unit in units], dtype = np.int64)
+        cost = self.cost_matrix(slots, targets)
+        if not linear_sum_assignment == None and cost.size <= self.exact_limit:
+            rows, cols = linear_sum_assignment(cost)
+        else:
+            rows, cols = greedy_assignment(cost)
+        # Paths of the assigned vehicles (set at once)
+        fleet = self._vehicles.fleet
+        paths = [straight_path(np.stack([fleet.pos[slots[r]], targets[c], fleet.dock[slots[r]]]), self.path_resolution)
+                 for r, c in zip(rows.tolist(), cols.tolist())]
+        offsets = np.zeros(len(paths) + 1, dtype = np.int64)
+        offsets[1:] = np.cumsum([len(path) for path in paths])
+        fleet.set_paths(slots[rows], np.concatenate(paths), offsets)
+        self._status[task_ids[cols]] = ASSIGNED
+        still_open = np.ones(len(task_ids), dtype = bool)
+        still_open[cols] = False
+        self._open_ids, self._open_targets = task_ids[still_open], targets[still_open]
+        assignments = [(units[r].id, int(task_ids[c])) for r, c in zip(rows.tolist(), cols.tolist())]
+        self._vehicle_task.update(assignments)
+        return assignments
+
+    def update(self, finished_units : list):
+        """
+        Apply the orders of the vehicles which finished their path (i.e., the result of Vehicles.step)
+        and reopen the tasks of the vehicles which lost their path (removed vehicle, collision, path cleared)
+        """
+        for unit in finished_units:
+            task_id = self._vehicle_task.pop(unit.id, None)
+            if task_id == None:
+                continue
+            order, _ = self._tasks.pop(task_id)
+            success, error_msg, _ = self._storage.change_storage_load([order])
+            self._status[task_id] = DONE if success else FAILED
+            self._events.append((task_id, order, TASK_STATUS[self._status[task_id]], error_msg))
+        fleet = self._vehicles.fleet
+        for vehicle_id, task_id in list(self._vehicle_task.items()):
+            if not vehicle_id in self._vehicles:
+                lost = True
+            else:
+                slot = self._vehicles.get_unit(vehicle_id).slot
+                lost = fleet.path_end[slot] == fleet.path_start[slot]
+            if lost:
+                del self._vehicle_task[vehicle_id]
+                self._reopen([task_id], np.array([self._tasks[task_id][1]], dtype = np.float64))
+
+    def get_task(self, vehicle_id):
+        """
+        Task id carried by a vehicle (None if the vehicle has no task)
+        """
+        return self._vehicle_task.get(vehicle_id, None)
+
+    def release(self, vehicle_id):
+        """
+        Take the task back from a vehicle (i.e., sent to charge) and reopen it
+        """
+        task_id = self._vehicle_task.pop(vehicle_id, None)
+        if not task_id == None:
+            self._reopen([task_id], np.array([self._tasks[task_id][1]], dtype = np.float64))
+
+    def pop_events(self) -> list:
+        """
+        Return (and forget) the finished tasks since the last call: list of (task id, order, status, error message)
+        """
+        events = self._events
+        self._events = []
+        return events
@@ -0,0 +1,96 @@
+import numpy as np
+from app_module.warehouse_essential.fleet import FleetState
+"""
+Battery consumption and charging model of a fleet (battery in %)
+"""
+ENERGY_EVENTS = ("threshold", "insufficient") # battery crossed a threshold, battery cannot cover the remaining path
+
+class EnergyModel():
+    def __init__(self, drain_per_m : float = 0.05, drain_per_load_m : float = 0.0005, idle_drain : float = 0.001,
+                 charge_rate : float = 0.5, dock_tolerance : float = 0.1, thresholds : tuple = (20, 10, 0)) -> None:
+        '''
+        Energy model evaluated for the whole fleet at once:
+            drain_per_m (%/m): drain for every metre travelled
+            drain_per_load_m (%/m per load unit): extra drain for the carried load
+            idle_drain (%/s): drain of the vehicles which neither move nor charge
+            charge_rate (%/s): charge of the vehicles resting at their docking location or their charging station (within dock_tolerance)
+            thresholds (%): battery levels raising a "threshold" event when crossed downward
+        '''
+        self.drain_per_m = float(drain_per_m)
+        self.drain_per_load_m = float(drain_per_load_m)
+        self.idle_drain = float(idle_drain)
+        self.charge_rate = float(charge_rate)
+        self.dock_tolerance = float(dock_tolerance)
+        self.set_thresholds(thresholds)
+
+    def set_thresholds(self, thresholds):
+        self._thresholds = np.sort(np.asarray(thresholds, dtype = np.float64))[::-1]
+    def get_thresholds(self):
+        return tuple(self._thresholds.tolist())
+    thresholds = property(fget = get_thresholds, fset = set_thresholds)
+
+    def drain_rate(self, fleet : FleetState, slots) -> np.ndarray:
+        """
+        Battery drain per metre (%) of the slots with their current load
+        """
+        return self.drain_per_m + self.drain_per_load_m * fleet.load[slots]
+
+    def at_charger(self, fleet : FleetState, slots) -> np.ndarray:
+        """
+        True for the slots standing at their docking location or their charging station
+        """
+        return ((np.hypot(*(fleet.pos[slots] - fleet.dock[slots]).T) <= self.dock_tolerance)
+                | (np.hypot(*(fleet.pos[slots] - fleet.charge_point[slots]).T) <= self.dock_tolerance))
+
+    def depletion_time(self, fleet : FleetState, slots, level : float = 0, speed : float = 1.0) -> np.ndarray:
+        """
+        Predicted time (fleet clock) at which the battery of the slots falls to level
+        The moving vehicles are assumed to travel at speed (m/s), the other ones drain at the idle rate (inf if charging)
+        """
+        slots = np.atleast_1d(np.asarray(slots, dtype = np.int64))
+        has_path = fleet.path_cursor[slots] < fleet.path_end[slots]
+        rate = np.where(has_path, speed * self.drain_rate(fleet, slots), self.idle_drain)
+        rate[~has_path & self.at_charger(fleet, slots)] = 0
+        margin = fleet.battery[slots] - level
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            delay = np.where(rate > 0, margin / rate, np.inf)
+        return fleet.clock + np.where(margin <= 0, 0, delay)
+
+    def predicted_drain(self, fleet : FleetState, slots) -> np.ndarray:
+        """
+        Battery (%) needed by the slots to finish their remaining path
+        """
+        return fleet.remaining_path_length(slots) * self.drain_rate(fleet, slots)
+
+    def update(self, fleet : FleetState, elapsed : float, distance : np.ndarray) -> list:
+        """
+        Apply the drain/charge of elapsed seconds (distance: travelled distance of every slot in this period)
+        Return the list of events (slot, event type, value):
+            (slot, "threshold", threshold) when the battery crosses a threshold downward
+            (slot, "insufficient", needed battery) once per path when the battery cannot cover the remaining path
+        """
+        n = fleet.n
+        active = fleet.active[:n]
+        before = fleet.battery[:n].copy()
+        has_path = fleet.path_cursor[:n] < fleet.path_end[:n]
+        moved = distance[:n] > 0
+        at_dock = ~has_path & ~moved & self.at_charger(fleet, slice(0, n))
+        idle = active & ~moved & ~at_dock
+        change = -distance[:n] * self.drain_rate(fleet, slice(0, n))
+        change[idle] -= self.idle_drain * elapsed
+        change[at_dock] += self.charge_rate * elapsed
+        fleet.battery[:n] = np.clip(before + change, 0, 100)
+        events = []
+        # Threshold crossing (downward)
+        after = fleet.battery[:n]
+        crossed = (before[:, None] > self._thresholds[None, :]) & (after[:, None] <= self._thresholds[None, :])
+        for slot, k in zip(*np.nonzero(crossed)):
+            events.append((int(slot), "threshold", float(self._thresholds[k])))
+        # Remaining path prediction (raised once per path)
+        check = np.flatnonzero(active & has_path & ~fleet.path_warned[:n])
+        if len(check) > 0:
+            needed = self.predicted_drain(fleet, check)
+            short = needed > fleet.battery[check]
+            fleet.path_warned[check[short]] = True
+            events += [(int(slot), "insufficient", float(value)) for slot, value in zip(check[short], needed[short])]
+        return events
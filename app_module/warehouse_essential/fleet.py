@@ -0,0 +1,363 @@
+import numpy as np
+from time import time
+"""
+Struct-of-arrays state of a fleet of vehicles (one slot per vehicle, see unit_index.SlotIndex)
+"""
+DEFAULT_TRAIL_CAPACITY = 256 # number of trail points kept per vehicle (retention window)
+
+class FleetState():
+    def __init__(self, capacity : int = 8, trail_capacity : int = DEFAULT_TRAIL_CAPACITY, trail_min_dist : float = 0) -> None:
+        '''
+        Arrays of the vehicles' state (slot-aligned):
+            pos, dock, size, velo (v, w): (n, 2) float
+            ort, battery, load (carried load), odometer (travelled distance): (n,) float
+            active, path_warned (energy warning already raised for the current path), reserved (held by the charging scheduler): (n,) bool
+            charge_point: (n, 2) float, charging station assigned to the slot (NaN if none)
+        Paths are packed in one ragged buffer: the waypoints of slot i are path_values[path_start[i] : path_end[i]],
+        path_cursor[i] is the next waypoint to visit\n
+        pos_version[i] is the position version of the last move of slot i (see touch_pos, for the redraws)\n
+        Trails are kept in a shared ring buffer trail_buf (n, trail_capacity, 2): only the last trail_capacity points are kept
+        and a point closer than trail_min_dist to the previous recorded point is skipped (decimation)\n
+        A trip is opened when a path is assigned and closed when the path is finished or aborted,
+        the closed trips are passed to trip_sink(slots, rows) if it is set (see trip_log.TripLogger)
+        '''
+        self._n = 0 # number of slots in use
+        self._trail_capacity = max(2, int(trail_capacity))
+        self._trail_min_dist = float(trail_min_dist)
+        self._trail_clock = 0 # source of the trail versions
+        self._pos_clock = 0 # source of the position versions
+        self._dock_clock = 0 # bumped by every change of the docking locations or sizes (see touch_dock)
+        self.clock = time() # simulation clock (s since epoch), advanced by the simulation steps
+        self.trip_sink = None
+        self._alloc(max(1, capacity))
+        self._path_values = np.zeros((64, 2), dtype = np.float64)
+        self._path_used = 0 # used length of the path buffer (including the segments of the replaced paths)
+        self._path_version = 0 # bumped by every change of the path buffer
+        self._path_cumdist = (-1, None) # (path version, cumulative distance along the path buffer)
+
+    def _alloc(self, capacity : int):
+        self.pos = np.zeros((capacity, 2), dtype = np.float64)
+        self.pos_version = np.zeros(capacity, dtype = np.int64) # changed by every move (see touch_pos)
+        self.dock = np.zeros((capacity, 2), dtype = np.float64)
+        self.size = np.ones((capacity, 2), dtype = np.float64)
+        self.velo = np.zeros((capacity, 2), dtype = np.float64)
+        self.ort = np.zeros(capacity, dtype = np.float64)
+        self.battery = np.zeros(capacity, dtype = np.float64)
+        self.load = np.zeros(capacity, dtype = np.float64)
+        self.odometer = np.zeros(capacity, dtype = np.float64)
+        self.active = np.zeros(capacity, dtype = bool)
+        self.path_warned = np.zeros(capacity, dtype = bool)
+        self.reserved = np.zeros(capacity, dtype = bool)
+        self.charge_point = np.full((capacity, 2), np.nan, dtype = np.float64)
+        self.path_start = np.zeros(capacity, dtype = np.int64)
+        self.path_end = np.zeros(capacity, dtype = np.int64)
+        self.path_cursor = np.zeros(capacity, dtype = np.int64)
+        self.trip_open = np.zeros(capacity, dtype = bool)
+        self.trip_start_time = np.zeros(capacity, dtype = np.float64)
+        self.trip_start_battery = np.zeros(capacity, dtype = np.float64)
+        self.trip_start_odometer = np.zeros(capacity, dtype = np.float64)
+        self.trip_waypoints = np.zeros(capacity, dtype = np.int64)
+        self.trail_buf = np.zeros((capacity, self._trail_capacity, 2), dtype = np.float64)
+        self.trail_head = np.zeros(capacity, dtype = np.int64) # next write position in the ring
+        self.trail_len = np.zeros(capacity, dtype = np.int64)
+        self.trail_version = np.zeros(capacity, dtype = np.int64) # changed by every change of the trail (for the cached lines)
+
+    _SLOT_FIELDS = ("pos", "pos_version", "dock", "size", "velo", "ort", "battery", "load", "odometer", "active", "path_warned", "reserved", "charge_point", "path_start", "path_end", "path_cursor",
+                    "trip_open", "trip_start_time", "trip_start_battery", "trip_start_odometer", "trip_waypoints",
+                    "trail_buf", "trail_head", "trail_len", "trail_version")
+
+    def get_n(self):
+        return self._n
+    n = property(fget = get_n)
+    path_values = property(fget = lambda self: self._path_values)
+    trail_capacity = property(fget = lambda self: self._trail_capacity)
+    trail_min_dist = property(fget = lambda self: self._trail_min_dist)
+    pos_clock = property(fget = lambda self: self._pos_clock) # version of the last move of any slot
+    trail_clock = property(fget = lambda self: self._trail_clock) # version of the last change of any trail
+    dock_clock = property(fget = lambda self: self._dock_clock) # version of the last change of any docking footprint
+
+    def touch_pos(self, slots):
+        """
+        Mark the positions of the slots as changed (to be called by every writer of pos)
+        """
+        self._pos_clock += 1
+        self.pos_version[slots] = self._pos_clock
+
+    def touch_dock(self):
+        """
+        Mark the docking footprints as changed (to be called by every writer of dock or size)
+        """
+        self._dock_clock += 1
+
+    def reserve(self, n_slot : int):
+        """
+        Make sure the arrays can hold n_slot slots (amortized growth)
+        """
+        capacity = len(self.pos)
+        if n_slot > capacity:
+            new_capacity = max(n_slot, 2 * capacity)
+            old = {field: getattr(self, field) for field in self._SLOT_FIELDS}
+            self._alloc(new_capacity)
+            for field, values in old.items():
+                getattr(self, field)[:capacity] = values
+        self._n = max(self._n, n_slot)
+
+    def init_slot(self, slot : int, pos, dock, size, battery, ort = 0, velo = (0, 0), active = True):
+        self.reserve(slot + 1)
+        self.pos[slot] = pos
+        self.touch_pos(slot)
+        self.dock[slot] = dock
+        self.size[slot] = size
+        self.touch_dock()
+        self.velo[slot] = velo
+        self.ort[slot] = ort
+        self.battery[slot] = battery
+        self.load[slot] = 0
+        self.odometer[slot] = 0
+        self.active[slot] = active
+        self.reserved[slot] = False
+        self.charge_point[slot] = np.nan
+        self.trip_open[slot] = False
+        self.clear_path(slot)
+        self.clear_trail(slot)
+
+    def copy_slot(self, other, other_slot : int, slot : int):
+        """
+        Copy the state of a slot of another fleet (including the remaining path and the trail)
+        """
+        self.init_slot(slot, other.pos[other_slot], other.dock[other_slot], other.size[other_slot], other.battery[other_slot],
+                       other.ort[other_slot], other.velo[other_slot], other.active[other_slot])
+        self.load[slot] = other.load[other_slot]
+        self.odometer[slot] = other.odometer[other_slot]
+        visited = other.path_cursor[other_slot] - other.path_start[other_slot]
+        points = other._path_values[other.path_start[other_slot]:other.path_end[other_slot]]
+        if len(points) > 0:
+            self.set_path(slot, points)
+            self.path_cursor[slot] += visited
+            self.path_warned[slot] = other.path_warned[other_slot]
+            for field in ("trip_open", "trip_start_time", "trip_start_battery", "trip_start_odometer", "trip_waypoints"):
+                getattr(self, field)[slot] = getattr(other, field)[other_slot]
+        trail = other.trail_points(other_slot)[-self._trail_capacity:]
+        self.trail_buf[slot, :len(trail)] = trail
+        self.trail_head[slot] = len(trail) % self._trail_capacity
+        self.trail_len[slot] = len(trail)
+
+    # Path buffer
+    def _append_values(self, values : np.ndarray) -> int:
+        """
+        Append waypoints to the path buffer and return their start offset
+        """
+        k = len(values)
+        if self._path_used + k > len(self._path_values):
+            self._compact_paths(extra = k)
+        start = self._path_used
+        self._path_values[start:start + k] = values
+        self._path_used += k
+        self._path_version += 1
+        return start
+
+    def _compact_paths(self, extra : int = 0):
+        """
+        Drop the waypoints of replaced/finished paths (and grow the buffer if needed)
+        """
+        n = self._n
+        lengths = self.path_end[:n] - self.path_start[:n]
+        live = int(lengths.sum())
+        capacity = len(self._path_values)
+        if live + extra > capacity // 2:
+            capacity = max(2 * (live + extra), 64)
+        new_values = np.zeros((capacity, 2), dtype = np.float64)
+        has_path = np.flatnonzero(lengths > 0)
+        new_start = np.zeros(n, dtype = np.int64)
+        new_start[has_path] = np.cumsum(lengths[has_path]) - lengths[has_path]
+        if live > 0:
+            src = np.repeat(self.path_start[has_path] - new_start[has_path], lengths[has_path]) + np.arange(live)
+            new_values[:live] = self._path_values[src]
+        self.path_cursor[:n] += new_start - self.path_start[:n]
+        self.path_start[:n] = new_start
+        self.path_end[:n] = new_start + lengths
+        self._path_values = new_values
+        self._path_used = live
+        self._path_version += 1
+
+    def set_path(self, slot : int, points):
+        """
+        Assign the waypoints (k, 2) to a slot (replace the current path)
+        """
+        points = np.asarray(points, dtype = np.float64).reshape(-1, 2)
+        self.end_trips(slot, completed = False) # the replaced path is aborted
+        self.path_start[slot] = self.path_end[slot] = self.path_cursor[slot] = 0 # release the old segment first
+        start = self._append_values(points)
+        self.path_start[slot] = self.path_cursor[slot] = start
+        self.path_end[slot] = start + len(points)
+        self.path_warned[slot] = False
+        self._open_trips(slot)
+
+    def set_paths(self, slots : np.ndarray, values : np.ndarray, offsets : np.ndarray):
+        """
+        Assign many paths at once, path i (for slots[i]) is values[offsets[i] : offsets[i + 1]]
+        """
+        slots = np.asarray(slots, dtype = np.int64)
+        offsets = np.asarray(offsets, dtype = np.int64)
+        self.end_trips(slots, completed = False)
+        self.path_start[slots] = self.path_end[slots] = self.path_cursor[slots] = 0
+        start = self._append_values(np.asarray(values, dtype = np.float64).reshape(-1, 2))
+        self.path_start[slots] = self.path_cursor[slots] = start + offsets[:-1]
+        self.path_end[slots] = start + offsets[1:]
+        self.path_warned[slots] = False
+        self._open_trips(slots)
+
+    def clear_path(self, slots):
+        self.path_start[slots] = self.path_end[slots] = self.path_cursor[slots] = 0
+        self.path_warned[slots] = False
+
+    # Trips
+    def _open_trips(self, slots):
+        slots = np.atleast_1d(np.asarray(slots, dtype = np.int64))
+        slots = slots[self.path_end[slots] > self.path_start[slots]]
+        self.trip_open[slots] = True
+        self.trip_start_time[slots] = self.clock
+        self.trip_start_battery[slots] = self.battery[slots]
+        self.trip_start_odometer[slots] = self.odometer[slots]
+        self.trip_waypoints[slots] = self.path_end[slots] - self.path_start[slots]
+
+    def end_trips(self, slots, completed : bool, collision : bool = False) -> tuple:
+        """
+        Close the open trips of the slots (call before the paths are cleared)
+        Return (slots, rows) of the closed trips, rows: dict of column -> array (see trip_log.TRIP_COLUMNS)
+        """
+        slots = np.atleast_1d(np.asarray(slots, dtype = np.int64))
+        slots = slots[self.trip_open[slots]]
+        rows = {"start_time": self.trip_start_time[slots], "end_time": np.full(len(slots), self.clock),
+                "distance": self.odometer[slots] - self.trip_start_odometer[slots], "waypoints": self.trip_waypoints[slots],
+                "battery_delta": self.battery[slots] - self.trip_start_battery[slots],
+                "completed": np.full(len(slots), completed), "collision": np.full(len(slots), collision)}
+        self.trip_open[slots] = False
+        if len(slots) > 0 and not self.trip_sink == None:
+            self.trip_sink(slots, rows)
+        return slots, rows
+
+    def path_points(self, slot : int) -> np.ndarray:
+        """
+        Remaining waypoints of a slot
+        """
+        return self._path_values[self.path_cursor[slot]:self.path_end[slot]].copy()
+
+    def path_length(self, slot : int) -> float:
+        """
+        Length of the whole current path of a slot
+        """
+        points = self._path_values[self.path_start[slot]:self.path_end[slot]]
+        if len(points) < 2:
+            return 0.0
+        return float(np.hypot(*np.diff(points, axis = 0).T).sum())
+
+    def remaining_path_length(self, slots) -> np.ndarray:
+        """
+        Distance left to travel along the current path of the slots (from the current position)
+        """
+        slots = np.atleast_1d(np.asarray(slots, dtype = np.int64))
+        remaining = np.zeros(len(slots), dtype = np.float64)
+        cursor, end = self.path_cursor[slots], self.path_end[slots]
+        moving = cursor < end
+        if not moving.any():
+            return remaining
+        version, cumdist = self._path_cumdist
+        if not version == self._path_version: # cumulative distance over the whole buffer (the jumps between paths cancel out)
+            steps = np.hypot(*np.diff(self._path_values[:self._path_used], axis = 0).T)
+            cumdist = np.concatenate([[0.0], np.cumsum(steps)])
+            self._path_cumdist = (self._path_version, cumdist)
+        slots, cursor, end = slots[moving], cursor[moving], end[moving]
+        to_next = np.hypot(*(self._path_values[cursor] - self.pos[slots]).T)
+        remaining[moving] = to_next + cumdist[end - 1] - cumdist[cursor]
+        return remaining
+
+    # Trail ring buffer
+    def _next_trail_version(self, count : int = 1):
+        self._trail_clock += count
+        return np.arange(self._trail_clock - count + 1, self._trail_clock + 1)
+
+    def record_trail(self, slots):
+        """
+        Append the current position of the slots to their trail (before they move)
+        The position is skipped if it is closer than trail_min_dist to the last recorded point
+        """
+        slots = np.atleast_1d(np.asarray(slots, dtype = np.int64))
+        if len(slots) == 0:
+            return
+        cap = self._trail_capacity
+        pos = self.pos[slots]
+        if self._trail_min_dist > 0:
+            last = self.trail_buf[slots, (self.trail_head[slots] - 1) % cap]
+            far = (self.trail_len[slots] == 0) | (np.hypot(*(pos - last).T) >= self._trail_min_dist)
+            slots, pos = slots[far], pos[far]
+        head = self.trail_head[slots]
+        self.trail_buf[slots, head] = pos
+        self.trail_head[slots] = (head + 1) % cap
+        self.trail_len[slots] = np.minimum(self.trail_len[slots] + 1, cap)
+        self.trail_version[slots] = self._next_trail_version(len(slots))
+
+    def clear_trail(self, slots):
+        slots = np.atleast_1d(np.asarray(slots, dtype = np.int64))
+        self.trail_len[slots] = 0
+        self.trail_head[slots] = 0
+        self.trail_version[slots] = self._next_trail_version(len(slots))
+
+    def trail_points(self, slot : int) -> np.ndarray:
+        """
+        Recorded positions of a slot, oldest first (current position excluded)
+        """
+        length = self.trail_len[slot]
+        order = (self.trail_head[slot] - length + np.arange(length)) % self._trail_capacity
+        return self.trail_buf[slot, order]
+
+    def configure_trail(self, capacity : int | None = None, min_dist : float | None = None):
+        """
+        Change the retention window (number of points) and/or the decimation distance of the trails
+        The most recent points are kept when the window shrinks
+        """
+        if not min_dist == None:
+            self._trail_min_dist = float(min_dist)
+        if capacity == None or max(2, int(capacity)) == self._trail_capacity:
+            return
+        capacity = max(2, int(capacity))
+        n = self._n
+        trails = [self.trail_points(slot)[-capacity:] for slot in range(n)]
+        self._trail_capacity = capacity
+        self.trail_buf = np.zeros((len(self.pos), capacity, 2), dtype = np.float64)
+        for slot, trail in enumerate(trails):
+            self.trail_buf[slot, :len(trail)] = trail
+            self.trail_len[slot] = len(trail)
+        self.trail_head[:n] = self.trail_len[:n] % capacity
+        self.trail_version[:n] = self._next_trail_version(n)
+
+    def step(self) -> np.ndarray:
+        """
+        Advance every active vehicle (with remaining battery) to its next waypoint at once
+        Return the slots of the vehicles which finished their path (their path is cleared)
+        """
+        n = self._n
+        cursor = self.path_cursor[:n]
+        has_path = self.path_end[:n] > self.path_start[:n]
+        moving = np.flatnonzero(self.active[:n] & (self.battery[:n] > 0) & (cursor < self.path_end[:n]))
+        finished = np.flatnonzero(has_path & (cursor >= self.path_end[:n]))
+        self.record_trail(moving)
+        self.odometer[moving] += np.hypot(*(self._path_values[cursor[moving]] - self.pos[moving]).T)
+        self.pos[moving] = self._path_values[cursor[moving]]
+        if len(moving) > 0:
+            self.touch_pos(moving)
+        cursor[moving] += 1
+        self.end_trips(finished, completed = True)
+        self.clear_path(finished)
+        self.clear_trail(finished) # the trail is cleared after the path is finished
+        return finished
+
+    def compact(self, keep : np.ndarray):
+        """
+        Reorder the slots after SlotIndex.compact() (keep: former slots of the alive vehicles)
+        """
+        for field in self._SLOT_FIELDS:
+            values = getattr(self, field)
+            values[:len(keep)] = values[keep]
+        self._n = len(keep)
+        self.touch_dock()
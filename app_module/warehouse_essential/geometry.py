@@ -1,5 +1,6 @@
 import numpy as np
-from shapely import Point, Polygon, plotting, affinity, LineString
+import shapely
+from shapely import Point, Polygon, plotting, affinity, LineString, STRtree
 # import pandas as pd
 # from matplotlib import pyplot as plt
 import matplotlib as mpl
@@ -24,6 +25,14 @@ class Position(): # 2D-Plane only
             self._pos = Point(xy_tuple)
             return None
         # End of __init__()
+    @classmethod
+    def from_point(cls, point : Point):
+        """
+        Quick constructor from an existing shapely Point (i.e., created in bulk by shapely.points)
+        """
+        pos = cls.__new__(cls)
+        pos._pos = point
+        return pos
     # Point-type expression
     def get_pos(self):
         return self._pos
@@ -340,6 +349,19 @@ class Rectangle(PolygonShape):
         rec = cls(l_val, w_val, ref, buffer, ref_pt_type = ref_pt_type)
         return rec
 
+    @classmethod
+    def from_polygon(cls, polygon : Polygon, size : tuple, ref, ref_pt_type = "center", buffer = 0):
+        """
+        Quick constructor from a prebuilt polygon (see box_polygons), the size is assumed to be already validated
+        """
+        rec = cls.__new__(cls)
+        rec._ref = ref if isinstance(ref, Position) else Position(ref)
+        rec._polygon = polygon
+        rec._buffer_size = buffer
+        rec._ref_pt_type = ref_pt_type
+        rec._size = size
+        return rec
+
     def _is_defined(self):
         try:
             if not self.__dict__.get("_polygon", None):
@@ -390,6 +412,45 @@ class Square(Rectangle):
         rec = cls(s_val, ref, buffer, ref_pt_type = ref_pt_type)
         return rec
         
+def box_polygons(centers : np.ndarray, sizes : np.ndarray) -> np.ndarray:
+    """
+    Build the (axis-aligned) rectangle polygons of n centers and n sizes (length, width) at once
+    Same corner order as Rectangle (lower-left corner first, counter-clockwise)
+    """
+    centers = np.asarray(centers, dtype = np.float64).reshape(-1, 2)
+    half = np.asarray(sizes, dtype = np.float64).reshape(-1, 2) / 2
+    corners = np.stack([centers - half,
+                        centers + half * (1, -1),
+                        centers + half,
+                        centers + half * (-1, 1)], axis = 1)
+    return shapely.polygons(corners)
+
+def batch_conflicts(new_geoms : np.ndarray, existing_geoms = None):
+    """
+    Indexed (STR-tree) intersection check of a batch of geometries
+    Return (hit_existing, earlier) where
+        hit_existing: boolean array, True if the new geometry intersects any of the existing geometries
+        earlier: dict of index -> array of indices of the earlier geometries (in the batch) intersecting it
+    """
+    new_geoms = np.asarray(new_geoms, dtype = object)
+    hit_existing = np.zeros(len(new_geoms), dtype = bool)
+    if not existing_geoms is None and len(existing_geoms) > 0:
+        tree = STRtree(np.asarray(existing_geoms, dtype = object))
+        hit_idx, _ = tree.query(new_geoms, predicate = "intersects")
+        hit_existing[hit_idx] = True
+    earlier = {}
+    if len(new_geoms) > 1:
+        tree = STRtree(new_geoms)
+        idx, other = tree.query(new_geoms, predicate = "intersects")
+        mask = other < idx # only the earlier geometries (and not itself)
+        idx, other = idx[mask], other[mask]
+        if len(idx) > 0:
+            order = np.argsort(idx, kind = "stable")
+            idx, other = idx[order], other[order]
+            keys, starts = np.unique(idx, return_index = True)
+            earlier = dict(zip(keys.tolist(), np.split(other, starts[1:])))
+    return hit_existing, earlier
+
 class GeometryException(Exception):
     def __init__(self, *args: object) -> None:
         super().__init__(*args)
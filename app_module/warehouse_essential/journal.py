@@ -0,0 +1,288 @@
+import json
+import numpy as np
+from os import path as os_path, makedirs, listdir, remove, fsync
+from threading import Thread, Lock, Event
+from time import monotonic
+import app_module.warehouse_essential.geometry as geometry
+from app_module.warehouse_essential.warehouse import Warehouse, DEFAULT_WAREHOUSE_PATH
+from app_module.warehouse_essential.storage import Storage
+from app_module.warehouse_essential.charging import ChargingStation
+from app_module.warehouse_essential.snapshot import write_snapshot, read_snapshot, HEADER_FILE
+"""
+Autosave journal of a warehouse: every change is appended to a log, the log is compacted into a full snapshot in the background
+"""
+DEFAULT_JOURNAL_PATH = DEFAULT_WAREHOUSE_PATH + "\\journal"
+SNAPSHOT_DIR = "snapshot"
+SEGMENT_PREFIX = "journal."
+SEGMENT_SUFFIX = ".ndjson"
+CLEAN_FILE = "clean" # written by close(): the journal holds nothing to recover
+
+def _segment_name(base_seq : int) -> str:
+    return f"{SEGMENT_PREFIX}{base_seq:012d}{SEGMENT_SUFFIX}"
+
+def _segments(directory) -> list:
+    """
+    Journal segments of a directory in order: list of (base sequence number, filename)
+    """
+    if not os_path.isdir(directory):
+        return []
+    names = [name for name in listdir(directory) if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)]
+    return sorted((int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]), os_path.join(directory, name)) for name in names)
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def apply_change(warehouse : Warehouse, operation : str, payload):
+    """
+    Replay one journal record on a warehouse (see Warehouse.change_sink for the operations)
+    """
+    if operation == "layout":
+        warehouse.layout = None if payload == None else geometry.Rectangle.from_dict(payload)
+    elif operation == "add_station":
+        warehouse.add_charging_station(ChargingStation.load_unit(payload))
+    elif operation == "remove_station":
+        warehouse.remove_charging_station(payload)
+    elif operation == "path":
+        if payload["id"] in warehouse.vehicles:
+            warehouse.vehicles.get_unit(payload["id"]).set_path(payload["points"])
+    elif operation == "storage.add":
+        warehouse.storage.load_info(payload) # the units were validated when they were added
+    elif operation == "storage.remove":
+        warehouse.storage.remove_units(payload)
+    elif operation == "storage.load":
+        storage : Storage = warehouse.storage
+        for id, load in zip(payload["ids"], payload["loads"]):
+            if id in storage:
+                storage.get_unit(id).set_load(load)
+    elif operation == "storage.clear":
+        warehouse.storage.clear_all()
+    elif operation == "vehicle.add":
+        warehouse.vehicles.load_info(payload)
+    elif operation == "vehicle.remove":
+        warehouse.vehicles.remove_units(payload)
+    elif operation == "vehicle.clear":
+        warehouse.vehicles.clear_all()
+    else:
+        raise ValueError(f"Unknown journal operation {operation}!!!")
+    if operation.startswith(("storage.", "vehicle.")) and not operation == "storage.load":
+        warehouse.update_placement_occupied_zone()
+
+class WarehouseJournal():
+    def __init__(self, directory = DEFAULT_JOURNAL_PATH, fsync_interval : float = 1.0, compact_records : int = 10000, compact_interval : float = 600.0) -> None:
+        '''
+        Append every change of the attached warehouse as one JSON line (sequence number, operation, payload) to the current journal segment:
+            fsync_interval (s): the segment is flushed to the disk at most fsync_interval after a change (the cost follows the changes, not the warehouse size)
+            compact_records, compact_interval (s): a full snapshot is written on a background thread after this many records or this long
+            (and when the layout changes), the segments covered by the snapshot are then deleted
+        The state is captured on the thread of the change (see Warehouse.capture_data), the records are built and written by the compactor
+        Recovery (see recover) loads the last snapshot and replays the journal tail
+        (the moves of the vehicles are not journaled: they are recovered as of the last snapshot, on their assigned path)
+        '''
+        self._directory = directory
+        self.fsync_interval = fsync_interval
+        self.compact_records = compact_records
+        self.compact_interval = compact_interval
+        self._warehouse = None
+        self._lock = Lock() # held while writing/rotating the segment and counting the records (the flusher thread syncs it too)
+        self._compact_lock = Lock() # one compaction started at a time (changes come from the GUI and the worker threads)
+        self._file = None
+        self._seq = 0
+        self._n_since_compact = 0
+        self._last_compact = monotonic()
+        self._dirty = False
+        self._compactor = None
+        self._error = None # last error of the background threads
+        self._stop = Event()
+        self._flusher = None
+
+    def get_directory(self):
+        return self._directory
+    directory = property(fget = get_directory)
+    def get_seq(self):
+        """
+        Sequence number of the last record
+        """
+        return self._seq
+    seq = property(fget = get_seq)
+    def get_error(self):
+        return self._error
+    error = property(fget = get_error)
+
+    def attach(self, warehouse : Warehouse, wait : bool = False):
+        """
+        Journal the changes of a warehouse, a full snapshot of its current state is taken first (base of the recovery)
+        """
+        if not self._warehouse == None:
+            self._warehouse.change_sink = None
+        makedirs(self._directory, exist_ok = True)
+        if os_path.exists(os_path.join(self._directory, CLEAN_FILE)):
+            remove(os_path.join(self._directory, CLEAN_FILE))
+        self._seq = max([self._seq] + [self._last_seq(filename) for _, filename in _segments(self._directory)])
+        self._warehouse = warehouse
+        warehouse.change_sink = self.record
+        self.compact(wait, force = True) # the snapshot of the new warehouse is the base of the recovery
+        if self._flusher == None:
+            self._stop.clear()
+            self._flusher = Thread(target = self._flush_loop, daemon = True)
+            self._flusher.start()
+
+    def record(self, operation : str, payload):
+        """
+        Append one change (the warehouse change sink)
+        """
+        with self._lock:
+            self._seq += 1
+            line = json.dumps({"seq": self._seq, "op": operation, "data": payload}, default = _json_value)
+            self._file.write(line + "\n")
+            self._dirty = True
+            self._n_since_compact += 1
+            due = (operation == "layout" or self._n_since_compact >= self.compact_records
+                   or monotonic() - self._last_compact >= self.compact_interval)
+        if due:
+            self.compact(force = operation == "layout")
+
+    def sync(self):
+        """
+        Flush the current segment to the disk
+        """
+        with self._lock:
+            if not self._file == None and self._dirty:
+                self._file.flush()
+                fsync(self._file.fileno())
+                self._dirty = False
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.sync()
+            except (OSError, ValueError) as e:
+                self._error = e
+
+    def compact(self, wait : bool = False, force : bool = False):
+        """
+        Capture the warehouse, start a new segment and write the snapshot on a background thread
+        (skipped while the previous compaction is still running, unless wait or force: the previous one is joined first)
+            force: the snapshot is a new base of the recovery (attached warehouse, layout change), it is never skipped
+        """
+        with self._compact_lock:
+            if not self._compactor == None and self._compactor.is_alive():
+                if not (wait or force):
+                    return
+                self._compactor.join()
+            warehouse = self._warehouse
+            with self._lock: # the capture matches the sequence number of the new segment
+                capture, state, paths = warehouse.capture_data(), warehouse.vehicle_state(), self._capture_paths(warehouse)
+                seq = self._seq
+                if not self._file == None:
+                    self._file.flush()
+                    fsync(self._file.fileno())
+                    self._file.close()
+                self._file = open(os_path.join(self._directory, _segment_name(seq)), mode = "a")
+                self._dirty = False
+                self._n_since_compact = 0
+                self._last_compact = monotonic()
+            self._compactor = Thread(target = self._write_snapshot, args = (capture, state, paths, seq), daemon = True)
+            self._compactor.start()
+        if wait:
+            self._compactor.join()
+
+    @staticmethod
+    def _capture_paths(warehouse : Warehouse) -> tuple:
+        """
+        Remaining paths of the vehicles as array copies (ids, cursors, ends, path buffer), see _vehicle_paths
+        """
+        fleet = warehouse.vehicles.fleet
+        units = warehouse.vehicles.units()
+        slots = np.array([unit.slot for unit in units], dtype = np.int64)
+        moving = fleet.path_cursor[slots] < fleet.path_end[slots]
+        return ([unit.id for unit, keep in zip(units, moving.tolist()) if keep], fleet.path_cursor[slots[moving]], fleet.path_end[slots[moving]],
+                fleet.path_values[:int(fleet.path_end[slots[moving]].max(initial = 0))].copy())
+
+    @staticmethod
+    def _vehicle_paths(paths : tuple) -> dict:
+        ids, cursors, ends, values = paths
+        return {id: values[cursor:end].tolist() for id, cursor, end in zip(ids, cursors.tolist(), ends.tolist())}
+
+    def _write_snapshot(self, capture : dict, state : dict, paths : tuple, seq : int):
+        try:
+            info = dict(capture, storage = Storage.captured_info(capture["storage"]))
+            write_snapshot(info, os_path.join(self._directory, SNAPSHOT_DIR), state, {"seq": seq, "paths": self._vehicle_paths(paths)})
+        except OSError as e:
+            self._error = e
+            return
+        current = _segment_name(seq)
+        for _, filename in _segments(self._directory): # covered by the snapshot
+            if os_path.basename(filename) < current:
+                remove(filename)
+
+    def close(self):
+        """
+        Stop journaling (i.e., the warehouse was saved on exit): the journal is marked clean, nothing is left to recover
+        """
+        if not self._warehouse == None:
+            self._warehouse.change_sink = None
+            self._warehouse = None
+        if not self._compactor == None:
+            self._compactor.join()
+        self._stop.set()
+        if not self._flusher == None:
+            self._flusher.join()
+            self._flusher = None
+        self.sync()
+        with self._lock:
+            if not self._file == None:
+                self._file.close()
+                self._file = None
+        makedirs(self._directory, exist_ok = True)
+        open(os_path.join(self._directory, CLEAN_FILE), mode = "w").close()
+
+    @staticmethod
+    def _last_seq(filename) -> int:
+        seq = 0
+        for record in WarehouseJournal._read_segment(filename):
+            seq = record["seq"]
+        return seq
+
+    @staticmethod
+    def _read_segment(filename):
+        """
+        Records of a segment, a torn last line (crash during a write) ends the segment
+        """
+        with open(filename, mode = "r") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    return
+                yield record
+
+    @staticmethod
+    def need_recovery(directory = DEFAULT_JOURNAL_PATH) -> bool:
+        """
+        True if the journal was not closed (i.e., crash) and holds a snapshot to recover from
+        """
+        return (os_path.exists(os_path.join(directory, SNAPSHOT_DIR, HEADER_FILE))
+                and not os_path.exists(os_path.join(directory, CLEAN_FILE)))
+
+    @staticmethod
+    def recover(directory = DEFAULT_JOURNAL_PATH) -> Warehouse:
+        """
+        Rebuild the warehouse of a journal: load the last snapshot and replay the records written after it
+        """
+        snapshot_dir = os_path.join(directory, SNAPSHOT_DIR)
+        header, _ = read_snapshot(snapshot_dir)
+        extra = header.get("extra", {})
+        warehouse = Warehouse.load_snapshot(snapshot_dir, mmap = False) # the snapshot files are replaced by the next compaction
+        for id, points in extra.get("paths", {}).items():
+            if id in warehouse.vehicles:
+                warehouse.vehicles.get_unit(id).set_path(points)
+        snapshot_seq = extra.get("seq", 0)
+        for _, filename in _segments(directory):
+            for record in WarehouseJournal._read_segment(filename):
+                if record["seq"] > snapshot_seq:
+                    apply_change(warehouse, record["op"], record["data"])
+        return warehouse
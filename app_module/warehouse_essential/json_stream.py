@@ -0,0 +1,142 @@
+import json
+from json.decoder import WHITESPACE
+"""
+Streaming reader/writer of the warehouse JSON file ({"layout": ..., "storage": [...], "vehicle": [...], "charging_station": [...]})
+The unit lists are written and read one record at a time, the whole file is never held in memory
+"""
+UNIT_SECTIONS = ("storage", "vehicle", "charging_station") # lists streamed record by record
+READ_BLOCK = 1 << 20 # characters read at once
+WRITE_BATCH = 1000 # records joined per write
+UNIT_CHUNK_SIZE = 10000 # records per chunk of the bulk loaders (a parsed record takes a few kB)
+
+def write_warehouse_json(file, sections : dict):
+    """
+    Write the sections (key -> value, the unit sections may be any iterable of records, i.e., generator) to an open text file
+    The output is the same as json.dump of the equivalent dict (the old readers open it as well)
+    """
+    file.write("{")
+    for k, (key, value) in enumerate(sections.items()):
+        file.write(("" if k == 0 else ", ") + json.dumps(key) + ": ")
+        if not key in UNIT_SECTIONS:
+            file.write(json.dumps(value))
+            continue
+        file.write("[")
+        batch, first = [], True
+        for record in value:
+            batch.append(json.dumps(record))
+            if len(batch) >= WRITE_BATCH:
+                file.write(("" if first else ", ") + ", ".join(batch))
+                batch, first = [], False
+        if len(batch) > 0:
+            file.write(("" if first else ", ") + ", ".join(batch))
+        file.write("]")
+    file.write("}")
+
+class _Reader():
+    def __init__(self, file, block_size : int) -> None:
+        '''
+        Incremental JSON tokenizer over a text file: the values are decoded by json.JSONDecoder.raw_decode from a sliding buffer
+        '''
+        self._file = file
+        self._block_size = block_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        block = self._file.read(self._block_size)
+        if block == "":
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + block # drop the consumed part
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Next non-whitespace character ("" at the end of the file)
+        """
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char : str):
+        if not self.peek() == char:
+            raise ValueError(f"Invalid warehouse file: '{char}' expected at character {self._pos}!!!")
+        self._pos += 1
+
+    def value(self):
+        """
+        Decode the next JSON value (read more of the file while the value is incomplete)
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            if end == len(self._buffer) and self._fill(): # a number may continue in the next block
+                continue
+            self._pos = end
+            return value
+
+def iter_warehouse_json(filename, block_size : int = READ_BLOCK):
+    """
+    Parse a warehouse JSON file incrementally
+    Yield (key, value) for the sections and (key, record) for each record of the unit sections
+    Raise ValueError (json.JSONDecodeError) for a malformed file
+    """
+    with open(filename, mode = "r") as file:
+        reader = _Reader(file, block_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value()
+            if not isinstance(key, str):
+                raise ValueError("Invalid warehouse file: section name expected!!!")
+            reader.expect(":")
+            if key in UNIT_SECTIONS:
+                reader.expect("[")
+                if reader.peek() == "]":
+                    reader.expect("]")
+                else:
+                    while True:
+                        yield key, reader.value()
+                        if reader.peek() == ",":
+                            reader.expect(",")
+                        else:
+                            reader.expect("]")
+                            break
+            else:
+                yield key, reader.value()
+            if reader.peek() == ",":
+                reader.expect(",")
+            else:
+                reader.expect("}")
+                return
+
+def iter_warehouse_chunks(filename, chunk_size : int, block_size : int = READ_BLOCK):
+    """
+    Group the records of iter_warehouse_json: yield (key, value) for the other sections and (key, list of at most chunk_size records) for the unit sections
+    """
+    key, chunk = None, []
+    for section, value in iter_warehouse_json(filename, block_size):
+        if len(chunk) > 0 and (not section == key or len(chunk) >= chunk_size):
+            yield key, chunk
+            chunk = []
+        if section in UNIT_SECTIONS:
+            key = section
+            chunk.append(value)
+        else:
+            yield section, value
+    if len(chunk) > 0:
+        yield key, chunk
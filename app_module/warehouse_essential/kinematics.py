@@ -0,0 +1,135 @@
+import numpy as np
+from app_module.warehouse_essential.fleet import FleetState
+"""
+Fixed-timestep kinematic integration of a whole fleet (unicycle/differential-drive model, pure-pursuit path tracking)
+"""
+def wrap_angle(angle):
+    """
+    Map angle values (array) to -pi to pi
+    """
+    return np.arctan2(np.sin(angle), np.cos(angle))
+
+class KinematicEngine():
+    def __init__(self, dt : float = 0.05, v_max : float = 1.0, w_max : float = 1.5, a_max : float = 0.5, alpha_max : float = 3.0,
+                 lookahead : float = 1.0, goal_tolerance : float = 0.05, wheel_base : float | None = None) -> None:
+        '''
+        Integrate the motion of every vehicle of a FleetState at once with fixed sub-steps of dt (s):
+            v_max (m/s), w_max (rad/s): velocity limits
+            a_max (m/s^2), alpha_max (rad/s^2): acceleration limits
+            lookahead (m): waypoints closer than the lookahead distance are passed (pure pursuit)
+            goal_tolerance (m): distance to the last waypoint at which the path is finished
+            wheel_base (m): if given, the differential-drive model is used (v_max is the limit of each wheel)
+        '''
+        if dt <= 0:
+            raise ValueError("Time step must be positive!!!")
+        self._dt = float(dt)
+        self.v_max = float(v_max)
+        self.w_max = float(w_max)
+        self.a_max = float(a_max)
+        self.alpha_max = float(alpha_max)
+        self.lookahead = float(lookahead)
+        self.goal_tolerance = float(goal_tolerance)
+        self.wheel_base = wheel_base
+        self._sim_time = 0.0 # simulated time (s)
+        self._remainder = 0.0 # time left from the previous call (shorter than dt)
+
+    def get_dt(self):
+        return self._dt
+    dt = property(fget = get_dt)
+    def get_sim_time(self):
+        return self._sim_time
+    sim_time = property(fget = get_sim_time)
+
+    def _advance_targets(self, fleet : FleetState, slots : np.ndarray):
+        """
+        Pure pursuit: pass the waypoints within the lookahead distance (the last waypoint is kept as target)
+        The position is recorded into the trail every time a waypoint is passed
+        """
+        cursor, end, values = fleet.path_cursor, fleet.path_end, fleet.path_values
+        while len(slots) > 0:
+            dist = np.hypot(*(values[cursor[slots]] - fleet.pos[slots]).T)
+            slots = slots[(dist < self.lookahead) & (cursor[slots] < end[slots] - 1)]
+            fleet.record_trail(slots)
+            cursor[slots] += 1
+
+    def _command(self, fleet : FleetState, slots : np.ndarray):
+        """
+        Desired (v, w) of the slots tracking their target waypoint
+        """
+        values, end = fleet.path_values, fleet.path_end
+        delta = values[fleet.path_cursor[slots]] - fleet.pos[slots]
+        dist = np.hypot(*delta.T)
+        alpha = wrap_angle(np.arctan2(delta[:, 1], delta[:, 0]) - fleet.ort[slots]) # heading error
+        goal_dist = np.hypot(*(values[end[slots] - 1] - fleet.pos[slots]).T)
+        v_ref = np.minimum(self.v_max, np.sqrt(2 * self.a_max * goal_dist)) # brake before the goal
+        v = v_ref * np.clip(np.cos(alpha), 0, None) # slow down when turning
+        curvature = 2 * np.sin(alpha) / np.maximum(dist, 1e-9)
+        w = v_ref * curvature
+        turn = np.abs(alpha) >= np.pi / 2 # target aside or behind: turn on the spot
+        w[turn] = np.sign(alpha[turn]) * self.w_max
+        return v, np.clip(w, -self.w_max, self.w_max)
+
+    def _limit_wheels(self, v : np.ndarray, w : np.ndarray):
+        """
+        Differential drive: scale (v, w) down so that both wheel speeds stay within v_max
+        """
+        wheel = np.maximum(np.abs(v - w * self.wheel_base / 2), np.abs(v + w * self.wheel_base / 2))
+        scale = np.where(wheel > self.v_max, self.v_max / np.maximum(wheel, 1e-9), 1)
+        return v * scale, w * scale
+
+    def substep(self, fleet : FleetState) -> np.ndarray:
+        """
+        Integrate one time step dt for the whole fleet
+        Return the slots of the vehicles which finished their path (their path and trail are cleared)
+        """
+        dt, n = self._dt, fleet.n
+        fleet.clock += dt
+        active = fleet.active[:n]
+        tracking = np.flatnonzero(active & (fleet.battery[:n] > 0) & (fleet.path_cursor[:n] < fleet.path_end[:n])) # empty vehicles brake to a stop
+        self._advance_targets(fleet, tracking)
+        # Finish the paths of the vehicles which reached their last waypoint
+        if len(tracking) > 0:
+            goal_dist = np.hypot(*(fleet.path_values[fleet.path_end[tracking] - 1] - fleet.pos[tracking]).T)
+            arrived = tracking[goal_dist <= self.goal_tolerance]
+            tracking = tracking[goal_dist > self.goal_tolerance]
+        else:
+            arrived = tracking
+        v_cmd = np.zeros(n)
+        w_cmd = np.zeros(n)
+        v_cmd[tracking], w_cmd[tracking] = self._command(fleet, tracking)
+        # Acceleration limits (the vehicles without path brake to a stop)
+        velo = fleet.velo[:n]
+        velo[:, 0] += np.clip(v_cmd - velo[:, 0], -self.a_max * dt, self.a_max * dt)
+        velo[:, 1] += np.clip(w_cmd - velo[:, 1], -self.alpha_max * dt, self.alpha_max * dt)
+        if not self.wheel_base == None:
+            velo[:, 0], velo[:, 1] = self._limit_wheels(velo[:, 0], velo[:, 1])
+        velo[~active] = 0 # inactive vehicles (i.e., collision) stop at once
+        velo[arrived] = 0
+        # Unicycle integration (midpoint heading)
+        heading = fleet.ort[:n] + velo[:, 1] * dt / 2
+        fleet.pos[:n, 0] += velo[:, 0] * np.cos(heading) * dt
+        fleet.pos[:n, 1] += velo[:, 0] * np.sin(heading) * dt
+        moving = np.flatnonzero(~(velo[:, 0] == 0))
+        if len(moving) > 0:
+            fleet.touch_pos(moving)
+        fleet.ort[:n] = wrap_angle(fleet.ort[:n] + velo[:, 1] * dt)
+        fleet.odometer[:n] += np.abs(velo[:, 0]) * dt
+        # Finished paths
+        fleet.end_trips(arrived, completed = True)
+        fleet.clear_path(arrived)
+        fleet.clear_trail(arrived)
+        self._sim_time += dt
+        return arrived
+
+    def integrate(self, fleet : FleetState, duration : float) -> np.ndarray:
+        """
+        Advance the fleet by duration (s) with fixed sub-steps of dt, the time shorter than dt is carried to the next call
+        Return the slots of the vehicles which finished their path
+        """
+        self._remainder += duration
+        n_step = int(np.floor(self._remainder / self._dt + 1e-9))
+        self._remainder = max(0.0, self._remainder - n_step * self._dt)
+        finished = [self.substep(fleet) for _ in range(n_step)]
+        if len(finished) == 0:
+            return np.zeros(0, dtype = np.int64)
+        return np.unique(np.concatenate(finished))
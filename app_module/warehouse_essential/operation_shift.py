@@ -1,6 +1,7 @@
-import pandas as pd
 from datetime import datetime as dt
 from os import makedirs
+from app_module.warehouse_essential.operator_directory import get_operator_directory
+from app_module.warehouse_essential.shift_log import ShiftRecordWriter
 
 DEFAULT_OPERATION_PATH = ".\\Metadata\\OperationData"
 try:
@@ -14,6 +15,7 @@ class Operation():
         if Operation.cnt > 0:
             raise OperationError("Only one Operation object is allowed at a time!!!")
         self._operator = None
+        self._shift_log = ShiftRecordWriter(DEFAULT_OPERATION_PATH) # one file per month
         Operation.cnt += 1
 
     def operator_login(self, uid, pwd):
@@ -34,18 +36,8 @@ class Operation():
             raise OperationError("No operator detected! Invalid operation!!!")
         self._end_time = dt.now()
         # Recording the info of the operator working on the shift
-        dic = {"employee id": self._operator._employee_id,
-                                "name": [" ".join([self._operator._firstname, self._operator._lastname])],
-                                "start": self._start_time.strftime("%Y-%m-%d %H:%M:%S"),
-                                "end": self._end_time.strftime("%Y-%m-%d %H:%M:%S"),
-                                "time eslapse": (self._end_time - self._start_time).seconds}
-        try:
-            df = pd.read_csv(DEFAULT_OPERATION_PATH + "\\operation_records.csv") # Try to verify if the file exists or not
-        except FileNotFoundError:
-            df = pd.DataFrame(dic)
-            df.to_csv(DEFAULT_OPERATION_PATH + "\\operation_records.csv", header = True, index = False)
-        else:
-            pd.DataFrame(dic).to_csv(DEFAULT_OPERATION_PATH + "\\operation_records.csv", mode = 'a', header = False, index = False)
+        self._shift_log.write(self._operator._employee_id, " ".join([self._operator._firstname, self._operator._lastname]),
+                              self._start_time, self._end_time)
 
     def __del__(self):
         Operation.cnt -= 1
@@ -79,17 +71,18 @@ class Operator():
     position = property(fget = lambda self : self._position)
 
     def load_operator(self, uid, pwd, file_name = DEFAULT_OPERATION_PATH + "\\employee_data.csv"):
+        """
+        Employee info of the user from the shared operator directory (the employee file is only parsed again when it changes)
+        """
         try:
-            employee_df = pd.read_csv(file_name, header = 0, index_col = "user id")
-            if not pwd == employee_df.loc[uid]["password"]:
-                raise OperationError("Unauthorized login attempt!!!")
-        except KeyError:
-            raise OperationError("Unauthorized login attempt!!!")
+            employee_info = get_operator_directory(file_name).authenticate(uid, pwd)
         except FileNotFoundError:
             raise OperationError("No employee data founded!!!")
-        else:
-            employee_df = employee_df.loc[uid][["employee id", "fname", "lname", "position"]].to_dict()
-            return employee_df
+        except (KeyError, ValueError): # malformed employee file
+            raise OperationError("Invalid employee data!!!")
+        if employee_info == None:
+            raise OperationError("Unauthorized login attempt!!!")
+        return employee_info
         
     def __str__(self) -> str:
         msg = ""
@@ -0,0 +1,150 @@
+import argparse
+import csv
+import hashlib
+import hmac
+import secrets
+from os import stat, replace
+from threading import Lock
+"""
+Operator directory: the employee records (user id, employee id, fname, lname, password, position) loaded once into a dict keyed by user id,
+reloaded only when the file changes, and the salted password hashes
+"""
+HASH_SCHEME = "pbkdf2_sha256"
+HASH_ITERATIONS = 100000
+EMPLOYEE_FIELDS = ["user id", "employee id", "fname", "lname", "password", "position"]
+OPERATOR_FIELDS = ["employee id", "fname", "lname", "position"] # returned on login (the password never leaves the directory)
+_directories = {} # file name -> shared OperatorDirectory
+
+def hash_password(pwd : str, salt : str | None = None, iterations : int = HASH_ITERATIONS) -> str:
+    """
+    Salted hash of a password stored as "pbkdf2_sha256$iterations$salt$hash" (a random salt is drawn if none is given)
+    """
+    salt = secrets.token_hex(16) if salt == None else salt
+    digest = hashlib.pbkdf2_hmac("sha256", pwd.encode("utf-8"), salt.encode("utf-8"), iterations).hex()
+    return f"{HASH_SCHEME}${iterations}${salt}${digest}"
+
+def is_password_hash(stored : str) -> bool:
+    return stored.startswith(HASH_SCHEME + "$")
+
+def verify_password(stored : str, pwd : str) -> bool:
+    """
+    Constant-time check of a password against its stored value (salted hash, or plaintext for a record not migrated yet)
+    A plaintext record costs the same hash as a hashed one
+    """
+    if is_password_hash(stored):
+        try:
+            _, iterations, salt, digest = stored.split("$")
+            expected = hash_password(pwd, salt, int(iterations)).rsplit("$", 1)[1]
+        except ValueError: # malformed hash
+            return False
+        return hmac.compare_digest(expected.encode("utf-8"), digest.encode("utf-8"))
+    hash_password(pwd, salt = "")
+    return hmac.compare_digest(stored.encode("utf-8"), pwd.encode("utf-8"))
+
+def _read_employees(file_name) -> dict:
+    with open(file_name, mode = "r", newline = "") as file:
+        records = {}
+        for row in csv.DictReader(file, skipinitialspace = True):
+            employee_id = row["employee id"]
+            row["employee id"] = int(employee_id) if employee_id.isdigit() else employee_id
+            records[row["user id"]] = row
+    return records
+
+def hash_employee_passwords(file_name, iterations : int = HASH_ITERATIONS) -> int:
+    """
+    Replace the plaintext passwords of an employee file by salted hashes (the file is rewritten atomically)
+    Return the number of hashed passwords
+    """
+    with open(file_name, mode = "r", newline = "") as file:
+        reader = csv.DictReader(file, skipinitialspace = True)
+        fields, rows = reader.fieldnames, list(reader)
+    n_hashed = 0
+    for row in rows:
+        if not is_password_hash(row["password"]):
+            row["password"] = hash_password(row["password"], iterations = iterations)
+            n_hashed += 1
+    if n_hashed > 0:
+        with open(file_name + ".tmp", mode = "w", newline = "") as file:
+            writer = csv.DictWriter(file, fieldnames = fields)
+            writer.writeheader()
+            writer.writerows(rows)
+        replace(file_name + ".tmp", file_name)
+    return n_hashed
+
+class OperatorDirectory():
+    def __init__(self, file_name) -> None:
+        '''
+        Employee records of a file keyed by user id: the file is parsed on the first lookup and again only when its
+        modification time or size changes (a lookup costs a stat and a dict access)
+        The plaintext passwords of a loaded file are replaced by salted hashes (kept as plaintext if the file is read-only)
+        '''
+        self._file_name = file_name
+        self._records = {}
+        self._signature = None # (modification time, size) of the loaded file
+        self._lock = Lock()
+
+    def get_file_name(self):
+        return self._file_name
+    file_name = property(fget = get_file_name)
+
+    def _refresh(self):
+        """
+        Reload the records if the file changed, raise FileNotFoundError if the file does not exist
+        """
+        info = stat(self._file_name)
+        signature = (info.st_mtime_ns, info.st_size)
+        if signature == self._signature:
+            return
+        with self._lock:
+            if not signature == self._signature:
+                self._records = _read_employees(self._file_name)
+                if not all(is_password_hash(record["password"]) for record in self._records.values()):
+                    try:
+                        hash_employee_passwords(self._file_name)
+                    except OSError: # read-only file: the plaintext records are still checked
+                        pass
+                    else:
+                        info = stat(self._file_name)
+                        signature = (info.st_mtime_ns, info.st_size)
+                        self._records = _read_employees(self._file_name)
+                self._signature = signature
+
+    def __contains__(self, uid) -> bool:
+        self._refresh()
+        return uid in self._records
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._records)
+
+    def authenticate(self, uid, pwd) -> dict | None:
+        """
+        Employee info (employee id, fname, lname, position) of the user if the password matches, None otherwise
+        An unknown user costs the same hash as a wrong password
+        """
+        self._refresh()
+        record = self._records.get(uid, None)
+        if record == None:
+            hash_password(pwd, salt = "")
+            return None
+        if not verify_password(record["password"], pwd):
+            return None
+        return {key: record[key] for key in OPERATOR_FIELDS}
+
+def get_operator_directory(file_name) -> OperatorDirectory:
+    """
+    Directory of an employee file shared by every login (created on the first use)
+    """
+    if not file_name in _directories:
+        _directories[file_name] = OperatorDirectory(file_name)
+    return _directories[file_name]
+
+def main():
+    parser = argparse.ArgumentParser(description = "Replace the plaintext passwords of employee files by salted hashes")
+    parser.add_argument("--iterations", type = int, default = HASH_ITERATIONS, help = "PBKDF2 iterations of the new hashes")
+    parser.add_argument("files", nargs = "+", help = "employee files (user id, employee id, fname, lname, password, position)")
+    args = parser.parse_args()
+    for file_name in args.files:
+        print(f"{file_name}: {hash_employee_passwords(file_name, args.iterations)} password(s) hashed")
+
+if __name__ == "__main__":
+    main()
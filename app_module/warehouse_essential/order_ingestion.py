@@ -0,0 +1,92 @@
+import pandas as pd
+import numpy as np
+from contextlib import nullcontext
+from collections import defaultdict
+from os import path as os_path
+from app_module.warehouse_essential.storage import Storage
+"""
+Streaming ingestion of order files (id, action - Load/Unload, amount) into a Storage
+"""
+ORDER_COLUMNS = ["id", "action", "amount"]
+ORDER_DTYPES = {"id": str, "action": str, "amount": np.float64}
+DEFAULT_CHUNK_SIZE = 50000
+COMMIT_POLICIES = ("chunk", "file") # commit each chunk on its own or the whole file at once
+MAX_LOG_LINES = 50 # number of change messages kept for the announcement
+
+def read_order_chunks(filename, chunk_size : int = DEFAULT_CHUNK_SIZE):
+    """
+    Read an order file chunk by chunk with a typed parser
+    Yield (orders, progress) where orders is a list of (id, action, amount) and progress is the read percentage of the file
+    Raise ValueError at the first line with a missing field or a non-finite amount
+    """
+    file_size = os_path.getsize(filename)
+    n_line = 0
+    with open(filename, mode = "rb") as file:
+        reader = pd.read_csv(file, header = None, names = ORDER_COLUMNS, dtype = ORDER_DTYPES,
+                             skipinitialspace = True, chunksize = chunk_size)
+        for chunk in reader:
+            invalid = (chunk["id"].isna() | chunk["action"].isna() | ~np.isfinite(chunk["amount"])).to_numpy()
+            if invalid.any():
+                raise ValueError(f"Missing or invalid field at order line {n_line + int(np.flatnonzero(invalid)[0]) + 1}!!!")
+            n_line += len(chunk)
+            chunk["action"] = chunk["action"].str.strip()
+            progress = 100 if file_size == 0 else min(100, int(file.tell() / file_size * 100))
+            yield list(chunk.itertuples(index = False, name = None)), progress
+
+def revert_loads(storage : Storage, applied : dict):
+    """
+    Take back net load changes (id -> change) from the current loads of the storage units
+    """
+    ids = [unit_id for unit_id, change in applied.items() if not change == 0 and unit_id in storage]
+    if len(ids) == 0:
+        return
+    loads = pd.Series([storage.get_unit(unit_id).load - applied[unit_id] for unit_id in ids], index = ids, dtype = object)
+    storage.restore_load(loads)
+
+def ingest_order_file(storage : Storage, filename, commit_policy : str = "chunk", chunk_size : int = DEFAULT_CHUNK_SIZE, progress = None, lock = None):
+    """
+    Apply an order file to the storage chunk by chunk (memory use is bounded by the chunk size)
+        commit_policy = "chunk": every chunk is applied atomically, the chunks before an error are kept
+        commit_policy = "file": an error anywhere reverts the whole file (only the changes of the file are taken back,
+        the load changes made meanwhile by others are kept)
+    progress is an optional callable receiving the read percentage of the file
+    lock is held while a chunk (or the revert) is applied, i.e., the lock shared with the simulation when the file is read on a worker thread
+    Return (success, error message, change log, number of changes)
+    """
+    if not commit_policy in COMMIT_POLICIES:
+        raise ValueError("Invalid commit policy!!!")
+    lock = nullcontext() if lock == None else lock
+    applied = defaultdict(float) # id -> net load change of the committed chunks (commit_policy = "file")
+    change_log = []
+    n_change = 0
+    n_line = 0
+    success = True
+    error_msg = ""
+    try:
+        for orders, percent in read_order_chunks(filename, chunk_size):
+            keep_log = len(change_log) < MAX_LOG_LINES
+            with lock:
+                success, error_msg, changes = storage.change_storage_load(orders, abort_change = True, keep_log = keep_log)
+            if success and commit_policy == "file":
+                for unit_id, action, amount in orders:
+                    applied[unit_id] += amount if action == "Load" else -amount
+            if keep_log:
+                change_log += changes[:MAX_LOG_LINES - len(change_log)]
+                changes = len(changes)
+            n_line += len(orders)
+            if not success:
+                error_msg = f"Order line {n_line - len(orders) + 1} - {n_line}: {error_msg}"
+                break
+            n_change += changes
+            if not progress == None:
+                progress(percent)
+    except FileNotFoundError:
+        success, error_msg = False, "The requested file does not exist!!!"
+    except ValueError as e: # Wrong data type in the file (i.e., non-numerical amount)
+        success, error_msg = False, f"Invalid order file! {e}"
+    if not success and commit_policy == "file":
+        with lock:
+            revert_loads(storage, applied)
+        change_log = []
+        n_change = 0
+    return success, error_msg, change_log, n_change
@@ -0,0 +1,122 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from os import path as os_path, makedirs, replace, stat, listdir, remove
+from threading import Lock
+"""
+Cache of the parsed vehicle path files (x, y per line): LRU in memory, optionally .npz files on disk
+"""
+DEFAULT_PATH_CACHE_DIR = ".\\Metadata\\PathCache"
+
+def read_path_file(filename) -> np.ndarray:
+    """
+    Parse a path file (csv without header, x and y in the first two columns) into an (n, 2) array
+    """
+    return pd.read_csv(filename, header = None, usecols = [0, 1], dtype = np.float64).to_numpy().reshape(-1, 2)
+
+class PathCache():
+    def __init__(self, max_entries : int = 256, cache_dir = None, hash_content : bool = False) -> None:
+        '''
+        Parsed path files kept by key, the least recently used ones are evicted beyond max_entries
+            key: (absolute path, modification time, size) of the file, or the hash of its content if hash_content = True
+            (a modified file is parsed again, hashing still reads the file but skips the parsing)
+            cache_dir: directory of the .npz copies of the parsed paths (kept between sessions), None for memory only
+            (one copy per path file storing the key it was parsed with: the copy of a modified file is replaced, not added)
+        The returned arrays are read-only (shared by every caller)
+        '''
+        self.max_entries = max_entries
+        self._cache_dir = cache_dir
+        self._hash_content = hash_content
+        self._entries = OrderedDict() # key -> array, most recently used last
+        self._lock = Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    def get_cache_dir(self):
+        return self._cache_dir
+    cache_dir = property(fget = get_cache_dir)
+    def get_stats(self):
+        """
+        Counters of the lookups: memory hits, disk hits and misses (parsed files)
+        """
+        return dict(self._stats)
+    stats = property(fget = get_stats)
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _key(self, filename) -> str:
+        if self._hash_content:
+            digest = hashlib.sha1()
+            with open(filename, mode = "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+            return digest.hexdigest()
+        info = stat(filename)
+        return hashlib.sha1(f"{os_path.abspath(filename)}|{info.st_mtime_ns}|{info.st_size}".encode("utf-8")).hexdigest()
+
+    def get(self, filename) -> np.ndarray:
+        """
+        Waypoints (n, 2) of a path file, parsed only if the file is not cached yet
+        Raise OSError if the file does not exist, ValueError if it cannot be parsed
+        """
+        key = self._key(filename)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._entries[key]
+        points = self._load(filename, key)
+        from_disk = not points is None
+        if not from_disk:
+            points = read_path_file(filename)
+            self._save(filename, key, points)
+        points.setflags(write = False)
+        with self._lock:
+            self._stats["disk_hits" if from_disk else "misses"] += 1
+            self._entries[key] = points
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last = False)
+        return points
+
+    def _disk_file(self, filename) -> str:
+        """
+        Name of the disk copy of a path file (one per absolute path)
+        """
+        return os_path.join(self._cache_dir, hashlib.sha1(os_path.abspath(filename).encode("utf-8")).hexdigest())
+
+    def _load(self, filename, key : str):
+        """
+        Points of the disk copy of a path file, None if there is none or it was parsed from another version of the file
+        """
+        if self._cache_dir == None:
+            return None
+        try:
+            with np.load(self._disk_file(filename) + ".npz", allow_pickle = False) as copy:
+                if not str(copy["key"]) == key:
+                    return None
+                return copy["points"]
+        except (OSError, KeyError, ValueError): # not cached or unreadable copy
+            return None
+
+    def _save(self, filename, key : str, points : np.ndarray):
+        if self._cache_dir == None:
+            return
+        try:
+            makedirs(self._cache_dir, exist_ok = True)
+            disk_file = self._disk_file(filename)
+            np.savez(disk_file + ".tmp.npz", key = key, points = points)
+            replace(disk_file + ".tmp.npz", disk_file + ".npz")
+        except OSError: # the disk copy is optional
+            pass
+
+    def clear(self, disk : bool = False):
+        """
+        Drop the cached paths (and their disk copies if disk = True)
+        """
+        with self._lock:
+            self._entries.clear()
+        if disk and not self._cache_dir == None and os_path.isdir(self._cache_dir):
+            for name in listdir(self._cache_dir):
+                if name.endswith((".npz", ".npy")): # .npy: copies of the former layout (one per file version)
+                    remove(os_path.join(self._cache_dir, name))
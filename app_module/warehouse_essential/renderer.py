@@ -0,0 +1,243 @@
+import numpy as np
+import matplotlib as mpl
+from matplotlib.collections import PolyCollection, LineCollection
+from matplotlib.patches import Polygon as PolygonPatch
+from matplotlib.transforms import AffineDeltaTransform
+import app_module.warehouse_essential.geometry as geometry
+"""
+Retained-mode drawing of a warehouse on a matplotlib axes: the artists are created once and updated in place
+"""
+LAYOUT_STYLE = {"facecolor": "silver", "edgecolor": "k"}
+STORAGE_COLOR = "r" # storage units without the heat map
+VEHICLE_STYLE = {"facecolors": "#A020F0", "edgecolors": "k"}
+TRAIL_COLOR = "k"
+STATION_STYLE = "g^"
+HEAT_CMAP = "jet"
+MARGIN = 0.05 # of the layout size around the layout
+
+def polygon_vertices(polygons) -> list:
+    """
+    Exterior vertices (k, 2) of each polygon (shapely), extracted in one pass
+    """
+    rings = geometry.shapely.get_exterior_ring(np.asarray(polygons, dtype = object))
+    coords, index = geometry.shapely.get_coordinates(rings, return_index = True)
+    return np.split(coords, np.flatnonzero(np.diff(index)) + 1) if len(coords) > 0 else []
+
+class WarehouseRenderer():
+    def __init__(self, ax) -> None:
+        '''
+        Draw a warehouse on ax with artists kept between the frames:
+            static (layout, storage units with their heat colours, charging stations): redrawn with the whole figure when they change,
+            except the load changes: only the recoloured units are drawn over the cached background (see _patch_storage)
+            animated (vehicles, trails): the vehicles are drawn at their offsets (the positions of the fleet), the trail segments of the
+            vehicles are replaced when their trail changes, and both are blitted over the cached background of the static artists
+        Only the dirty elements are updated, found with the version counters of the model (layout, storage loads, fleet positions
+        and trails): a frame without any change draws nothing
+        '''
+        self._ax = ax
+        self._canvas = ax.figure.canvas
+        self._cmap = mpl.colormaps[HEAT_CMAP]
+        self._background = None # pixels of the figure without the animated artists
+        self._draw_id = self._canvas.mpl_connect("draw_event", self._on_draw)
+        self._reset_state()
+
+    def _reset_state(self):
+        self._warehouse = None
+        self._layout_version = None # layout version of the drawn layout and chargers
+        self._layout_patch = None
+        self._storage = None # PolyCollection of the storage units
+        self._storage_vertices = [] # vertices of the storage units (aligned with the ids of the storage)
+        self._storage_version = None # (index version, load version) drawn
+        self._storage_heat = None # heat map drawn (or plain colour)
+        self._stations = None # Line2D of the chargers
+        self._vehicles = None # PolyCollection of the vehicles (vertices relative to the vehicle position)
+        self._vehicle_version = None # (index version, position version) drawn
+        self._vehicle_slots = np.zeros(0, dtype = np.int64)
+        self._trails = None # LineCollection of the trails
+        self._trail_clock = None # trail version drawn
+        self._trail_display = None
+        self._trail_segments = []
+        self._trail_versions = np.zeros(0, dtype = np.int64)
+
+    def _remove(self, artist):
+        if not artist == None:
+            artist.remove()
+
+    def reset(self):
+        """
+        Remove the artists of the renderer (the next render starts over)
+        """
+        for artist in (self._layout_patch, self._storage, self._stations, self._vehicles, self._trails):
+            try:
+                self._remove(artist)
+            except (ValueError, NotImplementedError): # already removed with the axes content
+                pass
+        self._reset_state()
+        self._background = None
+
+    def _on_draw(self, event):
+        """
+        A full draw of the figure: keep its background and draw the animated artists over it
+        """
+        if not event == None and not event.canvas is self._canvas:
+            return
+        self._background = self._canvas.copy_from_bbox(self._ax.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in (self._vehicles, self._trails):
+            if not artist == None and artist.get_visible():
+                self._ax.draw_artist(artist)
+
+    def render(self, warehouse, heat_display : bool = True, path_display : bool = True) -> str:
+        """
+        Bring the dirty artists up to date with the warehouse and draw the frame
+        Return "full" if the whole figure was drawn (a static artist changed), "blit" if only the animated artists and the recoloured
+        storage units were,
+        "skip" if nothing changed since the last frame, "none" if there was nothing to draw (warehouse without layout)
+        """
+        if warehouse.layout == None: # nothing is drawn without layout
+            if self._warehouse == None:
+                return "none"
+            self.reset()
+            self._canvas.draw()
+            return "full"
+        if not warehouse is self._warehouse:
+            self.reset()
+            self._warehouse = warehouse
+        static = self._update_layout(warehouse)
+        storage_static, recolored = self._update_storage(warehouse, heat_display)
+        static = storage_static or static
+        animated = self._update_vehicles(warehouse)
+        animated = self._update_trails(warehouse, path_display) or animated
+        if static or self._background == None:
+            self._canvas.draw() # the background is captured by _on_draw
+            return "full"
+        if not animated and len(recolored) == 0:
+            return "skip"
+        self._canvas.restore_region(self._background)
+        if len(recolored) > 0:
+            self._patch_storage(recolored)
+        self._draw_animated()
+        self._canvas.blit(self._ax.figure.bbox)
+        return "blit"
+
+    def _update_layout(self, warehouse) -> bool:
+        """
+        Layout and chargers (redrawn when the layout version changes)
+        """
+        if warehouse.layout_version == self._layout_version:
+            return False
+        for artist in (self._layout_patch, self._stations):
+            self._remove(artist)
+        self._layout_patch = self._stations = None
+        layout = warehouse.layout
+        self._layout_patch = PolygonPatch(np.asarray(layout.polygon.exterior.coords), closed = True, zorder = 1, **LAYOUT_STYLE)
+        self._ax.add_patch(self._layout_patch)
+        x_min, y_min, x_max, y_max = layout.polygon.bounds
+        dx, dy = (x_max - x_min) * MARGIN, (y_max - y_min) * MARGIN
+        self._ax.set_xlim(x_min - dx, x_max + dx)
+        self._ax.set_ylim(y_min - dy, y_max + dy)
+        self._ax.set_aspect("equal")
+        points = [station.charger_location(k) for station in warehouse.charging_stations for k in range(station.n_charger)]
+        if len(points) > 0:
+            self._stations, = self._ax.plot(*zip(*points), STATION_STYLE, zorder = 3)
+        self._layout_version = warehouse.layout_version
+        return True
+
+    def _update_storage(self, warehouse, heat_display : bool) -> tuple:
+        """
+        Storage units (rebuilt when units are added/removed, only the units with a changed load are recoloured)
+        Return (True if the whole collection changed, rows of the recoloured units otherwise)
+        """
+        storage = warehouse.storage
+        version = (storage.index_version, storage.load_version)
+        no_row = np.zeros(0, dtype = np.int64)
+        if version == self._storage_version and heat_display == self._storage_heat:
+            return False, no_row
+        static = not heat_display == self._storage_heat
+        if not storage.index_version == (None if self._storage_version == None else self._storage_version[0]):
+            self._remove(self._storage)
+            self._storage_vertices = polygon_vertices(storage.polygons())
+            self._storage = PolyCollection(self._storage_vertices, closed = True, zorder = 2, edgecolors = "face")
+            self._ax.add_collection(self._storage, autolim = False)
+            self._storage_heat = None
+            static = True
+        rows = no_row
+        if not heat_display:
+            if static:
+                self._storage.set_facecolor(STORAGE_COLOR)
+        elif static: # all the units
+            self._storage.set_facecolor(self._cmap(storage.loads() / storage.capacities()))
+        else: # the units changed since the last frame
+            rows = storage.changed_rows(self._storage_version[1])
+            colors = self._storage.get_facecolor()
+            colors[rows] = self._cmap(storage.loads(rows) / storage.capacities(rows))
+            self._storage.set_facecolor(colors)
+        self._storage_version = version
+        self._storage_heat = heat_display
+        return static, rows
+
+    def _patch_storage(self, rows : np.ndarray):
+        """
+        Draw the recoloured storage units over the restored background and keep the result as the new background
+        (the units do not overlap: the new colours cover the old ones)
+        """
+        patch = PolyCollection([self._storage_vertices[k] for k in rows.tolist()], closed = True, zorder = 2, edgecolors = "face",
+                               facecolors = self._storage.get_facecolor()[rows])
+        self._ax.add_collection(patch, autolim = False)
+        self._ax.draw_artist(patch)
+        patch.remove()
+        self._background = self._canvas.copy_from_bbox(self._ax.figure.bbox)
+
+    def _update_vehicles(self, warehouse) -> bool:
+        """
+        Vehicles (rebuilt when vehicles are added/removed, only the moved vehicles get a new offset)
+        """
+        vehicles = warehouse.vehicles
+        fleet = vehicles.fleet
+        if self._vehicle_version == (vehicles.index_version, fleet.pos_clock):
+            return False
+        if self._vehicle_version == None or not vehicles.index_version == self._vehicle_version[0]:
+            self._remove(self._vehicles)
+            units = vehicles.units()
+            self._vehicle_slots = np.array([unit.slot for unit in units], dtype = np.int64)
+            shapes = polygon_vertices([unit.shape.polygon for unit in units])
+            templates = [vertices - fleet.pos[slot] for vertices, slot in zip(shapes, self._vehicle_slots.tolist())]
+            self._vehicles = PolyCollection(templates, closed = True, zorder = 4, animated = True, offsets = fleet.pos[self._vehicle_slots],
+                                            offset_transform = self._ax.transData, transform = AffineDeltaTransform(self._ax.transData),
+                                            **VEHICLE_STYLE) # the vertices are scaled like the data, the offsets place them
+            self._ax.add_collection(self._vehicles, autolim = False)
+            self._trail_segments = [np.zeros((0, 2))] * len(units)
+            self._trail_versions = np.full(len(units), -1, dtype = np.int64)
+            self._trail_clock = None
+        else:
+            rows = np.flatnonzero(fleet.pos_version[self._vehicle_slots] > self._vehicle_version[1])
+            offsets = np.asarray(self._vehicles.get_offsets())
+            offsets[rows] = fleet.pos[self._vehicle_slots[rows]]
+            self._vehicles.set_offsets(offsets)
+        self._vehicle_version = (vehicles.index_version, fleet.pos_clock)
+        return True
+
+    def _update_trails(self, warehouse, path_display : bool) -> bool:
+        """
+        Trails (only the segments of the vehicles with a changed trail are replaced)
+        """
+        fleet = warehouse.vehicles.fleet
+        if self._trails == None:
+            self._trails = LineCollection([], colors = TRAIL_COLOR, zorder = 5, animated = True)
+            self._ax.add_collection(self._trails, autolim = False)
+        changed = not path_display == self._trail_display
+        self._trails.set_visible(path_display)
+        self._trail_display = path_display
+        if not path_display or fleet.trail_clock == self._trail_clock:
+            return changed
+        versions = fleet.trail_version[self._vehicle_slots]
+        rows = np.flatnonzero(~(versions == self._trail_versions))
+        for k in rows.tolist():
+            self._trail_segments[k] = fleet.trail_points(int(self._vehicle_slots[k]))
+        self._trail_versions = versions
+        self._trail_clock = fleet.trail_clock
+        if len(rows) > 0:
+            self._trails.set_segments([segment for segment in self._trail_segments if len(segment) > 1])
+        return changed or len(rows) > 0
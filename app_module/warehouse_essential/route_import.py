@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from fnmatch import fnmatch
+from os import path as os_path, listdir
+from app_module.warehouse_essential.path_cache import read_path_file
+"""
+Bulk import of the vehicle routes: one long-format table (vehicle_id, seq, x, y[, t]) or one path file per vehicle
+The routes are returned packed as (vehicle ids, waypoints (n, 2), offsets): the path of ids[i] is waypoints[offsets[i] : offsets[i + 1]]
+"""
+ROUTE_COLUMNS = ["vehicle_id", "seq", "x", "y", "t"]
+ROUTE_DTYPES = {"vehicle_id": str, "seq": np.int64, "x": np.float64, "y": np.float64, "t": np.float64}
+
+def _first_fields(filename) -> list:
+    with open(filename, mode = "r") as file:
+        return [field.strip().lower() for field in file.readline().split(",")]
+
+def is_route_table(filename) -> bool:
+    """
+    True if the file is a long-format route table (header starting with vehicle_id or at least 4 columns), False for a path file (x, y)
+    """
+    first = _first_fields(filename)
+    return first[0] == ROUTE_COLUMNS[0] or len(first) >= 4
+
+def group_routes(vehicle_ids, seq, points) -> tuple:
+    """
+    Split the waypoints of many vehicles with a single sort (by vehicle, then by seq)
+    The vehicles are kept in order of first appearance, raise ValueError if a vehicle repeats a sequence number
+    """
+    codes, ids = pd.factorize(np.asarray(vehicle_ids, dtype = object))
+    seq = np.asarray(seq, dtype = np.int64)
+    order = np.lexsort((seq, codes))
+    codes, seq = codes[order], seq[order]
+    repeated = (codes[1:] == codes[:-1]) & (seq[1:] == seq[:-1])
+    if repeated.any():
+        names = list(dict.fromkeys(ids[codes[1:][repeated]].tolist()))
+        raise ValueError(f"Repeated waypoint sequence number for vehicle(s) {', '.join(map(str, names[:10]))}!!!")
+    offsets = np.zeros(len(ids) + 1, dtype = np.int64)
+    offsets[1:] = np.cumsum(np.bincount(codes, minlength = len(ids)))
+    return ids.tolist(), np.asarray(points, dtype = np.float64).reshape(-1, 2)[order], offsets
+
+def read_route_file(filename) -> tuple:
+    """
+    Read a long-format route table (csv: vehicle_id, seq, x, y and an optional time t, with or without header) with a typed parser
+    The time column is accepted but not used (the vehicles move one waypoint per step)
+    Return (vehicle ids, waypoints, offsets), raise ValueError for an invalid file
+    """
+    header = 1 if _first_fields(filename)[0] == ROUTE_COLUMNS[0] else 0
+    frame = pd.read_csv(filename, header = None, names = ROUTE_COLUMNS, dtype = ROUTE_DTYPES, skiprows = header,
+                        skipinitialspace = True)
+    if frame[["vehicle_id", "seq", "x", "y"]].isna().any().any():
+        raise ValueError("Missing value in the route table!!!")
+    return group_routes(frame["vehicle_id"].to_numpy(), frame["seq"].to_numpy(), frame[["x", "y"]].to_numpy())
+
+def route_file_vehicle(filename) -> str:
+    """
+    Vehicle id of a path file: the last part of its name after "_" (i.e., path1_Veh1.csv -> Veh1)
+    """
+    return os_path.splitext(os_path.basename(filename))[0].rsplit("_", 1)[-1]
+
+def read_route_files(filenames : list, cache = None) -> tuple:
+    """
+    Read one path file (x, y) per vehicle, the vehicle id is taken from the file name (see route_file_vehicle)
+    cache: optional path_cache.PathCache the files are read through
+    Return (vehicle ids, waypoints, offsets), raise ValueError if two files are named after the same vehicle
+    """
+    ids = [route_file_vehicle(filename) for filename in filenames]
+    if not len(set(ids)) == len(ids):
+        raise ValueError("Several path files for the same vehicle!!!")
+    paths = [read_path_file(filename) if cache == None else cache.get(filename) for filename in filenames]
+    offsets = np.zeros(len(paths) + 1, dtype = np.int64)
+    offsets[1:] = np.cumsum([len(path) for path in paths])
+    return ids, (np.concatenate(paths) if len(paths) > 0 else np.zeros((0, 2))), offsets
+
+def read_route_directory(directory, pattern : str = "*.csv", cache = None) -> tuple:
+    """
+    Read the path files of a directory matching pattern (one file per vehicle, see read_route_files)
+    """
+    filenames = sorted(os_path.join(directory, name) for name in listdir(directory) if fnmatch(name, pattern))
+    return read_route_files(filenames, cache)
+
+def read_routes(source, cache = None) -> tuple:
+    """
+    Read the routes of a directory of path files or of a file (route table or single path file)
+    """
+    if os_path.isdir(source):
+        return read_route_directory(source, cache = cache)
+    if is_route_table(source):
+        return read_route_file(source)
+    return read_route_files([source], cache)
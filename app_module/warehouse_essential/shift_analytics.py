@@ -0,0 +1,263 @@
+import csv
+import numpy as np
+from io import StringIO
+from os import path as os_path, makedirs, stat, replace
+from threading import Lock
+from app_module.warehouse_essential.shift_log import shift_record_files, SHIFT_COLUMNS
+"""
+Analytics of the shift records (hours worked per employee and period, sessions per day)
+The record files are parsed once into typed columns cached as .npz files, only the lines appended since are parsed again
+"""
+SHIFT_DTYPE = np.dtype([("employee", np.int64), ("start", np.int64), ("end", np.int64), ("duration", np.int64)]) # times: epoch s of the local time
+PERIODS = ("day", "week", "month")
+DAY = 86400
+
+def _parse_rows(rows : list) -> np.ndarray:
+    """
+    Typed records of shift rows, raise ValueError if a field cannot be parsed
+    """
+    records = np.zeros(len(rows), dtype = SHIFT_DTYPE)
+    if len(rows) == 0:
+        return records
+    columns = list(zip(*rows))
+    records["employee"] = np.array(columns[0], dtype = np.int64)
+    records["start"] = np.array(columns[2], dtype = "datetime64[s]").astype(np.int64)
+    records["end"] = np.array(columns[3], dtype = "datetime64[s]").astype(np.int64)
+    records["duration"] = np.array(columns[4], dtype = np.int64)
+    return records
+
+def parse_shift_lines(text : str) -> tuple:
+    """
+    Parse shift record lines (the header lines are skipped) into typed records
+    The malformed lines (missing field, non-numerical employee id or duration, invalid time) are skipped and counted
+    Return (records (SHIFT_DTYPE), dict of employee id -> name, number of malformed lines)
+    """
+    rows = [row for row in csv.reader(StringIO(text)) if len(row) > 0 and not row[0] == SHIFT_COLUMNS[0]]
+    valid = [row for row in rows if len(row) >= 5]
+    try:
+        records = _parse_rows(valid)
+    except ValueError: # one line at a time to find the malformed ones
+        parsed = []
+        for row in valid:
+            try:
+                parsed.append((row, _parse_rows([row])))
+            except ValueError:
+                continue
+        valid = [row for row, _ in parsed]
+        records = np.concatenate([np.zeros(0, dtype = SHIFT_DTYPE)] + [record for _, record in parsed])
+    return records, dict(zip(records["employee"].tolist(), [row[1] for row in valid])), len(rows) - len(valid)
+
+def _day(value) -> int:
+    """
+    Day number (days since epoch) of a date/datetime/numpy datetime64
+    """
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+def _period_start(days : np.ndarray, period : str) -> np.ndarray:
+    if period == "day":
+        return days
+    if period == "week": # weeks start on Monday (day 4 since epoch)
+        return days - (days - 4) % 7
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+class ShiftAnalytics():
+    def __init__(self, directory, cache_dir = None) -> None:
+        '''
+        Shift records of a directory (see shift_log) kept as typed columns sorted by start time
+            cache_dir: directory of the binary copies of the parsed files (.npz), None for memory only
+        refresh() parses the lines appended since the last call (the record files are append-only) and updates
+        the per employee/day aggregates (worked seconds, sessions) with the new shifts only
+        '''
+        self._directory = directory
+        self._cache_dir = cache_dir
+        self._lock = Lock()
+        self._files = {} # file name -> (parsed bytes, records)
+        self._malformed = {} # file name -> number of malformed lines skipped
+        self._records = np.zeros(0, dtype = SHIFT_DTYPE) # all the shifts sorted by start
+        self._names = {} # employee id -> name
+        self._daily = {} # (day, employee) -> [worked seconds, sessions] (a shift counts for the day it starts)
+        self._daily_arrays = None # sorted columns of _daily (rebuilt after a change)
+
+    def get_names(self):
+        return dict(self._names)
+    names = property(fget = get_names)
+    def get_malformed(self):
+        """
+        Number of malformed record lines skipped
+        """
+        return sum(self._malformed.values())
+    malformed = property(fget = get_malformed)
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def refresh(self) -> int:
+        """
+        Read the shifts appended to the record files since the last refresh
+        Return the number of new shifts
+        """
+        with self._lock:
+            filenames = shift_record_files(self._directory)
+            removed = set(self._files.keys()).difference(filenames)
+            for filename in removed:
+                del self._files[filename]
+                self._malformed.pop(filename, None)
+            new, rebuild = [], len(removed) > 0
+            for filename in filenames:
+                records, rewritten = self._read_file(filename)
+                new.append(records)
+                rebuild = rebuild or rewritten
+            if rebuild: # a file was rewritten or removed: the aggregates are computed again from all the files
+                new = [records for _, records in self._files.values()]
+                self._records = np.zeros(0, dtype = SHIFT_DTYPE)
+                self._daily = {}
+                self._daily_arrays = None
+            new = np.concatenate([np.zeros(0, dtype = SHIFT_DTYPE)] + new)
+            if len(new) == 0:
+                return 0
+            self._records = np.concatenate([self._records, new])
+            self._records = self._records[np.argsort(self._records["start"], kind = "stable")]
+            self._add_daily(new)
+            return len(new)
+
+    def _read_file(self, filename) -> tuple:
+        """
+        New records of a file: the whole file is parsed on the first read (or restored from the cache), then only its tail
+        Return (new records, True if the file was rewritten since the last read)
+        """
+        size = stat(filename).st_size
+        rewritten = False
+        if not filename in self._files:
+            parsed, records, self._malformed[filename] = self._load_cache(filename, size)
+            new = records
+        else:
+            parsed, records = self._files[filename]
+            new = records[:0]
+            if size < parsed:
+                parsed, records, rewritten = 0, records[:0], True
+                self._malformed[filename] = 0
+        if size > parsed:
+            with open(filename, mode = "rb") as file:
+                file.seek(parsed)
+                data = file.read(size - parsed)
+            data = data[:data.rfind(b"\n") + 1] # a line being written is left for the next refresh
+            if len(data) > 0:
+                tail, names, n_malformed = parse_shift_lines(data.decode("utf-8", errors = "replace"))
+                self._names.update(names)
+                self._malformed[filename] += n_malformed
+                parsed, records, new = parsed + len(data), np.concatenate([records, tail]), np.concatenate([new, tail])
+                self._save_cache(filename, parsed, records)
+        self._files[filename] = (parsed, records)
+        return new, rewritten
+
+    def _cache_file(self, filename) -> str:
+        return os_path.join(self._cache_dir, os_path.basename(filename) + ".npz")
+
+    def _load_cache(self, filename, size : int) -> tuple:
+        """
+        (parsed bytes, records, malformed lines) of the binary copy of a file, (0, no record, 0) if there is none or the file was rewritten
+        """
+        empty = (0, np.zeros(0, dtype = SHIFT_DTYPE), 0)
+        if self._cache_dir == None:
+            return empty
+        try:
+            with np.load(self._cache_file(filename), allow_pickle = False) as cache:
+                parsed, records = int(cache["parsed"]), cache["records"]
+                names = dict(zip(cache["name_ids"].tolist(), cache["names"].tolist()))
+                malformed = int(cache["malformed"]) if "malformed" in cache.files else 0
+        except (OSError, KeyError, ValueError):
+            return empty
+        if parsed > size or not records.dtype == SHIFT_DTYPE:
+            return empty
+        self._names.update(names)
+        return parsed, records, malformed
+
+    def _save_cache(self, filename, parsed : int, records : np.ndarray):
+        if self._cache_dir == None:
+            return
+        employees = set(records["employee"].tolist())
+        names = {id: name for id, name in self._names.items() if id in employees}
+        try:
+            makedirs(self._cache_dir, exist_ok = True)
+            temp_file = self._cache_file(filename) + ".tmp.npz"
+            np.savez(temp_file, parsed = parsed, records = records, name_ids = np.array(list(names.keys()), dtype = np.int64),
+                     names = np.array(list(names.values()), dtype = str), malformed = self._malformed.get(filename, 0))
+            replace(temp_file, self._cache_file(filename))
+        except OSError: # the binary copy is optional
+            pass
+
+    def _add_daily(self, records : np.ndarray):
+        """
+        Fold shifts into the per employee/day aggregates
+        """
+        days = records["start"] // DAY
+        keys, inverse = np.unique(np.stack([days, records["employee"]], axis = 1), axis = 0, return_inverse = True)
+        inverse = inverse.reshape(-1)
+        seconds = np.bincount(inverse, weights = records["duration"], minlength = len(keys))
+        sessions = np.bincount(inverse, minlength = len(keys))
+        for (day, employee), worked, count in zip(keys.tolist(), seconds.tolist(), sessions.tolist()):
+            total = self._daily.setdefault((day, employee), [0, 0])
+            total[0] += int(worked)
+            total[1] += count
+        self._daily_arrays = None
+
+    def _daily_columns(self) -> dict:
+        """
+        Aggregates as columns sorted by day (day, employee, seconds, sessions)
+        """
+        if self._daily_arrays == None:
+            keys = sorted(self._daily.keys())
+            values = [self._daily[key] for key in keys]
+            self._daily_arrays = {"day": np.array([key[0] for key in keys], dtype = np.int64),
+                                  "employee": np.array([key[1] for key in keys], dtype = np.int64),
+                                  "seconds": np.array([value[0] for value in values], dtype = np.int64),
+                                  "sessions": np.array([value[1] for value in values], dtype = np.int64)}
+        return self._daily_arrays
+
+    def _day_range(self, columns : dict, start, end) -> slice:
+        """
+        Rows of the days in [start, end] (dates, None for no bound) found by binary search
+        """
+        lower = 0 if start == None else np.searchsorted(columns["day"], _day(start), side = "left")
+        upper = len(columns["day"]) if end == None else np.searchsorted(columns["day"], _day(end), side = "right")
+        return slice(lower, upper)
+
+    def shifts(self, start = None, end = None) -> np.ndarray:
+        """
+        Shifts started between two times (datetime, None for no bound) found by binary search on the start times
+        """
+        starts = self._records["start"]
+        lower = 0 if start == None else np.searchsorted(starts, np.datetime64(start, "s").astype(np.int64), side = "left")
+        upper = len(starts) if end == None else np.searchsorted(starts, np.datetime64(end, "s").astype(np.int64), side = "right")
+        return self._records[lower:upper]
+
+    def worked_hours(self, start = None, end = None, period : str = "week") -> dict:
+        """
+        Hours worked and sessions per employee and period (day, week or month) for the shifts started in [start, end] (dates)
+        Return columns: period (first day, datetime64), employee, name, hours, sessions
+        """
+        if not period in PERIODS:
+            raise ValueError("Invalid period!!!")
+        with self._lock:
+            columns = self._daily_columns()
+            rows = self._day_range(columns, start, end)
+            periods, employees = _period_start(columns["day"][rows], period), columns["employee"][rows]
+            keys, inverse = np.unique(np.stack([periods, employees], axis = 1).reshape(-1, 2), axis = 0, return_inverse = True)
+            inverse = inverse.reshape(-1)
+            seconds = np.bincount(inverse, weights = columns["seconds"][rows], minlength = len(keys))
+            sessions = np.bincount(inverse, weights = columns["sessions"][rows], minlength = len(keys)).astype(np.int64)
+            return {"period": keys[:, 0].astype("datetime64[D]"), "employee": keys[:, 1],
+                    "name": [self._names.get(id, "") for id in keys[:, 1].tolist()], "hours": seconds / 3600, "sessions": sessions}
+
+    def sessions_per_day(self, start = None, end = None) -> dict:
+        """
+        Number of sessions, employees and hours worked per day for the days in [start, end] (dates)
+        Return columns: day (datetime64), sessions, employees, hours
+        """
+        with self._lock:
+            columns = self._daily_columns()
+            rows = self._day_range(columns, start, end)
+            days, inverse, employees = np.unique(columns["day"][rows], return_inverse = True, return_counts = True)
+            inverse = inverse.reshape(-1)
+            sessions = np.bincount(inverse, weights = columns["sessions"][rows], minlength = len(days)).astype(np.int64)
+            seconds = np.bincount(inverse, weights = columns["seconds"][rows], minlength = len(days))
+            return {"day": days.astype("datetime64[D]"), "sessions": sessions, "employees": employees, "hours": seconds / 3600}
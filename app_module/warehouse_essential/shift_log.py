@@ -0,0 +1,67 @@
+import csv
+from datetime import datetime
+from os import path as os_path, makedirs, stat, listdir
+from threading import Lock
+"""
+Shift records of the operators (employee id, name, start, end, time eslapse) appended to csv files partitioned by period
+"""
+SHIFT_COLUMNS = ["employee id", "name", "start", "end", "time eslapse"]
+SHIFT_PREFIX = "operation_records"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+PARTITIONS = {"month": "%Y-%m", "day": "%Y-%m-%d", "year": "%Y", "none": None} # partition -> date format of the file name
+
+class ShiftRecordWriter():
+    def __init__(self, directory, partition : str = "month") -> None:
+        '''
+        Append one row per shift to the file of its period (i.e., operation_records.2024-11.csv for partition = "month",
+        operation_records.csv for partition = "none"): a logout is a stat and one buffered line write, the history is never read
+        The header is written when a file is created (the rows of the old single file have none)
+        '''
+        if not partition in PARTITIONS:
+            raise ValueError("Invalid shift record partition!!!")
+        self._directory = directory
+        self._partition = partition
+        self._lock = Lock()
+
+    def get_directory(self):
+        return self._directory
+    directory = property(fget = get_directory)
+    def get_partition(self):
+        return self._partition
+    partition = property(fget = get_partition)
+
+    def file_name(self, time : datetime) -> str:
+        """
+        File of the period of a time
+        """
+        date_format = PARTITIONS[self._partition]
+        suffix = "" if date_format == None else "." + time.strftime(date_format)
+        return os_path.join(self._directory, f"{SHIFT_PREFIX}{suffix}.csv")
+
+    def write(self, employee_id, name : str, start : datetime, end : datetime) -> str:
+        """
+        Append the record of a shift (filed under its start time) and return the file name
+        """
+        file_name = self.file_name(start)
+        row = [employee_id, name, start.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT), (end - start).seconds]
+        with self._lock:
+            try:
+                new_file = stat(file_name).st_size == 0
+            except FileNotFoundError:
+                makedirs(self._directory, exist_ok = True)
+                new_file = True
+            with open(file_name, mode = "a", newline = "") as file:
+                writer = csv.writer(file)
+                if new_file:
+                    writer.writerow(SHIFT_COLUMNS)
+                writer.writerow(row)
+        return file_name
+
+def shift_record_files(directory) -> list:
+    """
+    Shift record files of a directory in time order (the unpartitioned file first)
+    """
+    if not os_path.isdir(directory):
+        return []
+    return sorted((os_path.join(directory, name) for name in listdir(directory)
+                   if name.startswith(SHIFT_PREFIX) and name.endswith(".csv")), key = lambda name: (name.count("."), name))
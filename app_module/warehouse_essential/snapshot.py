@@ -0,0 +1,185 @@
+import numpy as np
+import shutil
+from os import path as os_path, makedirs, replace
+from json import load as js_load, dump as js_dump
+"""
+Columnar snapshot of a warehouse: a directory of typed NumPy arrays (.npy, memory-mappable) and a JSON header
+"""
+SNAPSHOT_FORMAT = "warehouse-snapshot"
+SNAPSHOT_VERSION = 1
+HEADER_FILE = "header.json"
+# Columns of the JSON records: (key path, kind)
+#   num: number (int64 if all the values are integers, float64 otherwise with a "{column}.int" mask of the integers), pair: (x, y) numbers,
+#   str: short text, cat: repeated text/None (codes + names in the header), id: unit id (text array or list in the header)
+STORAGE_COLUMNS = ((("id",), "id"), (("cap",), "num"), (("load_location",), "pair"), (("geo", "type"), "str"),
+                   (("geo", "dimension"), "pair"), (("geo", "ref_pt_type"), "str"), (("geo", "buffer"), "num"),
+                   (("geo", "ref_pt"), "pair"), (("load",), "num"), (("type",), "cat"))
+VEHICLE_COLUMNS = ((("id",), "id"), (("dock_location",), "pair"), (("geometry", "type"), "str"), (("geometry", "dimension"), "pair"),
+                   (("geometry", "ref_pt_type"), "str"), (("geometry", "buffer"), "num"), (("geometry", "ref_pt"), "pair"),
+                   (("battery",), "num"))
+VEHICLE_STATE = ("ort", "odometer", "load") # fleet state of the vehicles without JSON field (kept by the snapshot only)
+_MISSING = object()
+
+def _get(record : dict, keys : tuple):
+    for key in keys:
+        if not isinstance(record, dict) or not key in record:
+            return _MISSING
+        record = record[key]
+    return record
+
+def _put(record : dict, keys : tuple, value):
+    for key in keys[:-1]:
+        record = record.setdefault(key, {})
+    record[keys[-1]] = value
+
+def _is_int(value) -> bool:
+    return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+
+def encode_records(records : list, columns : tuple):
+    """
+    Turn a list of JSON records (dicts) into typed arrays: return (dict of column name -> array, header of the columns)
+    The records missing a key are flagged by a "{column}.missing" mask, the integers of a number column mixing
+    integers and floats by a "{column}.int" mask (they are decoded as integers again)
+    """
+    arrays, header = {}, {}
+    for keys, kind in columns:
+        name = ".".join(keys)
+        values = [_get(record, keys) for record in records]
+        missing = np.array([value is _MISSING for value in values], dtype = bool)
+        if missing.any():
+            arrays[name + ".missing"] = missing
+        present = [value for value in values if not value is _MISSING]
+        if kind == "id":
+            if all(isinstance(value, str) for value in present):
+                arrays[name] = np.array([value if not value is _MISSING else "" for value in values], dtype = str)
+            else: # non-text ids (i.e., numbers) keep their JSON type in the header
+                header[name] = {"values": [None if value is _MISSING else value for value in values]}
+        elif kind == "cat":
+            names = list(dict.fromkeys(present))
+            code = {value: k for k, value in enumerate(names)}
+            arrays[name] = np.array([code.get(value, -1) if not value is _MISSING else -1 for value in values], dtype = np.int32)
+            header[name] = {"names": names}
+        elif kind == "str":
+            arrays[name] = np.array([value if not value is _MISSING else "" for value in values], dtype = str)
+        else:
+            flat = [v for value in present for v in (value if kind == "pair" else (value,))]
+            is_int = [_is_int(v) for v in flat]
+            dtype = np.int64 if all(is_int) else np.float64
+            fill = (0, 0) if kind == "pair" else 0
+            shape = (len(values), *((2,) if kind == "pair" else ()))
+            arrays[name] = np.array([value if not value is _MISSING else fill for value in values], dtype = dtype).reshape(shape)
+            if any(is_int) and not all(is_int): # mixed column: the integers are flagged
+                int_mask = np.zeros(shape, dtype = bool)
+                int_mask[~missing] = np.array(is_int, dtype = bool).reshape(-1, *shape[1:])
+                arrays[name + ".int"] = int_mask
+    return arrays, header
+
+def decode_records(arrays : dict, header : dict, columns : tuple, n : int) -> list:
+    """
+    Inverse of encode_records: rebuild the JSON records (list of dicts) from the arrays
+    """
+    records = [{} for _ in range(n)]
+    for keys, kind in columns:
+        name = ".".join(keys)
+        if kind == "id" and name in header:
+            values = header[name]["values"]
+        elif kind == "cat":
+            names = header[name]["names"]
+            values = [names[code] if code >= 0 else None for code in np.asarray(arrays[name]).tolist()]
+        else:
+            values = np.asarray(arrays[name]).tolist() # Python int/float/str (pairs as lists)
+            int_mask = arrays.get(name + ".int", None)
+            if not int_mask is None: # integers of a mixed number column
+                if kind == "pair":
+                    values = [[int(v) if is_int else v for v, is_int in zip(value, flags)] for value, flags in zip(values, np.asarray(int_mask).tolist())]
+                else:
+                    values = [int(value) if is_int else value for value, is_int in zip(values, np.asarray(int_mask).tolist())]
+        missing = arrays.get(name + ".missing", None)
+        missing = np.zeros(n, dtype = bool) if missing is None else np.asarray(missing)
+        for record, value, skip in zip(records, values, missing.tolist()):
+            if not skip:
+                _put(record, keys, value)
+    return records
+
+def write_snapshot(info_dict : dict, directory, vehicle_state : dict | None = None, extra : dict | None = None):
+    """
+    Write a warehouse (same dict as the JSON file: layout, storage, vehicle, charging_station) as a columnar snapshot
+    vehicle_state: optional dict of VEHICLE_STATE arrays aligned with the vehicle records
+    extra: optional JSON data of the caller kept in the header (i.e., journal sequence number)
+    The snapshot is written next to directory and swapped in at the end (an interrupted write leaves the old snapshot intact)
+    """
+    directory = os_path.normpath(directory)
+    temp_dir = directory + ".tmp"
+    if os_path.exists(temp_dir):
+        shutil.rmtree(temp_dir)
+    makedirs(temp_dir)
+    header = {"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "units": {}, "extra": extra or {}}
+    header.update({key: info_dict[key] for key in ("layout", "charging_station") if key in info_dict})
+    for kind, columns in (("storage", STORAGE_COLUMNS), ("vehicle", VEHICLE_COLUMNS)):
+        records = info_dict.get(kind, [])
+        arrays, column_header = encode_records(records, columns)
+        if kind == "vehicle" and not vehicle_state == None:
+            arrays.update({"state." + name: np.asarray(vehicle_state[name], dtype = np.float64) for name in VEHICLE_STATE if name in vehicle_state})
+        for name, array in arrays.items():
+            np.save(os_path.join(temp_dir, f"{kind}.{name}.npy"), array)
+        header["units"][kind] = {"n": len(records), "arrays": list(arrays.keys()), "columns": column_header, "present": kind in info_dict}
+    with open(os_path.join(temp_dir, HEADER_FILE), mode = "w") as file: # written last: a snapshot without header is incomplete
+        js_dump(header, file)
+    if os_path.exists(directory):
+        old_dir = directory + ".old"
+        if os_path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        replace(directory, old_dir)
+        replace(temp_dir, directory)
+        shutil.rmtree(old_dir)
+    else:
+        replace(temp_dir, directory)
+
+def read_snapshot(directory, mmap : bool = True):
+    """
+    Open a columnar snapshot: return (header, arrays) where arrays is a dict kind (storage/vehicle) -> dict of column name -> array
+    With mmap = True the arrays are memory-mapped (read-only, the pages are only read when used)
+    """
+    try:
+        with open(os_path.join(directory, HEADER_FILE), mode = "r") as file:
+            header : dict = js_load(file)
+    except (OSError, ValueError):
+        raise Exception("No snapshot of warehouse found!!!")
+    if not header.get("format", None) == SNAPSHOT_FORMAT or header.get("version", 0) > SNAPSHOT_VERSION:
+        raise Exception("Unsupported warehouse snapshot!!!")
+    arrays = {}
+    for kind, unit_header in header["units"].items():
+        arrays[kind] = {name: np.load(os_path.join(directory, f"{kind}.{name}.npy"), mmap_mode = "r" if mmap else None)
+                        for name in unit_header["arrays"]}
+    return header, arrays
+
+def snapshot_to_info(header : dict, arrays : dict) -> dict:
+    """
+    Rebuild the JSON dict of the warehouse from an opened snapshot (the fleet state columns have no JSON field)
+    """
+    info = {"layout": header["layout"]} if "layout" in header else {}
+    for kind, columns in (("storage", STORAGE_COLUMNS), ("vehicle", VEHICLE_COLUMNS)):
+        unit_header = header["units"][kind]
+        if not unit_header.get("present", True):
+            continue
+        info[kind] = decode_records(arrays[kind], unit_header["columns"], columns, unit_header["n"])
+    if "charging_station" in header:
+        info["charging_station"] = header["charging_station"]
+    return info
+
+def json_to_snapshot(json_file, directory):
+    """
+    Convert a warehouse JSON file into a columnar snapshot
+    """
+    with open(json_file, mode = "r") as file:
+        info_dict = js_load(file)
+    write_snapshot(info_dict, directory)
+
+def snapshot_to_json(directory, json_file):
+    """
+    Convert a columnar snapshot into a warehouse JSON file
+    """
+    header, arrays = read_snapshot(directory)
+    info_dict = snapshot_to_info(header, arrays)
+    with open(json_file, mode = "w") as file:
+        js_dump(info_dict, file)
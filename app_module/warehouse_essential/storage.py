@@ -2,10 +2,14 @@ import app_module.warehouse_essential.geometry as geometry
 from numbers import Number
 import pandas as pd
 import numpy as np
+from collections import defaultdict
+from app_module.warehouse_essential.unit_index import SlotIndex
 """
 Class for Shelf objects used in Warehouse class
 """
 class StorageUnit:
+    _change_sink = None # callable(unit) notified of the load/capacity changes (set by the Storage holding the unit)
+
     def __init__(self, id : str, center : tuple | list = (0, 0), load_loc : tuple | list = (0, 0), size : Number = 1, capacity : Number = 1, **kwargs) -> None:
         '''
         Define a single Storage unit (Square shape) object using id, size, capacity and center location\n
@@ -26,6 +30,7 @@ class StorageUnit:
         if cap <= 0:
             raise ValueError("Capacity needs to be a positive number!!!")
         self._capacity = cap
+        self._changed()
     def get_capacity(self):
         return self._capacity
     capacity = property(fget = get_capacity, fset = set_capacity)
@@ -33,7 +38,12 @@ class StorageUnit:
         return self._loading
     def set_load(self, load):
         self._loading = load
+        self._changed()
     load = property(fget = get_load, fset = set_load)
+    # Loading location
+    def get_load_loc(self):
+        return self._loading_location.xy
+    load_loc = property(fget = get_load_loc)
     # Geometry information
     def get_shape(self):
         return self._shape
@@ -89,6 +99,20 @@ class StorageUnit:
             unit.load = current_load
         return unit
 
+    @classmethod
+    def from_columns(cls, id, shape : geometry.Square, capacity, load = 0, category = "Generic", load_loc : geometry.Position | None = None):
+        """
+        Quick constructor used by the bulk loader (Storage.add_units), the values are assumed to be already validated
+        """
+        unit = cls.__new__(cls)
+        unit._id = id
+        unit._shape = shape
+        unit._capacity = capacity
+        unit._category = category
+        unit._loading = load
+        unit._loading_location = load_loc if isinstance(load_loc, geometry.Position) else geometry.Position((0, 0))
+        return unit
+
     def __add__(self, load): 
         added_load = 0
         if isinstance(load, Number):
@@ -96,6 +120,7 @@ class StorageUnit:
         if self._loading + added_load > self._capacity:
             raise StorageException(f"Overflow shelf {self._id}'s capacity!!!")
         self._loading += added_load
+        self._changed()
         return self
     
     def __sub__(self, load):
@@ -105,8 +130,13 @@ class StorageUnit:
         if self._loading - subed_load < 0:
             raise StorageException(f"Underflow shelf {self._id}'s capacity!!!")
         self._loading -= subed_load
+        self._changed()
         return self
     
+    def _changed(self):
+        if not self._change_sink == None:
+            self._change_sink(self)
+
     def get_loading_percent(self):
         return self._loading / self._capacity * 100
     load_percent = property(fget = get_loading_percent)
@@ -119,28 +149,233 @@ class StorageUnit:
 
 class Storage():
     def __init__(self):
-        self._dataframe = pd.DataFrame(columns = ["id", "unit"])
-        self._dataframe.set_index("id")
+        # Units and their occupied zones are kept in slot-aligned lists (None for the removed units) 
+        self._index = SlotIndex()
+        self._units = []
         self._occupied_zone = []
+        # Units loaded lazily (see add_units) are kept as columns and only built when asked for (get_unit, units)
+        self._lazy = None # columns of the lazy units: id, center, side, capacity, load, category, load_location, polygon
+        self._lazy_row = np.zeros(0, dtype = np.int64) # slot -> row of the unit in the lazy columns, -1 if the unit is built
+        self._polygon = np.zeros(0, dtype = object) # slot -> polygon (shapely) of the unit, for the batched geometric checks and drawing
+        # Dirty tracking of the loads: slot -> load version of the last load/capacity change of the unit (for the redraws)
+        self._load_clock = 0
+        self._load_version = np.zeros(0, dtype = np.int64)
+        self._dataframe = pd.DataFrame(columns = ["id", "unit"])
+        self._dataframe_version = self._index.version
+        self.change_sink = None # callable(operation, payload) notified of every change of the units (i.e., journal)
+
+    def _notify(self, operation : str, payload):
+        if not self.change_sink == None:
+            self.change_sink(operation, payload)
+
+    def _attach(self, units : list):
+        """
+        Report the load/capacity changes of the units held by the storage to its dirty tracking
+        """
+        for unit in units:
+            unit._change_sink = self._unit_changed
+    def _unit_changed(self, unit : StorageUnit):
+        if unit.id in self._index:
+            self._touch_loads(self._index.slot(unit.id))
+    def _touch_loads(self, slots):
+        self._load_clock += 1
+        self._load_version[slots] = self._load_clock
+    def _extend_slots(self, n : int, lazy_rows : np.ndarray | None = None):
+        """
+        Grow the slot-aligned arrays for n new slots (rows of the lazy columns, None for built units)
+        """
+        self._lazy_row = np.concatenate([self._lazy_row, np.full(n, -1, dtype = np.int64) if lazy_rows is None else lazy_rows])
+        self._load_version = np.concatenate([self._load_version, np.full(n, self._load_clock, dtype = np.int64)])
 
     def get_storage_dataframe(self):
+        """
+        Dataframe (index: id, columns: id, unit) of the storage units, only rebuilt after a change
+        """
+        if not self._dataframe_version == self._index.version:
+            ids = self._index.ids()
+            units = self.units()
+            self._dataframe = pd.DataFrame({"id": ids, "unit": units}, index = ids, columns = ["id", "unit"])
+            self._dataframe_version = self._index.version
         return self._dataframe
-    def set_storage_dataframe(self, new_data):
-        self._dataframe = new_data
+    def set_storage_dataframe(self, new_data : pd.DataFrame):
+        self.clear_all()
+        units = new_data["unit"].to_list()
+        self._index.add_many([unit.id for unit in units])
+        self._units += units
+        self._occupied_zone += [unit.shape for unit in units]
+        self._extend_slots(len(units))
+        self._attach(units)
+        self._polygon = np.concatenate([self._polygon, np.fromiter((unit.shape.polygon for unit in units), dtype = object, count = len(units))])
+        self._notify("add", [unit.unit_info() for unit in units])
     unit_list = property(fget = get_storage_dataframe, fset = set_storage_dataframe)
 
     def get_occupy(self):
-        return self._occupied_zone
+        slots = self._index.slots()
+        self._build_zones(slots[self._lazy_row[slots] >= 0])
+        return [self._occupied_zone[slot] for slot in slots]
     occupied = property(fget = get_occupy)
 
+    def get_unit(self, id) -> StorageUnit:
+        """
+        Return the storage unit of the id (built now if it was loaded lazily), raise KeyError if the id does not exist
+        """
+        slot = self._index.slot(id)
+        if self._lazy_row[slot] >= 0:
+            self._build_units(np.array([slot]))
+        return self._units[slot]
+
+    def __contains__(self, id) -> bool:
+        return id in self._index
+    def __len__(self) -> int:
+        return len(self._index)
+    def get_index_version(self):
+        """
+        Version of the set of units (changed by every add/remove)
+        """
+        return self._index.version
+    index_version = property(fget = get_index_version)
+    def get_load_version(self):
+        """
+        Version of the loads and capacities (changed by every change of a unit, see changed_rows)
+        """
+        return self._load_clock
+    load_version = property(fget = get_load_version)
+
+    def changed_rows(self, since : int) -> np.ndarray:
+        """
+        Positions (aligned with ids()) of the units whose load or capacity changed after the load version since
+        """
+        return np.flatnonzero(self._load_version[self._index.slots()] > since)
+
+    def units(self) -> list:
+        """
+        List of all the storage units (the lazy units are all built, see the column accessors below to avoid it)
+        """
+        slots = self._index.slots()
+        self._build_units(slots[self._lazy_row[slots] >= 0])
+        return [self._units[slot] for slot in slots]
+
+    # Column accessors (aligned with ids(), the lazy units are read from their columns without being built)
+    def ids(self) -> list:
+        return self._index.ids()
+
+    def _column(self, name : str, getter, dtype, rows = None) -> np.ndarray:
+        slots = self._index.slots()
+        if not rows is None:
+            slots = slots[rows]
+        rows = self._lazy_row[slots]
+        lazy = rows >= 0
+        values = np.empty(len(slots), dtype = dtype)
+        if lazy.any():
+            values[lazy] = self._lazy[name][rows[lazy]]
+        built = [getter(self._units[slot]) for slot in slots[~lazy]]
+        if len(built) > 0:
+            values[~lazy] = built
+        return values
+
+    def polygons(self) -> np.ndarray:
+        """
+        Polygons (shapely) of the storage units
+        """
+        return self._polygon[self._index.slots()]
+
+    def intersecting_zones(self, polygons) -> list:
+        """
+        Occupied zones of the storage units intersecting any of the polygons (only these zones of the lazy units are built)
+        """
+        slots = self._index.slots()
+        if len(slots) == 0 or len(polygons) == 0:
+            return []
+        _, hit = geometry.STRtree(self._polygon[slots]).query(np.asarray(polygons, dtype = object), predicate = "intersects")
+        slots = slots[np.unique(hit)]
+        self._build_zones(slots[self._lazy_row[slots] >= 0])
+        return [self._occupied_zone[slot] for slot in slots]
+
+    def loads(self, rows = None) -> np.ndarray:
+        """
+        Loads of the storage units (rows: positions in ids() to read only some of them, None for all)
+        """
+        return self._column("load", lambda unit: unit.load, np.float64, rows)
+
+    def capacities(self, rows = None) -> np.ndarray:
+        return self._column("capacity", lambda unit: unit.capacity, np.float64, rows)
+
+    def categories(self) -> np.ndarray:
+        return self._column("category", lambda unit: unit.category, object)
+
+    def load_loc(self, id) -> tuple:
+        """
+        Loading location of a storage unit (a lazy unit is not built), raise KeyError if the id does not exist
+        """
+        slot = self._index.slot(id)
+        row = self._lazy_row[slot]
+        if row >= 0:
+            return tuple(self._lazy["load_location"][row].tolist())
+        return self._units[slot].load_loc
+
+    @staticmethod
+    def _make_units(ids, center, side, capacity, load, category, load_location, polygons, shapes = None) -> list:
+        """
+        Build storage units from validated columns (shapes: prebuilt zones of the units, None to build them)
+        """
+        sides = np.asarray(side).tolist()
+        if shapes == None:
+            refs = [geometry.Position.from_point(pt) for pt in geometry.shapely.points(center)]
+            shapes = [geometry.Square.from_polygon(polygon, (s, s), ref) for polygon, s, ref in zip(polygons, sides, refs)]
+        # Loading locations are mostly shared (i.e., (0, 0)), only create the distinct points
+        unique_loc, loc_idx = np.unique(np.asarray(load_location).reshape(-1, 2), axis = 0, return_inverse = True)
+        unique_loc = geometry.shapely.points(unique_loc)
+        load_locs = [geometry.Position.from_point(unique_loc[k]) for k in loc_idx.reshape(-1)]
+        return [StorageUnit.from_columns(unit_id, shape, cap, ld, cat, load_loc)
+                for unit_id, shape, cap, ld, cat, load_loc in zip(ids, shapes, np.asarray(capacity).tolist(), np.asarray(load).tolist(), category, load_locs)]
+
+    def _build_zones(self, slots : np.ndarray):
+        """
+        Build the occupied zones (shapes) of lazy units without building the units
+        """
+        missing = [slot for slot in slots if self._occupied_zone[slot] == None]
+        if len(missing) > 0:
+            rows = self._lazy_row[missing]
+            lazy = self._lazy
+            refs = [geometry.Position.from_point(pt) for pt in geometry.shapely.points(lazy["center"][rows])]
+            for slot, polygon, s, ref in zip(missing, lazy["polygon"][rows], lazy["side"][rows].tolist(), refs):
+                self._occupied_zone[slot] = geometry.Square.from_polygon(polygon, (s, s), ref)
+
+    def _build_units(self, slots : np.ndarray):
+        """
+        Build the units of lazy slots
+        """
+        if len(slots) == 0:
+            return
+        self._build_zones(slots)
+        rows = self._lazy_row[slots]
+        lazy = self._lazy
+        units = self._make_units(lazy["id"][rows], lazy["center"][rows], lazy["side"][rows], lazy["capacity"][rows], lazy["load"][rows],
+                                 lazy["category"][rows], lazy["load_location"][rows], lazy["polygon"][rows], [self._occupied_zone[slot] for slot in slots])
+        for slot, unit in zip(slots, units):
+            self._units[slot] = unit
+        self._lazy_row[slots] = -1
+        self._attach(units)
+
+    @staticmethod
+    def _lazy_record(lazy : dict, row : int, load = None) -> dict:
+        """
+        unit_info() record of a lazy unit (same values as the record of the built unit)
+        """
+        center = lazy["center"][row].tolist()
+        side = float(lazy["side"][row])
+        return {"id": lazy["id"][row],
+                "cap": float(lazy["capacity"][row]),
+                "load_location": tuple(lazy["load_location"][row].tolist()),
+                "geo": {"type": "Square", "dimension": (side, side), "ref_pt_type": "center", "buffer": 0, "ref_pt": tuple(center)},
+                "load": float(lazy["load"][row]) if load == None else load,
+                "type": lazy["category"][row]}
+
     def add_unit(self, new_unit : StorageUnit, warehouse_layout : geometry.PolygonShape | None = None, occupied_zone : pd.Series | None = None):
         error_list = []
         new_id = new_unit.id
         # Criterion 1: No duplicate id
-        if self._dataframe.index.empty:
-            crit1 = True
-        else:
-            crit1 = not new_id in self._dataframe.index.to_list()
+        crit1 = not new_id in self._index
         # Criterion 2: Inside the warehouse (if applicable)
         if not warehouse_layout == None:
             crit2 = warehouse_layout.check_contain(new_unit.shape)
@@ -155,10 +390,10 @@ class Storage():
         else:
             crit3 = True
         # Criterion 4: No collision (in case no occupied zone is provided)
-        if self._dataframe.index.empty:
+        if self.empty:
             crit4 = True
         else:
-            crit4 = not self._dataframe["unit"].apply(lambda units, new_unit: units.shape.check_interference(new_unit), args = (new_unit.shape,)).sum()
+            crit4 = not geometry.shapely.intersects(self.polygons(), new_unit.shape.polygon).any()
         if not crit1:
             error_list.append(f"ID# {new_id} is already in the dataframe!!!")
         if not crit2:
@@ -167,57 +402,281 @@ class Storage():
             error_list.append("Collision with existing object(s)")
         combine_cond = crit1 and crit2 and crit3 and crit4
         if combine_cond:
-            self._dataframe.loc[new_id, ["id", "unit"]] = [new_id, new_unit]
+            self._index.add(new_id)
+            self._units.append(new_unit)
             self._occupied_zone.append(geometry.Square.from_dict(new_unit.shape.shape_description()))
+            self._extend_slots(1)
+            self._attach([new_unit])
+            self._polygon = np.append(self._polygon, np.array([None], dtype = object))
+            self._polygon[-1] = new_unit.shape.polygon
+            self._notify("add", [new_unit.unit_info()])
         return error_list
+
+    def remove_unit(self, id):
+        """
+        Remove a storage unit and its occupied zone, raise KeyError if the id does not exist
+        The slot is only marked dead, the lists are compacted once enough units are removed (amortized O(1))
+        """
+        slot = self._index.remove(id)
+        if not self._units[slot] == None:
+            self._units[slot]._change_sink = None
+        self._units[slot] = None
+        self._occupied_zone[slot] = None
+        self._lazy_row[slot] = -1
+        self._polygon[slot] = None
+        if self._index.need_compact():
+            self._compact()
+        self._notify("remove", [id])
+
+    def remove_units(self, ids):
+        """
+        Remove multiple storage units at once
+        Return the list of ids that do not exist
+        """
+        missing = []
+        for id in ids:
+            try:
+                self.remove_unit(id)
+            except KeyError:
+                missing.append(id)
+        return missing
+
+    def _compact(self):
+        keep = self._index.compact()
+        self._units = [self._units[slot] for slot in keep]
+        self._occupied_zone = [self._occupied_zone[slot] for slot in keep]
+        self._lazy_row = self._lazy_row[keep]
+        self._load_version = self._load_version[keep]
+        self._polygon = self._polygon[keep]
     
     def storage_info(self):
-        info = self._dataframe["unit"].apply(lambda unit : unit.unit_info()).to_list()
-        return info
+        return Storage.captured_info(self.capture_info())
 
-    def load_info(self, unit_infos, warehouse_layout : geometry.PolygonShape | None = None, occupied_zone : pd.Series | None = None):
-        _quick_conv = np.vectorize(StorageUnit.load_unit, otypes = [StorageUnit]) # Input an array of storage unit data
-        units = _quick_conv(unit_infos)
-        for unit in units:
-            self.add_unit(unit, warehouse_layout,occupied_zone)
+    def capture_info(self):
+        """
+        Cheap capture of the storage units for a background save: the units (row of the lazy units) and their mutable fields (load, capacity, category)
+        The records are built later by captured_info, on any thread (the shapes and locations of the units do not change)
+        """
+        items, fields = [], []
+        for slot, row in zip(self._index.slots().tolist(), self._lazy_row[self._index.slots()].tolist()):
+            if row >= 0:
+                items.append(row)
+                fields.append((float(self._lazy["load"][row]), None, None))
+            else:
+                unit = self._units[slot]
+                items.append(unit)
+                fields.append((unit.load, unit.capacity, unit.category))
+        return self._lazy, items, fields
+
+    @staticmethod
+    def captured_info(capture) -> list:
+        """
+        Records of a capture_info (same as storage_info at the time of the capture)
+        """
+        return list(Storage.iter_captured_info(capture))
+
+    @staticmethod
+    def iter_captured_info(capture):
+        """
+        Generator version of captured_info (one record at a time, i.e., streamed to a file)
+        """
+        lazy, items, fields = capture
+        for item, (load, capacity, category) in zip(items, fields):
+            if isinstance(item, StorageUnit):
+                record = item.unit_info()
+                record.update({"cap": capacity, "load": load, "type": category})
+            else:
+                record = Storage._lazy_record(lazy, item, load)
+            yield record
+
+    def load_info(self, unit_infos, warehouse_layout : geometry.PolygonShape | None = None, occupied_zone : pd.Series | None = None, lazy : bool = False):
+        """
+        Bulk conversion of data of multiple storage units (list of unit_info() dictionaries) into StorageUnit(s) (built on demand if lazy, see add_units)
+        Return the error report: list of (record index, id, list of errors) of the rejected records
+        """
+        columns, error_report = self.parse_unit_infos(unit_infos)
+        error_report += self.add_units(columns, warehouse_layout, occupied_zone, lazy)
+        error_report.sort(key = lambda report : report[0])
+        return error_report
+
+    @staticmethod
+    def parse_unit_infos(unit_infos):
+        """
+        Parse a list of unit_info() dictionaries into columns (dict of arrays) for add_units()
+        Return (columns, error report of the records that cannot be parsed)
+        """
+        error_report = []
+        records = []
+        for k, info in enumerate(unit_infos):
+            try:
+                geo_info : dict = info.get("geo", {})
+                center = geo_info.get("ref_pt", (0, 0))
+                load_location = info.get("load_location", (0, 0))
+                records.append((k, info.get("id", None),
+                                float(center[0]), float(center[1]),
+                                float(geo_info.get("dimension", (1, 1))[0]),
+                                float(info.get("cap", 1)),
+                                float(info.get("load", 0)),
+                                info.get("type", None) or "Generic",
+                                float(load_location[0]), float(load_location[1])))
+            except (AttributeError, TypeError, ValueError, IndexError):
+                error_report.append((k, None if not isinstance(info, dict) else info.get("id", None), ["Invalid storage unit record!!!"]))
+        if len(records) > 0:
+            row, ids, x, y, side, cap, load, category, load_x, load_y = zip(*records)
+        else:
+            row = ids = x = y = side = cap = load = category = load_x = load_y = ()
+        columns = {"row": np.array(row, dtype = np.int64),
+                   "id": list(ids),
+                   "center": np.column_stack([np.array(x, dtype = np.float64), np.array(y, dtype = np.float64)]),
+                   "side": np.array(side, dtype = np.float64),
+                   "capacity": np.array(cap, dtype = np.float64),
+                   "load": np.array(load, dtype = np.float64),
+                   "category": list(category),
+                   "load_location": np.column_stack([np.array(load_x, dtype = np.float64), np.array(load_y, dtype = np.float64)])}
+        return columns, error_report
+
+    def add_units(self, columns : dict, warehouse_layout : geometry.PolygonShape | None = None, occupied_zone : pd.Series | None = None, lazy : bool = False):
+        """
+        Bulk version of add_unit(): validate all the units in one batched pass and insert the valid ones in a single allocation
+        columns: dict of arrays as returned by parse_unit_infos() ("row" is optional)
+        lazy: keep the valid units as columns, each unit is only built when it is asked for (i.e., large warehouse opened for display)
+        Return the error report: list of (record index, id, list of errors) of the rejected units
+        """
+        ids = list(columns["id"])
+        n = len(ids)
+        if n == 0:
+            return []
+        rows = columns.get("row", np.arange(n))
+        center = np.asarray(columns["center"], dtype = np.float64).reshape(-1, 2)
+        side = np.asarray(columns["side"], dtype = np.float64)
+        capacity = np.asarray(columns["capacity"], dtype = np.float64)
+        load = np.asarray(columns.get("load", np.zeros(n)), dtype = np.float64)
+        category = list(columns.get("category", ["Generic"] * n))
+        load_location = np.asarray(columns.get("load_location", np.zeros((n, 2))), dtype = np.float64).reshape(-1, 2)
+        errors = defaultdict(list)
+        # Record validity (same checks as the constructors)
+        valid = np.ones(n, dtype = bool)
+        for k in np.flatnonzero(~(side > 0)):
+            errors[k].append("Length has to be a positive value!!!")
+        for k in np.flatnonzero(~(capacity > 0)):
+            errors[k].append("Capacity needs to be a positive number!!!")
+        valid &= (side > 0) & (capacity > 0)
+        polygons = np.full(n, None, dtype = object)
+        polygons[valid] = geometry.box_polygons(center[valid], np.column_stack([side[valid], side[valid]]))
+        # Criterion 2: Inside the warehouse (if applicable)
+        if not warehouse_layout == None:
+            inside = np.zeros(n, dtype = bool)
+            if type(warehouse_layout) == geometry.Rectangle: # axis-aligned layout: compare the bounds only
+                min_x, min_y, max_x, max_y = warehouse_layout.polygon.bounds
+                half = side[valid] / 2
+                inside[valid] = ((center[valid, 0] - half > min_x) & (center[valid, 0] + half < max_x)
+                                 & (center[valid, 1] - half > min_y) & (center[valid, 1] + half < max_y))
+            else:
+                inside[valid] = geometry.shapely.contains_properly(warehouse_layout.polygon, polygons[valid])
+            for k in np.flatnonzero(valid & ~inside):
+                errors[k].append(f"Out of bound! Violation of Warehouse Space!!!")
+            valid &= inside
+        # Criterion 3 & 4: No collision with the existing objects (indexed check)
+        existing = list(self.polygons())
+        if isinstance(occupied_zone, pd.Series):
+            existing += [zone.polygon for zone in occupied_zone]
+        candidates = np.flatnonzero(valid)
+        hit_existing, earlier = geometry.batch_conflicts(polygons[candidates], existing)
+        # Criterion 1 & collision in the batch: the first unit wins (same as adding the units one by one)
+        used_ids = set() # ids accepted in this batch
+        accepted = np.zeros(len(candidates), dtype = bool)
+        for j, k in enumerate(candidates):
+            if ids[k] in used_ids or ids[k] in self._index:
+                errors[k].append(f"ID# {ids[k]} is already in the dataframe!!!")
+            if hit_existing[j] or (j in earlier and accepted[earlier[j]].any()):
+                errors[k].append("Collision with existing object(s)")
+            if not k in errors:
+                accepted[j] = True
+                used_ids.add(ids[k])
+        keep = candidates[accepted]
+        # Build the units and the table at once
+        if len(keep) > 0:
+            new_ids = [ids[k] for k in keep]
+            new_category = [category[k] for k in keep]
+            self._index.add_many(new_ids)
+            if lazy:
+                self._add_lazy({"id": np.fromiter(new_ids, dtype = object, count = len(keep)), "center": center[keep], "side": side[keep],
+                                "capacity": capacity[keep], "load": load[keep], "category": np.fromiter(new_category, dtype = object, count = len(keep)),
+                                "load_location": load_location[keep], "polygon": polygons[keep]})
+            else:
+                new_units = self._make_units(new_ids, center[keep], side[keep], capacity[keep], load[keep], new_category, load_location[keep], polygons[keep])
+                self._units += new_units
+                self._occupied_zone += [unit.shape for unit in new_units] # storage units never move, the zone can share their (immutable) polygon
+                self._extend_slots(len(new_units))
+                self._attach(new_units)
+            self._polygon = np.concatenate([self._polygon, polygons[keep]])
+            if not self.change_sink == None:
+                start = len(self._lazy["polygon"]) - len(keep) if lazy else 0
+                self._notify("add", [self._lazy_record(self._lazy, start + k) for k in range(len(keep))] if lazy else [unit.unit_info() for unit in new_units])
+        return [(int(rows[k]), ids[k], errors[k]) for k in sorted(errors)]
     
-    def change_storage_load(self, load_change_data : list, abort_change : bool = False):
+    def _add_lazy(self, columns : dict):
+        """
+        Append validated columns of new units (already in the index) as lazy units
+        """
+        n = len(columns["polygon"])
+        start = 0 if self._lazy == None else len(self._lazy["polygon"])
+        if self._lazy == None:
+            self._lazy = columns
+        else:
+            self._lazy = {name: np.concatenate([self._lazy[name], column]) for name, column in columns.items()}
+        self._units += [None] * n
+        self._occupied_zone += [None] * n
+        self._extend_slots(n, np.arange(start, start + n, dtype = np.int64))
+
+    def change_storage_load(self, load_change_data, abort_change : bool = False, keep_log : bool = True):
         """
         Method to mass change the loading variable of each of the storage unit in the storage dataframe
         The format of each of item in the list load_change_data = [item1, item2, ..., item n] where item(i) is a tuple of (id, action - Load/Unload, delta_load > 0)
         Set abort_change = True to ignore all the change if error occur
+        Set keep_log = False to skip building the change messages (only the number of changes is needed for large orders)
         """
         # Handle of error
         error_signal = False
         error_msg = ""
         change_log = [] # list of string, contain change made in the process
-        self._dataframe["current_load"] = self._dataframe["unit"].apply(lambda x : x.load) # create a data frame to store original data (in case that revert action needed)
+        n_change = 0
+        changed = {} # id -> unit of the changed units
+        if abort_change:
+            original_load = self.load_snapshot() # store original data (in case that revert action needed)
         
         for data in load_change_data:
             try:
                 load = float(data[2])
+                # Not allow missing (NaN) or infinite load/unload amount
+                if not np.isfinite(load):
+                    error_signal = True
+                    error_msg = "Invalid load amount!!!"
+                    break
                 # Not allow negative load/unload amount
-                if load < 0:
+                elif load < 0:
                     error_signal = True
                     error_msg = "Negative load detected!!!"
                     break
                 elif load == 0:
                     continue # irgnore the value and continue (no error here)
+                unit : StorageUnit = self.get_unit(data[0])
                 # Check authorized action
                 if data[1] == "Load":
-                    msg = f"  \u2022 Storage unit ID# {data[0]}: {self._dataframe['unit'][data[0]].load} \u2192 " #\u2192 : right arrow
-                    self._dataframe["unit"][data[0]] + load
-                    msg += f"{self._dataframe['unit'][data[0]].load}"
-                    change_log.append(msg)
+                    msg = f"  \u2022 Storage unit ID# {data[0]}: {unit.load} \u2192 " if keep_log else "" #\u2192 : right arrow
+                    unit + load
                 elif data[1] == "Unload":
-                    msg = f"  \u2022 Storage unit ID# {data[0]}: {self._dataframe['unit'][data[0]].load} \u2192 "
-                    self._dataframe["unit"][data[0]] - load
-                    msg += f"{self._dataframe['unit'][data[0]].load}"
-                    change_log.append(msg)
+                    msg = f"  \u2022 Storage unit ID# {data[0]}: {unit.load} \u2192 " if keep_log else ""
+                    unit - load
                 else:
                     error_signal = True
                     error_msg = "Invalid action!!!"
                     break
+                n_change += 1
+                changed[data[0]] = unit
+                if keep_log:
+                    msg += f"{unit.load}"
+                    change_log.append(msg)
             except StorageException as e:
                 error_signal = True
                 error_msg = e.__str__()
@@ -239,20 +698,59 @@ class Storage():
                 error_msg = "Unknown error!!!"
                 break
         if error_signal and abort_change:
-            self._dataframe.apply(lambda row : row["unit"].set_load(row["current_load"]), axis = 1)
-            # Remove the addtional data frame
-            self._dataframe = self._dataframe.drop(columns=["current_load"])
+            self._set_loads(original_load)
             change_log = []
-        return (not error_signal), error_msg, change_log
+            n_change = 0
+        elif len(changed) > 0:
+            self._notify("load", {"ids": list(changed.keys()), "loads": [unit.load for unit in changed.values()]})
+        if keep_log:
+            return (not error_signal), error_msg, change_log
+        return (not error_signal), error_msg, n_change
+
+    def load_snapshot(self) -> pd.Series:
+        """
+        Return the current load of every storage unit (indexed by id)
+        """
+        return pd.Series(self.loads().tolist(), index = self.ids(), dtype = object)
+
+    def restore_load(self, snapshot : pd.Series):
+        """
+        Revert the load of the storage units to a snapshot taken by load_snapshot()
+        """
+        restored = self._set_loads(snapshot)
+        if len(restored) > 0:
+            self._notify("load", {"ids": restored, "loads": [float(snapshot[unit_id]) for unit_id in restored]})
+    def _set_loads(self, snapshot : pd.Series) -> list:
+        restored = []
+        for unit_id, load in snapshot.items():
+            if unit_id in self._index:
+                slot = self._index.slot(unit_id)
+                if self._lazy_row[slot] >= 0: # not built: its load is still in the columns
+                    self._lazy["load"][self._lazy_row[slot]] = load
+                    self._touch_loads(slot)
+                else:
+                    self._units[slot].set_load(load)
+                restored.append(unit_id)
+        return restored
 
     def clear_all(self):
         """
         Wipe out all the storage units from the dataframe
         """
-        self._dataframe = self._dataframe.iloc[0:0]
+        for unit in self._units:
+            if not unit == None:
+                unit._change_sink = None
+        self._index.clear()
+        self._units = []
+        self._occupied_zone = []
+        self._lazy = None
+        self._lazy_row = np.zeros(0, dtype = np.int64)
+        self._load_version = np.zeros(0, dtype = np.int64)
+        self._polygon = np.zeros(0, dtype = object)
+        self._notify("clear", None)
 
     def _is_empty(self):
-        return self._dataframe.index.empty
+        return len(self._index) == 0
     """
     Return whether there is any unit in the current Storage 
     """
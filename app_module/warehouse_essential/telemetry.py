@@ -0,0 +1,248 @@
+import asyncio
+import json
+import numpy as np
+from os import path as os_path
+from threading import Thread, Lock, Event
+from app_module.warehouse_essential.vehicle import Vehicles
+"""
+Live telemetry of the vehicles (position, orientation, battery) read from a socket or a tailed file on an asyncio loop
+"""
+TELEMETRY_FORMATS = ("ndjson", "csv")
+TELEMETRY_FIELDS = ("id", "x", "y", "ort", "battery", "time") # csv column order (no header), the trailing fields are optional
+SOURCE_PREFIXES = ("tcp://", "unix://") # otherwise the source is a file path
+
+def parse_update(line : str, file_format : str = "ndjson"):
+    """
+    Parse one telemetry line into (id, (x, y, ort, battery, time)), NaN for the values which are not reported
+    ndjson: {"id": ..., "x": ..., "y": ..., "ort": ..., "battery": ..., "time": ...} ("pos": [x, y] is accepted as well)
+    Raise ValueError for a malformed line (i.e., id which is not a text or an integer, pos which is not a pair)
+    """
+    if file_format == "ndjson":
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(record, dict) or not "id" in record:
+            raise ValueError("Telemetry record without id!!!")
+        id = record["id"]
+        if isinstance(id, bool) or not isinstance(id, (str, int)):
+            raise ValueError("Telemetry id has to be a text or an integer!!!")
+        if "pos" in record:
+            if not isinstance(record["pos"], (list, tuple)) or not len(record["pos"]) == 2:
+                raise ValueError("Telemetry pos has to be [x, y]!!!")
+            record["x"], record["y"] = record["pos"]
+        values = [record.get(field, None) for field in TELEMETRY_FIELDS[1:]]
+    else:
+        fields = [field.strip() for field in line.split(",")]
+        if len(fields) > len(TELEMETRY_FIELDS) or fields[0] == "":
+            raise ValueError("Invalid telemetry line!!!")
+        id = fields[0]
+        values = fields[1:] + [None] * (len(TELEMETRY_FIELDS) - len(fields))
+    try:
+        values = tuple(np.nan if value in (None, "") else float(value) for value in values)
+    except (TypeError, ValueError):
+        raise ValueError("Non-numerical telemetry value!!!")
+    if np.isnan(values[0]) != np.isnan(values[1]):
+        raise ValueError("Position needs both x and y!!!")
+    return id, values
+
+class TelemetryService():
+    def __init__(self, vehicles : Vehicles, source : str, file_format : str | None = None, lock = None,
+                 min_interval : float = 0.0, poll_interval : float = 0.2, reconnect_delay : float = 2.0, from_start : bool = False) -> None:
+        '''
+        Read telemetry updates from source on an asyncio loop (own thread), the GUI timer is never blocked by the feed:
+            source: "tcp://host:port", "unix://path" (the service connects to the fleet manager) or a file path (tailed)
+            file_format: ndjson or csv (inferred from the file extension for a file, ndjson for a socket)
+        The updates are coalesced per vehicle (the latest wins) and applied to the vehicles in batches under lock
+        (shared with the simulation), as fast as the feed produces them but at most every min_interval seconds\n
+        poll_interval: wait at the end of a tailed file, reconnect_delay: wait before reconnecting a lost socket,
+        from_start: read a tailed file from its beginning (i.e., replayed file) instead of its end
+        '''
+        if file_format == None:
+            file_format = "csv" if str(source).endswith(".csv") else "ndjson"
+        if not file_format in TELEMETRY_FORMATS:
+            raise ValueError("Invalid telemetry format!!!")
+        if str(source).startswith("unix://") and not hasattr(asyncio, "open_unix_connection"):
+            raise ValueError("Unix sockets are not supported on this platform!!!")
+        if str(source).startswith("tcp://"):
+            host, _, port = source[len("tcp://"):].rpartition(":")
+            if not port.isdigit():
+                raise ValueError("TCP source must be tcp://host:port!!!")
+        self._vehicles = vehicles
+        self._source = str(source)
+        self._format = file_format
+        self._lock = Lock() if lock == None else lock
+        self.min_interval = min_interval
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self._from_start = from_start
+        self._pending = {} # vehicle id -> latest (x, y, ort, battery, time), only touched by the loop thread
+        self._last_time = {} # vehicle id -> time of its latest update
+        self._stats = {"received": 0, "coalesced": 0, "rejected": 0, "applied": 0, "batches": 0}
+        self._unknown = set() # reported ids which are not in the vehicles
+        self._error = None # last error of the feed (i.e., lost connection)
+        self._loop = None
+        self._stop = None
+        self._wake = None
+        self._thread = None
+        self._ready = Event() # set once the loop is running
+
+    def get_source(self):
+        return self._source
+    source = property(fget = get_source)
+    def get_vehicles(self):
+        return self._vehicles
+    def set_vehicles(self, vehicles : Vehicles):
+        """
+        Apply the next updates to other vehicles (i.e., a new warehouse is loaded)
+        """
+        with self._lock:
+            self._vehicles = vehicles
+            self._unknown = set()
+    vehicles = property(fget = get_vehicles, fset = set_vehicles)
+    def get_stats(self):
+        """
+        Counters of the feed: received/coalesced (overwritten before being applied)/rejected (malformed) lines, applied updates and batches
+        """
+        return dict(self._stats)
+    stats = property(fget = get_stats)
+    def get_unknown(self):
+        return set(self._unknown)
+    unknown = property(fget = get_unknown)
+    def get_error(self):
+        return self._error
+    error = property(fget = get_error)
+    def get_running(self):
+        return not self._thread == None and self._thread.is_alive()
+    running = property(fget = get_running)
+
+    def start(self):
+        if self.running:
+            return
+        self._ready.clear()
+        self._thread = Thread(target = asyncio.run, args = (self._main(),), daemon = True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self, timeout : float | None = 5.0):
+        """
+        Stop reading, apply the pending updates and join the loop thread
+        """
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(timeout)
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._ready.set()
+        if self._source.startswith(SOURCE_PREFIXES):
+            reader = asyncio.create_task(self._read_socket())
+        else:
+            reader = asyncio.create_task(self._read_file())
+        applier = asyncio.create_task(self._apply_loop())
+        await self._stop.wait()
+        reader.cancel()
+        self._wake.set()
+        await asyncio.gather(reader, return_exceptions = True)
+        await applier
+
+    # Feed readers
+    def _receive(self, line : bytes):
+        line = line.decode("utf-8", errors = "replace").strip()
+        if line == "":
+            return
+        try:
+            id, values = parse_update(line, self._format)
+        except Exception: # malformed line: counted, a bad line never ends the feed
+            self._stats["rejected"] += 1
+            return
+        self._stats["received"] += 1
+        if values[4] < self._last_time.get(id, -np.inf): # out-of-order update (older timestamp): dropped
+            self._stats["coalesced"] += 1
+            return
+        if not np.isnan(values[4]):
+            self._last_time[id] = values[4]
+        if id in self._pending:
+            self._stats["coalesced"] += 1
+        self._pending[id] = values
+        self._wake.set()
+
+    async def _read_socket(self):
+        while True:
+            try:
+                if self._source.startswith("tcp://"):
+                    host, _, port = self._source[len("tcp://"):].rpartition(":")
+                    reader, writer = await asyncio.open_connection(host or "127.0.0.1", int(port))
+                else:
+                    reader, writer = await asyncio.open_unix_connection(self._source[len("unix://"):])
+            except OSError as e:
+                self._error = e
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            self._error = None
+            try:
+                while True:
+                    line = await reader.readline()
+                    if line == b"": # closed by the fleet manager
+                        break
+                    self._receive(line)
+            except (OSError, ValueError) as e: # lost connection or line longer than the stream limit
+                self._error = e
+            finally:
+                writer.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _read_file(self):
+        file = None
+        try:
+            while True:
+                if file == None:
+                    try:
+                        file = open(self._source, mode = "rb")
+                    except OSError as e:
+                        self._error = e
+                        await asyncio.sleep(self.reconnect_delay)
+                        continue
+                    self._error = None
+                    if not self._from_start:
+                        file.seek(0, 2)
+                    partial = b""
+                line = file.readline()
+                if line.endswith(b"\n"):
+                    self._receive(partial + line)
+                    partial = b""
+                    continue
+                partial += line # line still being written
+                if os_path.getsize(self._source) < file.tell(): # truncated or replaced: read it again from the beginning
+                    file.close()
+                    file = None
+                    self._from_start = True
+                    continue
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            if not file == None:
+                file.close()
+
+    # Batch application
+    async def _apply_loop(self):
+        while not self._stop.is_set() or len(self._pending) > 0:
+            await self._wake.wait()
+            self._wake.clear()
+            if len(self._pending) == 0:
+                continue
+            batch, self._pending = self._pending, {}
+            await self._loop.run_in_executor(None, self._apply, batch) # waits for the lock without blocking the readers
+            if self.min_interval > 0 and not self._stop.is_set():
+                await asyncio.sleep(self.min_interval)
+
+    def _apply(self, batch : dict):
+        ids = list(batch.keys())
+        values = np.array(list(batch.values()), dtype = np.float64).reshape(-1, 5)
+        with self._lock:
+            unknown = self._vehicles.apply_telemetry(ids, values[:, 0:2], values[:, 2], values[:, 3])
+        self._unknown.update(unknown)
+        self._stats["applied"] += len(ids) - len(unknown)
+        self._stats["batches"] += 1
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from os import path as os_path, makedirs
+from threading import Thread, Lock
+from queue import Queue, Empty
+"""
+Trip log of the vehicles: one row for every completed or aborted path, buffered in memory and written on a background thread
+"""
+DEFAULT_TRIP_LOG = ".\\Metadata\\OperationData\\trip_log.csv"
+TRIP_DTYPE = np.dtype([("id", "U32"), ("start_time", np.float64), ("end_time", np.float64), ("distance", np.float64),
+                       ("waypoints", np.int64), ("battery_delta", np.float64), ("completed", bool), ("collision", bool)])
+TRIP_COLUMNS = list(TRIP_DTYPE.names)
+BUFFER_DTYPE = np.dtype([("id", object)] + [(column, TRIP_DTYPE[column]) for column in TRIP_COLUMNS[1:]]) # ids of any length in memory
+ID_LENGTH = TRIP_DTYPE["id"].itemsize // 4 # longest id of the raw NumPy records
+TRIP_FORMATS = ("csv", "bin") # text file or raw NumPy records (readable with np.fromfile(filename, TRIP_DTYPE))
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+class TripLogger():
+    def __init__(self, filename = DEFAULT_TRIP_LOG, file_format : str | None = None, batch_size : int = 1024, flush_interval : float = 5.0) -> None:
+        '''
+        Collect the trip rows in a columnar buffer of batch_size rows, full buffers are written by a worker thread
+        (partial buffers are written every flush_interval seconds), so logging never waits for the disk
+        file_format is inferred from the extension (.bin: raw NumPy records, otherwise csv)
+        The times are written in local time, the rows of an id longer than ID_LENGTH are not written to a .bin file (see error)
+        '''
+        if file_format == None:
+            file_format = "bin" if str(filename).endswith(".bin") else "csv"
+        if not file_format in TRIP_FORMATS:
+            raise ValueError("Invalid trip log format!!!")
+        self._filename = filename
+        self._format = file_format
+        self._batch_size = max(1, int(batch_size))
+        self._flush_interval = flush_interval
+        self._lock = Lock() # only held to swap the buffer
+        self._buffer = np.zeros(self._batch_size, dtype = BUFFER_DTYPE)
+        self._n = 0
+        self._written = 0
+        self._error = None # last error of the writer (the simulation is never interrupted)
+        self._queue = Queue()
+        self._closed = False
+        self._thread = Thread(target = self._write_loop, daemon = True)
+        self._thread.start()
+
+    def get_filename(self):
+        return self._filename
+    filename = property(fget = get_filename)
+    def get_written(self):
+        """
+        Number of rows written to the file
+        """
+        return self._written
+    written = property(fget = get_written)
+    def get_error(self):
+        return self._error
+    error = property(fget = get_error)
+
+    def log(self, ids, rows : dict):
+        """
+        Append trips to the buffer: ids (list) and rows (dict of column -> array, see TRIP_COLUMNS)
+        """
+        if self._closed:
+            return
+        k, n_row = 0, len(ids)
+        while k < n_row:
+            with self._lock:
+                take = min(n_row - k, self._batch_size - self._n)
+                chunk = self._buffer[self._n:self._n + take]
+                chunk["id"] = ids[k:k + take]
+                for column in TRIP_COLUMNS[1:]:
+                    chunk[column] = rows[column][k:k + take]
+                self._n += take
+                if self._n == self._batch_size:
+                    self._swap()
+            k += take
+
+    def _swap(self):
+        """
+        Hand the filled part of the buffer to the writer (the lock is held by the caller)
+        """
+        if self._n > 0:
+            self._queue.put(self._buffer[:self._n])
+            self._buffer = np.zeros(self._batch_size, dtype = BUFFER_DTYPE)
+            self._n = 0
+
+    def flush(self):
+        """
+        Hand the buffered rows to the writer now (without waiting for the write)
+        """
+        with self._lock:
+            self._swap()
+
+    def close(self):
+        """
+        Write the remaining rows and stop the writer thread
+        """
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _write_loop(self):
+        while True:
+            try:
+                batch = self._queue.get(timeout = self._flush_interval)
+            except Empty:
+                self.flush()
+                continue
+            if batch is None:
+                break
+            try:
+                self._written += self._write(batch)
+            except Exception as e: # the writer keeps draining the queue
+                self._error = e
+
+    def _write(self, batch : np.ndarray) -> int:
+        """
+        Append a batch to the file, return the number of written rows
+        """
+        directory = os_path.dirname(self._filename)
+        if not directory == "":
+            makedirs(directory, exist_ok = True)
+        if self._format == "bin":
+            valid = np.fromiter((len(str(id)) <= ID_LENGTH for id in batch["id"]), dtype = bool, count = len(batch))
+            records = batch[valid].astype(TRIP_DTYPE)
+            with open(self._filename, mode = "ab") as file:
+                records.tofile(file)
+            if not valid.all():
+                self._error = ValueError(f"{int((~valid).sum())} trip(s) of vehicle id longer than {ID_LENGTH} characters not written!!!")
+            return len(records)
+        data = pd.DataFrame({column: batch[column] for column in TRIP_COLUMNS})
+        for column in ("start_time", "end_time"):
+            data[column] = [datetime.fromtimestamp(t).strftime(TIME_FORMAT) for t in batch[column].tolist()]
+        new_file = not os_path.exists(self._filename) or os_path.getsize(self._filename) == 0
+        data.to_csv(self._filename, mode = "a", header = new_file, index = False)
+        return len(data)
+
+def read_trip_log(filename) -> pd.DataFrame:
+    """
+    Read a trip log (csv or raw NumPy records) into a dataframe (times in local time)
+    """
+    if str(filename).endswith(".bin"):
+        data = pd.DataFrame(np.fromfile(filename, dtype = TRIP_DTYPE))
+        for column in ("start_time", "end_time"):
+            data[column] = pd.to_datetime([datetime.fromtimestamp(t) for t in data[column].tolist()])
+        return data
+    return pd.read_csv(filename, parse_dates = ["start_time", "end_time"])
@@ -0,0 +1,98 @@
+import numpy as np
+"""
+Index of the units (storage units, vehicles) stored in slot-aligned containers
+"""
+class SlotIndex():
+    def __init__(self, compact_ratio : float = 0.25) -> None:
+        '''
+        Map unit id -> slot (position in the slot-aligned lists/arrays of the owner)\n
+        Removed units leave a tombstone (dead slot), the owner compacts its containers once the dead slots exceed compact_ratio of all the slots
+        '''
+        self._slot = {} # id -> slot
+        self._ids = [] # slot -> id (None if dead)
+        self._n_dead = 0
+        self._compact_ratio = compact_ratio
+        self._version = 0 # bumped by every change (for the cached views of the owner)
+
+    def __contains__(self, id) -> bool:
+        return id in self._slot
+    def __len__(self) -> int:
+        return len(self._slot)
+    def get_version(self):
+        return self._version
+    version = property(fget = get_version)
+    def get_size(self):
+        """
+        Number of slots (alive and dead)
+        """
+        return len(self._ids)
+    size = property(fget = get_size)
+
+    def slot(self, id) -> int:
+        """
+        Return the slot of a unit, raise KeyError if the id does not exist
+        """
+        return self._slot[id]
+
+    def ids(self) -> list:
+        """
+        Ids of the alive units (in slot order)
+        """
+        return list(self._slot.keys())
+
+    def slots(self) -> np.ndarray:
+        """
+        Slots of the alive units (in slot order)
+        """
+        return np.fromiter(self._slot.values(), dtype = np.int64, count = len(self._slot))
+
+    def add(self, id) -> int:
+        """
+        Register a new unit (the id is expected to be new) and return its slot
+        """
+        slot = len(self._ids)
+        self._slot[id] = slot
+        self._ids.append(id)
+        self._version += 1
+        return slot
+
+    def add_many(self, ids : list) -> np.ndarray:
+        """
+        Register new units at once and return their slots
+        """
+        start = len(self._ids)
+        self._slot.update(zip(ids, range(start, start + len(ids))))
+        self._ids += list(ids)
+        self._version += 1
+        return np.arange(start, start + len(ids))
+
+    def remove(self, id) -> int:
+        """
+        Remove a unit (leave a tombstone) and return its former slot, raise KeyError if the id does not exist
+        """
+        slot = self._slot.pop(id)
+        self._ids[slot] = None
+        self._n_dead += 1
+        self._version += 1
+        return slot
+
+    def need_compact(self) -> bool:
+        return self._n_dead > 0 and self._n_dead >= self._compact_ratio * len(self._ids)
+
+    def compact(self) -> np.ndarray:
+        """
+        Drop the tombstones and renumber the slots
+        Return the former slots of the alive units (the owner reorders its containers with it)
+        """
+        keep = self.slots()
+        self._ids = list(self._slot.keys())
+        self._slot = dict(zip(self._ids, range(len(self._ids))))
+        self._n_dead = 0
+        self._version += 1
+        return keep
+
+    def clear(self):
+        self._slot = {}
+        self._ids = []
+        self._n_dead = 0
+        self._version += 1
@@ -1,9 +1,13 @@
 import numpy as np
 import pandas as pd
 # from json import dump, load
-from datetime import datetime as dt
 import app_module.warehouse_essential.geometry as geometry
-from copy import deepcopy
+from app_module.warehouse_essential.unit_index import SlotIndex
+from app_module.warehouse_essential.fleet import FleetState
+from app_module.warehouse_essential.kinematics import KinematicEngine
+from app_module.warehouse_essential.energy import EnergyModel
+
+OWN_TRAIL_CAPACITY = 16 # trail points kept by a vehicle which is not part of a Vehicles fleet
 
 class VehicleUnit():
     def __init__(self, id = None, dock_loc : tuple = (0,0), current_position : tuple | None = None, size : tuple = (1, 1), battery_cap : int = 100):
@@ -13,21 +17,20 @@ class VehicleUnit():
           - Capacity
           - Location
           - Shape & Size
+        The motion state (position, velocity, battery, path...) is stored in a FleetState:
+        a private one until the vehicle is added to a Vehicles object, the fleet arrays of the Vehicles afterward
         """
         self.set_id(id)
-        self._loading = 0
         self._dock_location = geometry.Position(dock_loc)
-        self._shape = geometry.Rectangle(size[0], size[1], ref = (self._dock_location.xy), buffer = 0.5)
-        self.set_battery(battery_cap)
-        self._trail = []
-        self._active = True # no error to stop normal operation (i.e., no collision)
-        self.set_path([])
         if current_position == None:
-            self._kinematic = Kinematic(dock_loc)
-            self._shape = geometry.Rectangle(size[0], size[1], ref = (self._dock_location.xy), buffer = 0.5)
-        else:
-            self._kinematic = Kinematic(current_position)
-            self._shape = geometry.Rectangle(size[0], size[1], ref = current_position, buffer = 0.5)        
+            current_position = self._dock_location.xy
+        self._shape = geometry.Rectangle(size[0], size[1], ref = current_position, buffer = 0.5)
+        self._shape_pos = tuple(current_position)
+        self._fleet = FleetState(capacity = 1, trail_capacity = OWN_TRAIL_CAPACITY)
+        self._slot = 0
+        self._fleet.init_slot(0, current_position, self._dock_location.xy, size, 0)
+        self._trail_cache = (None, None, geometry.LineString([])) # (fleet, trail version, line)
+        self.set_battery(battery_cap)
         
     # Vehicle ID
     def set_id(self, id):
@@ -38,101 +41,156 @@ class VehicleUnit():
         return not self._id == None
     id = property(fget = get_id, fset = set_id)
     is_defined = property(fget = _is_defined)
+
+    # Fleet binding
+    def bind(self, fleet : FleetState, slot : int):
+        """
+        Move the motion state of the vehicle into a slot of a fleet (the vehicle becomes a view of this slot)
+        """
+        fleet.copy_slot(self._fleet, self._slot, slot)
+        self._fleet = fleet
+        self._slot = slot
+    def unbind(self):
+        """
+        Move the motion state back to a private fleet (i.e., when the vehicle is removed from the fleet)
+        """
+        self._fleet.end_trips(self._slot, completed = False) # the current path is aborted
+        own_fleet = FleetState(capacity = 1, trail_capacity = OWN_TRAIL_CAPACITY)
+        own_fleet.clock = self._fleet.clock
+        own_fleet.copy_slot(self._fleet, self._slot, 0)
+        self._fleet.active[self._slot] = False
+        self._fleet.clear_path(self._slot)
+        self._fleet = own_fleet
+        self._slot = 0
+    fleet = property(fget = lambda self: self._fleet)
+    slot = property(fget = lambda self: self._slot)
     
     # Docking location
     def get_docking(self):
         return self._dock_location.xy
     def set_docking(self, position : tuple):
         self._dock_location = geometry.Position(position)
+        self._fleet.dock[self._slot] = self._dock_location.xy
+        self._fleet.touch_dock()
     dock_loc = property(fget = get_docking, fset = set_docking)
 
     # Vehicle shape
     def get_shape(self):
+        pos = self.pos
+        if not pos == self._shape_pos: # follow the position of the fleet state
+            self._shape.translate(geometry.Position(self._shape_pos), geometry.Position(pos))
+            self._shape_pos = pos
         return self._shape
     shape = property(fget = get_shape)
     
     # Vehicle's kinematic infomation
     def set_kinematic(self, position, orient = 0, initial_velo = (0, 0)):
-        self._kinematic = Kinematic(position, orient, initial_velo)
+        self.set_pos(position)
+        self.set_ort(orient)
+        self.set_velo(initial_velo)
+    def get_kinematic(self):
+        return Kinematic(self.pos, self._fleet.ort[self._slot], self.velocity)
+    kinematic = property(fget = get_kinematic)
     # Vehicle position
     def set_pos(self, loc):
-        self._kinematic.pos = loc
+        self._fleet.pos[self._slot] = loc
+        self._fleet.touch_pos(self._slot)
     def get_pos(self):
-        return self._kinematic.pos
+        x, y = self._fleet.pos[self._slot].tolist()
+        return x, y
     pos = property(fget = get_pos, fset = set_pos)
     # Vehicle orientation
     def set_ort(self, ort):
-        self._kinematic.set_ort(ort)
+        self._fleet.ort[self._slot] = geometry.Orientation(ort).w
     def get_ort(self):
-        return self._kinematic.get_ort()
+        return geometry.Orientation(float(self._fleet.ort[self._slot]))
     ort = property(fget = get_ort, fset = set_ort)
     # Vehicle velocity
     def set_velo(self, velocity_tuple):
-        self._kinematic.set_velo(velocity_tuple)
+        self._fleet.velo[self._slot] = velocity_tuple
     def get_velo(self):
-        return self._kinematic.get_velo()
-    def get_motion(self):
-        velo_list = np.array(self._kinematic.get_velo())
-        if len(velo_list[velo_list != 0]) > 0:
-            return "Moving"
-        return "Resting"
+        v, w = self._fleet.velo[self._slot].tolist()
+        return v, w
     velocity = property(fget = get_velo, fset = set_velo)
     # Vehicle path
     def set_path(self, position_list):
         success = True
         error_msg = ""
-        if self._active: # Only active_vehicle is allow to get new_path
-            self._path = geometry.Path(position_list)
+        if self.active: # Only active_vehicle is allow to get new_path
+            self._fleet.set_path(self._slot, position_list)
             return success, error_msg
         else:
-            self._path = geometry.Path([])
+            self._fleet.clear_path(self._slot)
             success = False
             error_msg = "Unable to set new path due to unit's inactivity! Resolve inactivity before attempting to set new path!!!"
             return success, error_msg
     def get_path(self):
-        return self._path
+        """
+        Remaining waypoints of the vehicle (snapshot of the fleet path buffer)
+        """
+        return geometry.Path(self._fleet.path_points(self._slot).tolist())
+    def clear_path(self):
+        self._fleet.end_trips(self._slot, completed = False) # the current path is aborted
+        self._fleet.clear_path(self._slot)
     def get_path_dist(self):
-        return self._path
+        return self._fleet.path_length(self._slot)
     path = property(fget = get_path, fset = set_path)
     path_length = property(fget = get_path_dist)
-    def path_finish_signal(self):
-        time = dt.now()
-        dist = self.path_length
-        remain_batt = self._battery
-        tempt = pd.DataFrame({"Datetime": time.strftime("%Y-%m-%d %H:%M:%S"), "Moving Distance":  f"{dist}", "Remaining battery": remain_batt}, index = [0])
+    def path_finish_signal(self, completed : bool = True, collision : bool = False):
+        """
+        Close the trip of the current path (logged by the trip logger of the fleet if any) and clear the path
+        Return the trip record (dict) or None if the vehicle has no open trip
+        """
+        slots, rows = self._fleet.end_trips(self._slot, completed, collision)
+        self._fleet.clear_path(self._slot)
+        if len(slots) == 0:
+            return None
+        record = {"id": self.id}
+        record.update({column: values[0].item() for column, values in rows.items()})
+        return record
     def get_trail(self):
-        if len(self._trail) > 1:
-            return geometry.LineString(self._trail)
-        else:
-            return geometry.LineString([])
+        """
+        Trail of the vehicle as a LineString, only rebuilt when the trail in the fleet ring buffer has changed
+        """
+        fleet, version, line = self._trail_cache
+        if not (fleet is self._fleet and version == self._fleet.trail_version[self._slot]):
+            trail = self._fleet.trail_points(self._slot)
+            line = geometry.LineString(trail) if len(trail) > 1 else geometry.LineString([])
+            self._trail_cache = (self._fleet, self._fleet.trail_version[self._slot], line)
+        return line
     trail = property(fget = get_trail)
     # Vehicle battery
     def set_battery(self, percent):
         try:
             percent = int(percent)
         except ValueError:
-            self._battery = 0
+            self._fleet.battery[self._slot] = 0
         else:
-            if percent > 100:
-                self._battery = 100
-            elif percent <= 0:
-                self._battery = 0
-            else:
-                self._battery = percent
+            self._fleet.battery[self._slot] = min(100, max(0, percent))
     def get_battery(self):
-        return self._battery
+        return int(self._fleet.battery[self._slot])
     battery = property(fget = get_battery, fset = set_battery)
 
+    # Carried load (used by the energy model)
+    def set_loading(self, load):
+        self._fleet.load[self._slot] = max(0, load)
+    def get_loading(self):
+        return float(self._fleet.load[self._slot])
+    loading = property(fget = get_loading, fset = set_loading)
+    # Travelled distance
+    def get_odometer(self):
+        return float(self._fleet.odometer[self._slot])
+    odometer = property(fget = get_odometer)
+
     # Active vs. Inactive
     def get_active(self):
-        return self._active
+        return bool(self._fleet.active[self._slot])
     active = property(fget = get_active)
 
     # Moving vs. Resting
     def get_motion(self):
-        if not self._path.empty:
-            if self._path.path_data.is_iterable:
-                return "Moving"
+        if self._fleet.path_cursor[self._slot] < self._fleet.path_end[self._slot]:
+            return "Moving"
         return "Resting"
     motion = property(fget = get_motion)
 
@@ -141,25 +199,31 @@ class VehicleUnit():
         """
         Method to set the vehicle to move to a specific location
         """
-        self._trail.append(self._kinematic.pos)
+        self._fleet.record_trail(self._slot)
         if not new_loc == None:
-            self._shape.translate(geometry.Position(self._kinematic.pos), new_loc)
             self.set_pos((new_loc.x, new_loc.y),)
-            # self._complete_path.append(geometry.Point(new_loc.x, new_loc.y),)
             
     def move(self):
-        if not self._path.empty:
-            if self._path.path_data.is_iterable:
-                location = self._path.path_data.iter()
-                self.move_to(location)
-            else:
-                self._path.path_data.clear()
-                self._trail = [] # Clear trail after the path is finished
+        """
+        Move this vehicle only to its next waypoint (see Vehicles.step to move the whole fleet)
+        """
+        fleet, slot = self._fleet, self._slot
+        cursor = fleet.path_cursor[slot]
+        if cursor < fleet.path_end[slot]:
+            if fleet.active[slot] and fleet.battery[slot] > 0:
+                fleet.record_trail(slot)
+                fleet.odometer[slot] += np.hypot(*(fleet.path_values[cursor] - fleet.pos[slot]))
+                fleet.pos[slot] = fleet.path_values[cursor]
+                fleet.touch_pos(slot)
+                fleet.path_cursor[slot] += 1
+        elif fleet.path_end[slot] > fleet.path_start[slot]:
+            fleet.clear_path(slot) # Clear path and trail after the path is finished
+            fleet.clear_trail(slot)
 
     def unit_info(self, formal = False):
         if formal:
-            return {"ID": self.id, "Docking Location": self._dock_location.xy, "Curent Location": self._kinematic.pos, "Shape": self._shape.shape_description(line_description = True).get("description", None), "Current battery": self.battery}
-        return {"id": self.id, "dock_location": self._dock_location.xy, "geometry": self._shape.shape_description(), "battery": self.battery}
+            return {"ID": self.id, "Docking Location": self._dock_location.xy, "Curent Location": self.pos, "Shape": self.shape.shape_description(line_description = True).get("description", None), "Current battery": self.battery}
+        return {"id": self.id, "dock_location": self._dock_location.xy, "geometry": self.shape.shape_description(), "battery": self.battery}
     
     @classmethod
     def load_unit(cls, info_dict : dict):
@@ -173,12 +237,12 @@ class VehicleUnit():
         return vehicle
 
     def collision_with(self, other) -> bool:
-        if self._active == True:
+        if self.active == True:
             if other == self:
                 return False, None # ignore itself
             if other.shape.check_interference(self.shape):
-                self.path.path_data.clear()
-                self._active = False # make the vehicle inactive and remove its from collision check (it does not mean it won be served as obstacle)
+                self.path_finish_signal(completed = False, collision = True)
+                self._fleet.active[self._slot] = False # make the vehicle inactive and remove its from collision check (it does not mean it won be served as obstacle)
                 return True, other
             return False, None    
         return False, None # If false (no collision), return empty tuple in the result
@@ -210,20 +274,215 @@ class VehicleUnit():
 
 class Vehicles():
     def __init__(self) -> None:
-        self._dataframe = pd.DataFrame(columns = ["id", "unit"])
-        self._dataframe.set_index("id")
+        # Units and their occupied zones are kept in slot-aligned lists (None for the removed units)
+        self._index = SlotIndex()
+        self._units : list = []
         self._occupied_zone : list = []
+        self._fleet = FleetState() # motion state of all the vehicles (slot-aligned)
+        self._engine = KinematicEngine()
+        self._energy = EnergyModel()
+        self._energy_events = [] # (vehicle, event type, value) not yet collected
+        self._trip_logger = None
+        self._footprint_tree = {} # at_dock -> (version of the footprints, STR-tree of the footprints)
+        self.change_sink = None # callable(operation, payload) notified of every change of the units (i.e., journal)
+
+        self._dataframe = pd.DataFrame(columns = ["id", "unit"])
+        self._dataframe_version = self._index.version
+
+    def _notify(self, operation : str, payload):
+        if not self.change_sink == None:
+            self.change_sink(operation, payload)
 
     def get_dataframe(self):
+        """
+        Dataframe (index: id, columns: id, unit) of the vehicles, only rebuilt after a change
+        """
+        if not self._dataframe_version == self._index.version:
+            ids = self._index.ids()
+            units = [self._units[slot] for slot in self._index.slots()]
+            self._dataframe = pd.DataFrame({"id": ids, "unit": units}, index = ids, columns = ["id", "unit"])
+            self._dataframe_version = self._index.version
         return self._dataframe
     def set_dataframe(self, data : pd.DataFrame):
-        self._dataframe = data
+        self.clear_all()
+        units = data["unit"].to_list()
+        for unit, slot in zip(units, self._index.add_many([unit.id for unit in units])):
+            unit.bind(self._fleet, slot)
+        self._units += units
+        self._occupied_zone += [geometry.Rectangle.from_dict(unit.shape.shape_description()) for unit in units]
+        self._notify("add", [unit.unit_info() for unit in units])
     unit_list = property(fget = get_dataframe, fset = set_dataframe)
 
     def get_occupy(self):
-        return self._occupied_zone
+        return [self._occupied_zone[slot] for slot in self._index.slots()]
     occupied = property(fget = get_occupy)
 
+    def get_unit(self, id) -> VehicleUnit:
+        """
+        Return the vehicle of the id, raise KeyError if the id does not exist
+        """
+        return self._units[self._index.slot(id)]
+
+    def __contains__(self, id) -> bool:
+        return id in self._index
+    def __len__(self) -> int:
+        return len(self._index)
+    def get_index_version(self):
+        """
+        Version of the set of units (changed by every add/remove)
+        """
+        return self._index.version
+    index_version = property(fget = get_index_version)
+
+    def units(self) -> list:
+        """
+        List of all the vehicles
+        """
+        return [self._units[slot] for slot in self._index.slots()]
+
+    def get_fleet(self):
+        return self._fleet
+    fleet = property(fget = get_fleet)
+
+    def set_trail_options(self, capacity : int | None = None, min_dist : float | None = None):
+        """
+        Set the retention window (number of points per vehicle) and the decimation distance of the vehicle trails
+        """
+        self._fleet.configure_trail(capacity, min_dist)
+
+    def step(self, elapsed : float = 1.0):
+        """
+        Advance every vehicle to its next waypoint with a single vectorized step (elapsed: duration of the step for the energy model)
+        Return the list of vehicles which finished their path
+        """
+        odometer = self._fleet.odometer[:self._fleet.n].copy()
+        self._fleet.clock += elapsed
+        finished = self._fleet.step()
+        self._apply_energy(elapsed, odometer)
+        return [self._units[slot] for slot in finished.tolist() if not self._units[slot] == None]
+
+    def get_engine(self):
+        return self._engine
+    def set_engine(self, engine : KinematicEngine):
+        self._engine = engine
+    engine = property(fget = get_engine, fset = set_engine)
+
+    def advance(self, duration : float):
+        """
+        Integrate the motion of every vehicle over duration (s) with the kinematic engine (continuous motion along the paths)
+        Return the list of vehicles which finished their path
+        """
+        odometer = self._fleet.odometer[:self._fleet.n].copy()
+        finished = self._engine.integrate(self._fleet, duration)
+        self._apply_energy(duration, odometer)
+        return [self._units[slot] for slot in finished.tolist() if not self._units[slot] == None]
+
+    def apply_telemetry(self, ids : list, pos : np.ndarray, ort : np.ndarray | None = None, battery : np.ndarray | None = None) -> list:
+        """
+        Overwrite the state of many vehicles at once with reported values (live telemetry):
+        pos (n, 2), ort (n) and battery (n) arrays, NaN for the values which were not reported
+        The reported moves are recorded into the trails and the odometers
+        Return the list of unknown vehicle ids (skipped)
+        """
+        known = [k for k, id in enumerate(ids) if id in self._index]
+        unknown = [id for id in ids if not id in self._index]
+        if len(known) == 0:
+            return unknown
+        slots = np.array([self._index.slot(ids[k]) for k in known], dtype = np.int64)
+        fleet = self._fleet
+        pos = np.asarray(pos, dtype = np.float64)[known]
+        has_pos = ~np.isnan(pos).any(axis = 1)
+        moved, new_pos = slots[has_pos], pos[has_pos]
+        fleet.record_trail(moved)
+        fleet.odometer[moved] += np.hypot(*(new_pos - fleet.pos[moved]).T)
+        fleet.pos[moved] = new_pos
+        if len(moved) > 0:
+            fleet.touch_pos(moved)
+        for values, target in ((ort, fleet.ort), (battery, fleet.battery)):
+            if values is None:
+                continue
+            values = np.asarray(values, dtype = np.float64)[known]
+            reported = ~np.isnan(values)
+            target[slots[reported]] = values[reported]
+        fleet.battery[slots] = np.clip(fleet.battery[slots], 0, 100)
+        return unknown
+
+    def get_energy(self):
+        return self._energy
+    def set_energy(self, energy : EnergyModel):
+        self._energy = energy
+    energy = property(fget = get_energy, fset = set_energy)
+
+    def _apply_energy(self, elapsed : float, odometer : np.ndarray):
+        """
+        Drain/charge the batteries of the whole fleet (odometer: travelled distances before the step)
+        """
+        distance = np.zeros(self._fleet.n)
+        distance[:len(odometer)] = self._fleet.odometer[:len(odometer)] - odometer
+        events = self._energy.update(self._fleet, elapsed, distance)
+        self._energy_events += [(self._units[slot], kind, value) for slot, kind, value in events
+                                if slot < len(self._units) and not self._units[slot] == None]
+
+    def get_trip_logger(self):
+        return self._trip_logger
+    def set_trip_logger(self, logger):
+        """
+        Set the trip logger (i.e., trip_log.TripLogger) receiving the completed/aborted paths, None to stop logging
+        """
+        self._trip_logger = logger
+        self._fleet.trip_sink = None if logger == None else self._log_trips
+    trip_logger = property(fget = get_trip_logger, fset = set_trip_logger)
+
+    def _log_trips(self, slots : np.ndarray, rows : dict):
+        ids = [None if self._units[slot] == None else self._units[slot].id for slot in slots.tolist()]
+        self._trip_logger.log(ids, rows)
+
+    def pop_energy_events(self) -> list:
+        """
+        Return (and forget) the energy events raised since the last call: list of (vehicle, event type, value)
+        """
+        events = self._energy_events
+        self._energy_events = []
+        return events
+
+    def _is_empty(self):
+        return len(self._index) == 0
+    empty = property(fget = _is_empty)
+
+    def footprint_conflicts(self, footprints, at_dock : bool = True) -> np.ndarray:
+        """
+        Check footprints (polygons) against the footprints of the vehicles at their docking location (at_dock = True) or current position
+        The footprints are read straight from the fleet arrays (axis-aligned boxes of dock/pos and size), no unit is copied
+        Their STR-tree is kept until a vehicle is added/removed or the footprints change (docking location, move)
+        Return boolean array, True if the footprint intersects an occupied space
+        """
+        footprints = np.asarray(footprints, dtype = object).reshape(-1)
+        hit = np.zeros(len(footprints), dtype = bool)
+        if len(self._index) == 0 or len(footprints) == 0:
+            return hit
+        hit_idx, _ = self._footprints(at_dock).query(footprints, predicate = "intersects")
+        hit[hit_idx] = True
+        return hit
+
+    def _footprints(self, at_dock : bool):
+        """
+        STR-tree of the footprints of the vehicles at their docking location or current position (rebuilt after a change only)
+        """
+        version = (self._index.version, self._fleet.dock_clock, None if at_dock else self._fleet.pos_clock)
+        cached = self._footprint_tree.get(at_dock, None)
+        if cached == None or not cached[0] == version:
+            slots = self._index.slots()
+            center = self._fleet.dock[slots] if at_dock else self._fleet.pos[slots]
+            cached = (version, geometry.STRtree(geometry.box_polygons(center, self._fleet.size[slots])))
+            self._footprint_tree[at_dock] = cached
+        return cached[1]
+
+    def dock_conflicts(self, footprints) -> np.ndarray:
+        """
+        Check footprints (polygons) against the docking footprints of the vehicles
+        """
+        return self.footprint_conflicts(footprints, at_dock = True)
+
     def add_unit(self, new_unit : VehicleUnit, warehouse_layout = None, occupied_zone : pd.Series | None = None):
         """
         Add a new unit of vehicle into the Vehicle dataframe
@@ -231,19 +490,16 @@ class Vehicles():
         """
         error_list = []
         new_id = new_unit.id
-        add_shape : geometry.PolygonShape = deepcopy(new_unit.shape)
+        # Footprint of the new vehicle at its docking position
+        dock_shape = geometry.box_polygons(new_unit.dock_loc, new_unit.shape.shape_description()["dimension"])[0]
         # Criterion 1: No duplicate id
-        if self._dataframe.index.empty:
-            crit1 = True
-        else:
-            crit1 = not new_id in self._dataframe.index.to_list()
+        crit1 = not new_id in self._index
         # Criterion 2: Inside the warehouse (if applicable)
         if not warehouse_layout == None:
             # At the current position
-            crit2_1 = warehouse_layout.check_contain(add_shape)
+            crit2_1 = warehouse_layout.check_contain(new_unit.shape)
             # At the docking position
-            add_shape.translate(geometry.Position(new_unit.pos), geometry.Position(new_unit.dock_loc))
-            crit2_2 = warehouse_layout.check_contain(add_shape)
+            crit2_2 = warehouse_layout.polygon.contains_properly(dock_shape)
             crit2 = crit2_1 and crit2_2
         else:
             crit2 = True # ignore the condition
@@ -256,17 +512,9 @@ class Vehicles():
         else:
             crit3 = True
         # Criterion 4: No collision (in case no occupied zone is provided)
-        if self._dataframe.index.empty:
-            crit4 = True
-        else:
-            crit4 = not self._dataframe["unit"].apply(lambda units, new_unit: units.shape.check_interference(new_unit), args = (new_unit.shape,)).sum()
-        # Criterion 5: No collision with orther object in docking position
-        if self._dataframe.index.empty:
-            crit5 = True
-        else:
-            all_vehicle_at_dock : pd.Series = self._dataframe["unit"].apply(lambda unit : deepcopy(unit)) # deepcopy to avoid tamper with original data
-            all_vehicle_at_dock = all_vehicle_at_dock.apply(lambda unit : unit.forced_homing())
-            crit5 = not all_vehicle_at_dock.apply(lambda units : units.shape.check_interference(add_shape)).sum()
+        crit4 = not self.footprint_conflicts([new_unit.shape.polygon], at_dock = False)[0]
+        # Criterion 5: No collision with orther object in docking position (indexed docking footprints)
+        crit5 = not self.dock_conflicts([dock_shape])[0]
         if not crit1:
             error_list.append(f"ID# {new_id} is already in the dataframe!!!")
         if not crit2:
@@ -281,28 +529,131 @@ class Vehicles():
             error_list.append("Docking location violation! Docking space is occupied!!!")
         combine_cond = crit1 and crit2 and crit3 and crit4 and crit5
         if combine_cond:
-            self._dataframe.loc[new_id, ["id", "unit"]] = [new_id, new_unit]
+            new_unit.bind(self._fleet, self._index.add(new_id))
+            self._units.append(new_unit)
             self._occupied_zone.append(geometry.Rectangle.from_dict(new_unit.shape.shape_description()))
+            self._notify("add", [new_unit.unit_info()])
         return error_list
 
+    def remove_unit(self, id):
+        """
+        Remove a vehicle and its occupied zone, raise KeyError if the id does not exist
+        The slot is only marked dead, the lists are compacted once enough units are removed (amortized O(1))
+        """
+        slot = self._index.remove(id)
+        self._units[slot].unbind()
+        self._units[slot] = None
+        self._occupied_zone[slot] = None
+        if self._index.need_compact():
+            self._compact()
+        self._notify("remove", [id])
+
+    def remove_units(self, ids):
+        """
+        Remove multiple vehicles at once
+        Return the list of ids that do not exist
+        """
+        missing = []
+        for id in ids:
+            try:
+                self.remove_unit(id)
+            except KeyError:
+                missing.append(id)
+        return missing
+
+    def _compact(self):
+        keep = self._index.compact()
+        self._fleet.compact(keep)
+        self._units = [self._units[slot] for slot in keep]
+        self._occupied_zone = [self._occupied_zone[slot] for slot in keep]
+        for slot, unit in enumerate(self._units):
+            unit._slot = slot
+
     def vehicle_info(self):
-        info = self._dataframe["unit"].apply(lambda unit : unit.unit_info()).to_list()
+        info = [unit.unit_info() for unit in self.units()]
         return info
 
     def load_info(self, unit_infos, warehouse_layout : geometry.PolygonShape | None = None, occupied_zone : pd.Series | None = None):
         """
         Method for mass conversion of data of multiple vehicles into VehicleUnit(s)
+        All the vehicles are validated in one batched pass (see add_units)
+        Return the error report: list of (record index, id, list of errors) of the rejected records
         """
-        _quick_conv = np.vectorize(VehicleUnit.load_unit, otypes = [VehicleUnit]) # Input an array of storage unit data
-        units = _quick_conv(unit_infos)
-        for unit in units:
-            self.add_unit(unit, warehouse_layout, occupied_zone) 
+        error_report = []
+        rows = []
+        units = []
+        for k, info in enumerate(unit_infos):
+            try:
+                units.append(VehicleUnit.load_unit(info))
+            except Exception:
+                error_report.append((k, None if not isinstance(info, dict) else info.get("id", None), ["Invalid vehicle record!!!"]))
+            else:
+                rows.append(k)
+        error_report += [(rows[k], unit_id, errors) for k, unit_id, errors in self.add_units(units, warehouse_layout, occupied_zone)]
+        error_report.sort(key = lambda report : report[0])
+        return error_report
+
+    def add_units(self, new_units : list, warehouse_layout = None, occupied_zone : pd.Series | None = None):
+        """
+        Bulk version of add_unit(): validate all the vehicles in one batched pass (indexed collision check) and insert the valid ones at once
+        Return the error report: list of (index in new_units, id, list of errors) of the rejected vehicles
+        """
+        n = len(new_units)
+        if n == 0:
+            return []
+        errors = [[] for _ in range(n)]
+        shapes = np.array([unit.shape.polygon for unit in new_units], dtype = object)
+        sizes = np.array([unit.shape.shape_description()["dimension"] for unit in new_units], dtype = np.float64)
+        docks = geometry.box_polygons([unit.dock_loc for unit in new_units], sizes)
+        # Criterion 2: Inside the warehouse (if applicable), at the current and the docking position
+        if not warehouse_layout == None:
+            inside = geometry.shapely.contains_properly(warehouse_layout.polygon, shapes) & geometry.shapely.contains_properly(warehouse_layout.polygon, docks)
+            for k in np.flatnonzero(~inside):
+                errors[k].append(f"Out of bound! Violation of Warehouse Space!!!")
+        # Criterion 3 & 4: No collision with the existing objects
+        existing = [zone.polygon for zone in occupied_zone] if isinstance(occupied_zone, pd.Series) else []
+        hit_existing, earlier = geometry.batch_conflicts(shapes, existing)
+        hit_existing |= self.footprint_conflicts(shapes, at_dock = False)
+        # Criterion 5: No collision with other vehicles at their docking position
+        dock_hit_existing = self.dock_conflicts(docks)
+        _, dock_earlier = geometry.batch_conflicts(docks)
+        # Criterion 1 and the conflicts in the batch: the first vehicle wins (same as adding the vehicles one by one)
+        used_ids = set(self._index.ids())
+        accepted = np.zeros(n, dtype = bool)
+        for k, unit in enumerate(new_units):
+            if unit.id in used_ids:
+                errors[k].insert(0, f"ID# {unit.id} is already in the dataframe!!!")
+            if hit_existing[k] or (k in earlier and accepted[earlier[k]].any()):
+                errors[k].append("Collision with existing object(s)")
+            if dock_hit_existing[k] or (k in dock_earlier and accepted[dock_earlier[k]].any()):
+                errors[k].append("Docking location violation! Docking space is occupied!!!")
+            if len(errors[k]) == 0:
+                accepted[k] = True
+                used_ids.add(unit.id)
+        keep = np.flatnonzero(accepted)
+        if len(keep) > 0:
+            slots = self._index.add_many([new_units[k].id for k in keep])
+            for k, slot in zip(keep, slots):
+                new_units[k].bind(self._fleet, slot)
+            self._units += [new_units[k] for k in keep]
+            self._occupied_zone += [geometry.Rectangle.from_dict(new_units[k].shape.shape_description()) for k in keep]
+            self._notify("add", [new_units[k].unit_info() for k in keep])
+        return [(k, new_units[k].id, errors[k]) for k in range(n) if len(errors[k]) > 0]
     
     def clear_all(self):
         """
         Wipe out all the vehicle units from the dataframe
         """
-        self._dataframe = self._dataframe.iloc[0:0]
+        for unit in self.units():
+            unit.unbind()
+        self._index.clear()
+        self._units = []
+        self._occupied_zone = []
+        self._energy_events = []
+        clock, sink = self._fleet.clock, self._fleet.trip_sink
+        self._fleet = FleetState(trail_capacity = self._fleet.trail_capacity, trail_min_dist = self._fleet.trail_min_dist)
+        self._fleet.clock, self._fleet.trip_sink = clock, sink
+        self._notify("clear", None)
 
 class Kinematic():
     def __init__(self, position_tuple: tuple = (0, 0), angle:  int | float = 0, velocity_tuple: tuple = (0, 0)):
@@ -330,7 +681,7 @@ class Kinematic():
     def get_v(self):
         return self._velocity[0]
     def get_w(self):
-        return self._velocity[0]
+        return self._velocity[1]
     velocity = property(fget = get_velo, fset = set_velo)
     v = property(fget = get_v)
     w = property(fget = get_w)
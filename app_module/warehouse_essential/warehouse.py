@@ -1,14 +1,19 @@
 from app_module.warehouse_essential.storage import Storage, StorageUnit, StorageException
 from app_module.warehouse_essential.vehicle import Vehicles, VehicleUnit
+from app_module.warehouse_essential.order_ingestion import ingest_order_file, read_order_chunks, DEFAULT_CHUNK_SIZE
+from app_module.warehouse_essential.dispatch import Dispatcher
+from app_module.warehouse_essential.charging import ChargingStation, ChargingScheduler
+from app_module.warehouse_essential.json_stream import iter_warehouse_chunks, write_warehouse_json, UNIT_CHUNK_SIZE
+from app_module.warehouse_essential.snapshot import write_snapshot, read_snapshot, decode_records, STORAGE_COLUMNS, VEHICLE_COLUMNS
 import app_module.warehouse_essential.geometry as geometry
 import geopandas as pgd
 import pandas as pd
 from matplotlib import pyplot as plt
-from os import makedirs
-from json import load as js_load, dump as js_dump
+from os import makedirs, replace, fsync
 import numpy as np
 
 DEFAULT_WAREHOUSE_PATH = ".\\Metadata\\WarehouseData"
+DEFAULT_SNAPSHOT_PATH = DEFAULT_WAREHOUSE_PATH + "\\snapshot"
 try:
     makedirs(DEFAULT_WAREHOUSE_PATH)
 except FileExistsError:
@@ -27,29 +32,128 @@ class Warehouse():
         # Storage unit data frame
         self._storage_units : Storage = Storage()
         self._vehicles : Vehicles = Vehicles()
+        # Transport tasks of the orders carried by the vehicles
+        self._dispatcher = Dispatcher(self._storage_units, self._vehicles)
+        # Charging stations (resources of the warehouse) and the charging schedule of the vehicles
+        self._charging_stations : list = []
+        self._charging = ChargingScheduler(self._vehicles, self._charging_stations, self._dispatcher)
+        # Rejected records of the last load_info (record index, id, errors)
+        self._load_report = {"storage": [], "vehicle": []}
+        self._change_sink = None # callable(operation, payload) notified of every change of the warehouse (i.e., journal)
+        self._layout_version = 0 # changed by every change of the layout or of the charging stations (for the redraws)
+
+    def get_change_sink(self):
+        return self._change_sink
+    def set_change_sink(self, sink):
+        """
+        Set the callable(operation, payload) notified of the changes of the warehouse, its storage and its vehicles (None to stop)
+        operation: layout, add_station, remove_station, path, storage.add/remove/load/clear, vehicle.add/remove/clear
+        """
+        self._change_sink = sink
+        self._storage_units.change_sink = None if sink == None else (lambda operation, payload: sink("storage." + operation, payload))
+        self._vehicles.change_sink = None if sink == None else (lambda operation, payload: sink("vehicle." + operation, payload))
+    change_sink = property(fget = get_change_sink, fset = set_change_sink)
+
+    def _notify(self, operation : str, payload):
+        if not self._change_sink == None:
+            self._change_sink(operation, payload)
 
     @classmethod 
-    def load_info(cls, filename = DEFAULT_WAREHOUSE_PATH + "\\autosave.json"):
+    def load_info(cls, filename = DEFAULT_WAREHOUSE_PATH + "\\autosave.json", lazy : bool = False, chunk_size : int = UNIT_CHUNK_SIZE):
         """
         Load warehouse info from a file (.json)
+        The file is parsed incrementally, the unit records go to the bulk loaders chunk_size records at a time (memory use is bounded by the chunk)
+        lazy: the storage units are kept as columns and only built when asked for (see Storage.add_units)
         """
+        warehouse = None
+        pending = [] # unit chunks read before the layout (the units are validated against it)
+        report = {"storage": [], "vehicle": []}
+        n_read = {"storage": 0, "vehicle": 0}
         try:
-            with open(filename, mode = "r") as file:
-                info_dict : dict = js_load(file)
-        except:
+            for section, value in iter_warehouse_chunks(filename, chunk_size):
+                if section == "layout":
+                    warehouse = cls._from_layout_info(value)
+                    for pending_section, chunk in pending:
+                        warehouse._load_chunk(pending_section, chunk, report, n_read, lazy)
+                    pending = []
+                elif warehouse == None:
+                    pending.append((section, value))
+                else:
+                    warehouse._load_chunk(section, value, report, n_read, lazy)
+        except (OSError, ValueError):
             raise Exception("No records of warehouse found!!!")
+        if warehouse == None: # no layout in the file
+            warehouse = cls._from_layout_info({})
+            for pending_section, chunk in pending:
+                warehouse._load_chunk(pending_section, chunk, report, n_read, lazy)
+        warehouse._load_report = report
+        warehouse.update_placement_occupied_zone()
+        return warehouse
+
+    @classmethod
+    def _from_layout_info(cls, layout_info : dict):
+        layout_info = layout_info or {}
+        size = layout_info.get("dimension", (1, 1))
+        l_val, w_val = size
+        ref = layout_info.get("ref_pt", (0, 0))
+        return cls(l_val, w_val, ref)
+
+    def _load_chunk(self, section : str, records : list, report : dict, n_read : dict, lazy : bool):
+        """
+        Load one chunk of unit records of a warehouse file (the error reports are numbered across the chunks)
+        """
+        if section == "charging_station":
+            for station_info in records:
+                self.add_charging_station(ChargingStation.load_unit(station_info))
+            return
+        if section == "storage":
+            chunk_report = self._storage_units.load_info(records, self.layout, lazy = lazy)
         else:
-            layout_info : dict = info_dict.get("layout", {})
-            size = layout_info.get("dimension", (1, 1))
-            l_val, w_val = size
-            ref = layout_info.get("ref_pt", (0, 0))
-            warehouse = cls(l_val, w_val, ref)
-            storage_info : list = info_dict.get("storage", [])
-            vehicle_info : list = info_dict.get("vehicle", [])
-            warehouse._storage_units.load_info(storage_info, warehouse.layout)
-            warehouse._vehicles.load_info(vehicle_info, warehouse.layout)
-            warehouse.update_placement_occupied_zone()
-            return warehouse
+            chunk_report = self._vehicles.load_info(records, self.layout)
+        report[section] += [(row + n_read[section], id, errors) for row, id, errors in chunk_report]
+        n_read[section] += len(records)
+
+    @classmethod
+    def load_snapshot(cls, directory = DEFAULT_SNAPSHOT_PATH, mmap : bool = True, lazy : bool = False):
+        """
+        Load warehouse from a columnar snapshot (see save_snapshot), the storage columns go straight from the (memory-mapped) arrays to the bulk loader
+        lazy: the storage units are kept as columns and only built when asked for (see Storage.add_units)
+        """
+        header, arrays = read_snapshot(directory, mmap)
+        layout_info = header.get("layout", None)
+        warehouse = cls() if layout_info == None else cls._from_layout_info(layout_info) # a warehouse saved before its layout was set has none
+        for station_info in header.get("charging_station", []):
+            warehouse.add_charging_station(ChargingStation.load_unit(station_info))
+        storage, storage_header = arrays["storage"], header["units"]["storage"]
+        if any(name.endswith(".missing") for name in storage) or "id" in storage_header["columns"]:
+            # incomplete records or non-text ids: same path as the JSON file
+            storage_info = decode_records(storage, storage_header["columns"], STORAGE_COLUMNS, storage_header["n"])
+            storage_report = warehouse._storage_units.load_info(storage_info, warehouse.layout, lazy = lazy)
+        else:
+            names = np.array([name or "Generic" for name in storage_header["columns"]["type"]["names"]] + ["Generic"], dtype = object)
+            columns = {"id": storage["id"].tolist(),
+                       "center": storage["geo.ref_pt"],
+                       "side": storage["geo.dimension"][:, 0],
+                       "capacity": storage["cap"],
+                       "load": storage["load"],
+                       "category": names[storage["type"]].tolist(),
+                       "load_location": storage["load_location"]}
+            storage_report = warehouse._storage_units.add_units(columns, warehouse.layout, lazy = lazy)
+        vehicle, vehicle_header = arrays["vehicle"], header["units"]["vehicle"]
+        vehicle_info = decode_records(vehicle, vehicle_header["columns"], VEHICLE_COLUMNS, vehicle_header["n"])
+        vehicle_report = warehouse._vehicles.load_info(vehicle_info, warehouse.layout)
+        # Fleet state of the loaded vehicles
+        rejected = {report[0] for report in vehicle_report}
+        loaded = np.array([k for k in range(len(vehicle_info)) if not k in rejected], dtype = np.int64)
+        if len(loaded) > 0 and any(name.startswith("state.") for name in vehicle):
+            fleet = warehouse._vehicles.fleet
+            slots = np.array([warehouse._vehicles.get_unit(vehicle_info[k]["id"]).slot for k in loaded], dtype = np.int64)
+            for name in ("ort", "odometer", "load"):
+                if "state." + name in vehicle:
+                    getattr(fleet, name)[slots] = vehicle["state." + name][loaded]
+        warehouse._load_report = {"storage": storage_report, "vehicle": vehicle_report}
+        warehouse.update_placement_occupied_zone()
+        return warehouse
 
     def get_layout(self, info_type = None):
         if not self._layout == None:
@@ -61,7 +165,19 @@ class Warehouse():
         return None
     def set_layout(self, layout : geometry.PolygonShape):
         self._layout = layout
+        self._layout_version += 1
+        self._notify("layout", None if layout == None else layout.shape_description())
     layout = property(fget = get_layout, fset = set_layout)
+    def get_layout_version(self):
+        """
+        Version of the layout and of the charging stations (changed by set_layout and the station add/remove)
+        """
+        return self._layout_version
+    layout_version = property(fget = get_layout_version)
+
+    def get_load_report(self):
+        return self._load_report
+    load_report = property(fget = get_load_report)
 
     def get_storage_units(self):
         return self._storage_units
@@ -69,13 +185,50 @@ class Warehouse():
     def get_vehicles(self):
         return self._vehicles
     vehicles = property(fget = get_vehicles)
+    def get_dispatcher(self):
+        return self._dispatcher
+    dispatcher = property(fget = get_dispatcher)
+    def get_charging_stations(self):
+        return list(self._charging_stations)
+    charging_stations = property(fget = get_charging_stations)
+    def get_charging(self):
+        return self._charging
+    charging = property(fget = get_charging)
 
     def add_storage_unit(self, new_unit : StorageUnit):
         if not self.layout == None: 
-            out_str = self._storage_units.add_unit(new_unit, self.layout, self._occupied_zone)
+            out_str = self._storage_units.add_unit(new_unit, self.layout, self._vehicle_zone())
+            if len(out_str) == 0:
+                self.update_placement_occupied_zone()
             return True, out_str
         return False, out_str
 
+    def add_storage_array(self, origin : tuple, pitch : tuple | float, rows : int, cols : int, side : float, capacity : float, category = "Generic", id_prefix = "S"):
+        """
+        Place a rows x cols array of storage units at once
+            origin: center of the first unit (row 1, column 1)
+            pitch: distance between the centers of two neighbor units (x, y) or a single value for both directions
+        The units are named {id_prefix}{row}-{column}
+        Return (True, error report of the rejected units) or (False, error message) if there is no layout
+        """
+        if self.layout == None:
+            return False, "Warehouse has no layout!!!"
+        rows, cols = int(rows), int(cols)
+        if rows <= 0 or cols <= 0:
+            return False, "Number of rows and columns has to be positive!!!"
+        pitch_x, pitch_y = (pitch, pitch) if isinstance(pitch, (int, float)) else pitch
+        row_idx, col_idx = np.divmod(np.arange(rows * cols), cols)
+        center = np.column_stack([origin[0] + col_idx * pitch_x, origin[1] + row_idx * pitch_y])
+        n = rows * cols
+        columns = {"id": [f"{id_prefix}{r + 1}-{c + 1}" for r, c in zip(row_idx.tolist(), col_idx.tolist())],
+                   "center": center,
+                   "side": np.full(n, side, dtype = np.float64),
+                   "capacity": np.full(n, capacity, dtype = np.float64),
+                   "category": [category] * n}
+        error_report = self._storage_units.add_units(columns, self.layout, self._vehicle_zone())
+        self.update_placement_occupied_zone()
+        return True, error_report
+
     def add_storage_units(self, *args):
         _quick_add = np.vectorize(self.add_storage_unit, otypes = [bool])
         _quick_add(args)
@@ -83,57 +236,244 @@ class Warehouse():
     def storage_load_change(self, load_def : list):
         success, err_msg, changes = self._storage_units.change_storage_load(load_def, abort_change = True)
         return success, err_msg, changes
+
+    def storage_load_stream(self, filename, commit_policy : str = "chunk", chunk_size : int = DEFAULT_CHUNK_SIZE, progress = None, lock = None):
+        """
+        Apply a (large) order file to the storage units chunk by chunk (lock: held while each chunk is applied, see ingest_order_file)
+        Return (success, error message, change log, number of changes)
+        """
+        return ingest_order_file(self._storage_units, filename, commit_policy, chunk_size, progress, lock)
     
+    def dispatch_orders(self, orders : list):
+        """
+        Queue orders (id, action, amount) as transport tasks for the vehicles (the load changes once the vehicle finishes its trip)
+        Return (list of task ids, list of errors of the rejected orders)
+        """
+        return self._dispatcher.add_orders(orders)
+
+    def dispatch_order_file(self, filename, chunk_size : int = DEFAULT_CHUNK_SIZE):
+        """
+        Queue all the orders of an order file as transport tasks
+        Return (number of queued tasks, list of errors of the rejected orders)
+        """
+        n_task, errors = 0, []
+        for orders, _ in read_order_chunks(filename, chunk_size):
+            task_ids, chunk_errors = self._dispatcher.add_orders(orders)
+            n_task += len(task_ids)
+            errors += chunk_errors
+        return n_task, errors
+
     def remove_storage_unit(self, id, ignore_error : bool = False):
-        if id in self._storage_units.unit_list.index:
-            self._storage_units.unit_list = self._storage_units.unit_list.drop([id])
+        if id in self._storage_units:
+            self._storage_units.remove_unit(id)
+            self.update_placement_occupied_zone()
         else:
             if ignore_error:
                 raise ValueError("The requested ID does not exist!!!")
+
+    def remove_storage_units(self, ids):
+        """
+        Remove multiple storage units at once (the occupied zone is only updated once)
+        Return the list of ids that do not exist
+        """
+        missing = self._storage_units.remove_units(ids)
+        self.update_placement_occupied_zone()
+        return missing
         
     def remove_vehicle_unit(self, id, ignore_error : bool = False):
         """
         Remove a vehicle unit in the existing warehouse
         """
-        if id in self._vehicles.unit_list.index:
-            self._vehicles.unit_list = self._vehicles.unit_list.drop([id])
+        if id in self._vehicles:
+            self._vehicles.remove_unit(id)
+            self.update_placement_occupied_zone()
         else:
             if ignore_error:
                 raise ValueError("The requested ID does not exist!!!")
 
+    def remove_vehicle_units(self, ids):
+        """
+        Remove multiple vehicle units at once (the occupied zone is only updated once)
+        Return the list of ids that do not exist
+        """
+        missing = self._vehicles.remove_units(ids)
+        self.update_placement_occupied_zone()
+        return missing
+
     # Vehicle
     def add_vehicle_unit(self, new_unit : VehicleUnit):
         if not self.layout == None:
-            out_str = self._vehicles.add_unit(new_unit, self.layout, self._occupied_zone)
-            self._occupied_zone : geometry.Polygon = new_unit.shape 
+            out_str = self._vehicles.add_unit(new_unit, self.layout, pd.Series(self._storage_units.intersecting_zones([new_unit.shape.polygon]), dtype = object))
+            if len(out_str) == 0:
+                self.update_placement_occupied_zone()
             return True, out_str
         return False, out_str
 
+    def set_vehicle_path(self, id, position_list):
+        """
+        Assign a path (list of positions) to a vehicle
+        Return (success, error message), raise KeyError if the vehicle does not exist
+        """
+        success, error_msg = self._vehicles.get_unit(id).set_path(position_list)
+        if success:
+            self._notify("path", {"id": id, "points": np.asarray(position_list, dtype = np.float64).reshape(-1, 2).tolist()})
+        return success, error_msg
+
+    def set_vehicle_paths(self, ids : list, points, offsets):
+        """
+        Assign the paths of many vehicles in one operation (see route_import), the path of ids[i] is points[offsets[i] : offsets[i + 1]]
+        The paths of unknown or inactive vehicles and the empty/non-finite paths are rejected, the others are set at once
+        Return (number of assigned paths, list of errors of the rejected paths)
+        """
+        points = np.asarray(points, dtype = np.float64).reshape(-1, 2)
+        offsets = np.asarray(offsets, dtype = np.int64)
+        invalid = np.concatenate([[0], np.cumsum(~np.isfinite(points).all(axis = 1))])
+        n_invalid = (invalid[offsets[1:]] - invalid[offsets[:-1]]).tolist()
+        keep, slots, errors = [], [], []
+        for k, id in enumerate(ids):
+            if not id in self._vehicles:
+                errors.append(f"{id}: The vehicle does not exist!!!")
+            elif offsets[k + 1] == offsets[k]:
+                errors.append(f"{id}: Empty path!!!")
+            elif n_invalid[k] > 0:
+                errors.append(f"{id}: Invalid coordinates in the path!!!")
+            elif not self._vehicles.get_unit(id).active:
+                errors.append(f"{id}: Unable to set new path due to unit's inactivity!!!")
+            else:
+                keep.append(k)
+                slots.append(self._vehicles.get_unit(id).slot)
+        if len(keep) == 0:
+            return 0, errors
+        keep = np.array(keep, dtype = np.int64)
+        starts, lengths = offsets[keep], offsets[keep + 1] - offsets[keep]
+        new_offsets = np.zeros(len(keep) + 1, dtype = np.int64)
+        new_offsets[1:] = np.cumsum(lengths)
+        rows = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1]) # waypoints of the kept paths
+        self._vehicles.fleet.set_paths(np.array(slots, dtype = np.int64), points[rows], new_offsets)
+        if not self._change_sink == None:
+            for k in keep.tolist():
+                self._notify("path", {"id": ids[k], "points": points[offsets[k]:offsets[k + 1]].tolist()})
+        return len(keep), errors
+
     def add_vehicle_units(self, *args):
         _quick_add = np.vectorize(self.add_vehicle_unit, otypes = [bool])
         _quick_add(args)
 
+    # Charging station
+    def add_charging_station(self, station : ChargingStation):
+        """
+        Add a charging station (its chargers must be inside the layout)
+        Return (success, list of errors)
+        """
+        errors = []
+        if any(other.id == station.id for other in self._charging_stations):
+            errors.append("Charging station ID already exists!!!")
+        if not self.layout == None:
+            chargers = geometry.shapely.points([station.charger_location(k) for k in range(station.n_charger)])
+            if not geometry.shapely.contains(self.layout.polygon, chargers).all():
+                errors.append("Charging station is outside of the warehouse!!!")
+        if len(errors) > 0:
+            return False, errors
+        self._charging_stations.append(station)
+        self._layout_version += 1
+        self._notify("add_station", station.unit_info())
+        return True, errors
+
+    def remove_charging_station(self, id, ignore_error : bool = False):
+        for k, station in enumerate(self._charging_stations):
+            if station.id == id:
+                del self._charging_stations[k]
+                self._layout_version += 1
+                self._notify("remove_station", id)
+                return None
+        if ignore_error:
+            raise ValueError("The requested ID does not exist!!!")
+
+    def step(self, elapsed : float = 1.0):
+        """
+        One simulation step: move the vehicles, close/assign the transport tasks and schedule the charging
+        Return dict of the events: finished (vehicles), tasks (see dispatch_step), energy (see Vehicles.pop_energy_events), charging (see ChargingScheduler.schedule)
+        """
+        finished = self._vehicles.step(elapsed)
+        self._dispatcher.update(finished)
+        assignments = self._dispatcher.assign()
+        energy_events = self._vehicles.pop_energy_events()
+        # battery/task state changes -> new depletion deadlines
+        self._charging.refresh([unit.id for unit in finished] + [vehicle_id for vehicle_id, _ in assignments]
+                               + [vehicle.id for vehicle, _, _ in energy_events])
+        return {"finished": finished, "tasks": self._dispatcher.pop_events(), "energy": energy_events, "charging": self._charging.schedule()}
+
+    def warehouse_info(self) -> dict:
+        """
+        Dictionary of the whole warehouse (content of the saved JSON file)
+        """
+        # Layout data
+        layout_data = self.get_layout("dict")
+        # Storage unit
+        storage_data = self._storage_units.storage_info()
+        vehicle_data = self._vehicles.vehicle_info()
+        station_data = [station.unit_info() for station in self._charging_stations]
+        return {"layout": layout_data, "storage": storage_data, "vehicle": vehicle_data, "charging_station": station_data}
+
+    def capture_data(self) -> dict:
+        """
+        Consistent capture of the warehouse to be saved by write_data, cheap enough for the GUI thread
+        (the storage records are built by write_data, see Storage.capture_info)
+        """
+        station_data = [station.unit_info() for station in self._charging_stations]
+        return {"layout": self.get_layout("dict"), "storage": self._storage_units.capture_info(), "vehicle": self._vehicles.vehicle_info(), "charging_station": station_data}
+
+    @staticmethod
+    def write_data(capture : dict, filename = "autosave.json"):
+        """
+        Serialize a capture_data into a JSON file (safe to call on a worker thread, i.e., BackgroundTask)
+        The file is written next to the target and renamed over it: an interrupted save leaves the previous file intact
+        Return the path of the saved file (None if the warehouse has no valid layout)
+        """
+        if isinstance(capture["layout"], Exception):
+            return None
+        # The storage records are serialized one by one as they are built (the whole file is never held in memory)
+        sections = dict(capture, storage = Storage.iter_captured_info(capture["storage"]))
+        target = DEFAULT_WAREHOUSE_PATH + "\\" + filename
+        temp_file = target + ".tmp"
+        with open(temp_file, mode = "w") as file:
+            write_warehouse_json(file, sections)
+            file.flush()
+            fsync(file.fileno())
+        replace(temp_file, target)
+        return target
+
     def save_data(self, filename = "autosave.json"):
-        with open(DEFAULT_WAREHOUSE_PATH + "\\" + filename, mode = "w") as file:
-            # Layout data
-            layout_data = self.get_layout("dict")
-            # Storage unit
-            storage_data = self._storage_units.storage_info()
-            vehicle_data = self._vehicles.vehicle_info()
-            data = {"layout": layout_data, "storage": storage_data, "vehicle": vehicle_data}
-            if not isinstance(layout_data, Exception):
-                js_dump(data, file)
-            else:
-                pass
+        """
+        Save the warehouse as a JSON file on the calling thread (see capture_data/write_data for a background save)
+        """
+        return Warehouse.write_data(self.capture_data(), filename)
+
+    def vehicle_state(self) -> dict:
+        """
+        Fleet state of the vehicles without JSON field (aligned with the vehicle records of warehouse_info)
+        """
+        fleet = self._vehicles.fleet
+        slots = np.array([unit.slot for unit in self._vehicles.units()], dtype = np.int64)
+        return {"ort": fleet.ort[slots], "odometer": fleet.odometer[slots], "load": fleet.load[slots]}
+
+    def save_snapshot(self, directory = DEFAULT_SNAPSHOT_PATH, extra : dict | None = None):
+        """
+        Save the warehouse as a columnar snapshot (typed arrays, memory-mapped by load_snapshot) with the fleet state of the vehicles
+        """
+        write_snapshot(self.warehouse_info(), directory, self.vehicle_state(), extra)
     
     def collision_check(self):
         collision_list = [] # List of collision records (type: str)
         vehicles = self._vehicles.unit_list["unit"].to_list()
-        storage = self._storage_units.unit_list["unit"].to_list()
-        all_occupants = vehicles + storage
+        # Storage units: only the ones whose polygon touches the vehicle are checked (the others are not built if lazy)
+        storage_ids = self._storage_units.ids()
+        storage_polygons = self._storage_units.polygons()
         # quick_check = np.vectorize(VehicleUnit.collision_with, otypes = bool)
         # self._vehicles.unit_list["unit"].apply(quick_check)
         for vehicle in self._vehicles.unit_list["unit"].to_list():
+            hits = np.flatnonzero(geometry.shapely.intersects(storage_polygons, vehicle.shape.polygon)) if vehicle.active else []
+            all_occupants = vehicles + [self._storage_units.get_unit(storage_ids[k]) for k in hits]
             for occupant in all_occupants:
                 collied, obj = vehicle.collision_with(occupant)
                 if collied:
@@ -151,11 +491,9 @@ class Warehouse():
         layout = self.layout.polygon
         layout = pgd.GeoSeries(layout)
         cmap = plt.get_cmap('jet')
-        storage_data : pd.Series = self._storage_units.unit_list["unit"]
-        loading_data = storage_data.apply(lambda x: float(x.load_percent))
-        loading_data = loading_data.apply(lambda x: cmap(x / 100)).to_list()
-        storage_units_geometry = storage_data.apply(lambda x: x.shape.polygon)
-        storage_units_geometry = pgd.GeoSeries(storage_units_geometry)
+        # Read from the columns of the storage (the lazy units are not built for drawing)
+        loading_data = cmap(self._storage_units.loads() / self._storage_units.capacities())
+        storage_units_geometry = pgd.GeoSeries(self._storage_units.polygons())
         vehicles_geometry = self._vehicles.unit_list["unit"].apply(lambda x: x.shape.polygon)
         vehicles_geometry = pgd.GeoSeries(vehicles_geometry)
         vehicles_trail = self._vehicles.unit_list["unit"].apply(lambda x: x.trail).to_list()
@@ -170,15 +508,35 @@ class Warehouse():
                     storage_units_geometry.plot(ax = ax, color = "r")
             if not vehicles_geometry.empty:
                 vehicles_geometry.plot(ax = ax, color = "#A020F0", edgecolor = "k")
+            for station in self._charging_stations:
+                chargers = [station.charger_location(k) for k in range(station.n_charger)]
+                ax.plot(*zip(*chargers), "g^")
             if not vehicles_trail.empty:
                 if path_display:
                     vehicles_trail.plot(ax = ax, color = "k", edgecolor = "k")
 
     def update_placement_occupied_zone(self):
-        storage_zone = self._storage_units.occupied
-        vehicle_zone = self._vehicles.occupied
-        occupied_zone_list = storage_zone + vehicle_zone
-        self._occupied_zone = pd.Series(occupied_zone_list)
+        """
+        Mark the placement zone out of date, it is rebuilt by the next placement (see get_placement_zone)
+        """
+        self._occupied_zone = None
+
+    def get_placement_zone(self) -> pd.Series:
+        """
+        Occupied zones of the storage units and vehicles docking (for placement only)
+        """
+        if not isinstance(self._occupied_zone, pd.Series):
+            storage_zone = self._storage_units.occupied
+            vehicle_zone = self._vehicles.occupied
+            occupied_zone_list = storage_zone + vehicle_zone
+            self._occupied_zone = pd.Series(occupied_zone_list)
+        return self._occupied_zone
+
+    def _vehicle_zone(self) -> pd.Series:
+        """
+        Occupied zones of the vehicles, checked by a storage placement (the storage units check their own collisions)
+        """
+        return pd.Series(self._vehicles.occupied, dtype = object)
 
     # def update_occupied_zone(self):
     #     storage_zone = self._storage_units.occupied_zone()
@@ -3,8 +3,19 @@ from app_module.warehouse_essential.warehouse import Warehouse, DEFAULT_WAREHOUS
 import app_module.warehouse_essential.geometry as geometry
 import app_module.data_viewer as dtv
 import app_module.support_diaglog as diag
+from app_module.warehouse_essential.trip_log import TripLogger
+from app_module.warehouse_essential.telemetry import TelemetryService
+from app_module.warehouse_essential.journal import WarehouseJournal
+from app_module.warehouse_essential.path_cache import PathCache, DEFAULT_PATH_CACHE_DIR
+from app_module.warehouse_essential.route_import import read_route_file, read_route_files, is_route_table
+from app_module.warehouse_essential.shift_analytics import ShiftAnalytics
+from app_module.warehouse_essential.operation_shift import DEFAULT_OPERATION_PATH
+from threading import Lock
+from app_module.background_task import BackgroundTask
 import pandas as pd
 
+RENDER_INTERVAL = 33 # ms between two frames of the warehouse drawing (about 30 fps)
+
 class WarehouseMonitorWidget(QWidget):
     """
     Main widget of Warehouse Monitoring System
@@ -16,6 +27,7 @@ class WarehouseMonitorWidget(QWidget):
     toggle_heatmap = Signal(None)
     toggle_path = Signal(None)
     warehouse_summary = Signal(None)
+    shift_analytics = Signal(None)
 
     def __init__(self, operation) -> None:
         super().__init__()
@@ -26,9 +38,26 @@ class WarehouseMonitorWidget(QWidget):
         self.toggle_heatmap.connect(self._toggle_hm)
         self.toggle_path.connect(self._toggle_path)
         self.warehouse_summary.connect(self._warehouse_summary)
+        self.shift_analytics.connect(self._shift_analytics_view)
+        # Shift analytics over the operators' shift records (parsed once, then only the new records)
+        self._shift_analytics = ShiftAnalytics(DEFAULT_OPERATION_PATH, DEFAULT_OPERATION_PATH + "\\analytics")
+        # Trip log of the vehicles (shared by every warehouse loaded into the widget)
+        self._trip_logger = TripLogger()
+        # Live telemetry (applied to the vehicles on its own thread, the lock is held by the timer while simulating/drawing)
+        self._fleet_lock = Lock()
+        self._collision_version = None # state of the warehouse at the last collision check (see timer_out)
+        self._telemetry = None
+        # Parsed vehicle path files (route files are assigned again and again)
+        self._path_cache = PathCache(cache_dir = DEFAULT_PATH_CACHE_DIR)
+        # Background save of the warehouse (manual save)
+        self._save_task = None
+        # Order file applied to the storage on a worker thread (the storage is not changed or replaced meanwhile)
+        self._order_task = None
+        # Autosave journal of the changes (the warehouse left by a crash is offered first)
+        self._journal = WarehouseJournal()
         # Immediately create a warehouse object
-        # empty warehouse object
-        self.warehouse_obj = Warehouse()
+        # empty warehouse object or the recovered one
+        self.warehouse_obj = self._recover_journal()
         self._options = {"heat_map" : True, "vehicle_path" : True}
 
         self._operation = operation
@@ -50,24 +79,36 @@ class WarehouseMonitorWidget(QWidget):
         self._load_warehouse.clicked.connect(self.quick_load_warehouse)
         self._add_storage_btn = QPushButton("Add a Storage Unit")
         self._add_storage_btn.clicked.connect(self.add_storage)
+        self._add_storage_array_btn = QPushButton("Add a Storage Array")
+        self._add_storage_array_btn.clicked.connect(self.add_storage_array)
         self._remove_storage_btn = QPushButton("Remove a Storage Unit")
         self._remove_storage_btn.clicked.connect(self.remove_storage)
         self._load_storage_btn = QPushButton("Load/Unload a Storage Unit")
         self._load_storage_btn.clicked.connect(self.modify_storage_load)
+        self._dispatch_btn = QPushButton("Dispatch an Order File")
+        self._dispatch_btn.clicked.connect(self.dispatch_orders)
         self._add_vehicle_btn = QPushButton("Add a Vehicle")
         self._add_vehicle_btn.clicked.connect(self.add_vehicle)
         self._remove_vehicle_btn = QPushButton("Remove a Vehicle")
         self._remove_vehicle_btn.clicked.connect(self.remove_vehicle)
         self._add_path_btn = QPushButton("Setup a Vehicle Path")
         self._add_path_btn.clicked.connect(self.set_vehicle_path)
+        self._import_routes_btn = QPushButton("Import Fleet Routes")
+        self._import_routes_btn.clicked.connect(self.import_routes)
+        self._telemetry_btn = QPushButton("Connect Live Telemetry")
+        self._telemetry_btn.clicked.connect(self.toggle_telemetry)
         btn_layout.addWidget(self._setup_layout_btn)
         btn_layout.addWidget(self._load_warehouse)
         btn_layout.addWidget(self._add_storage_btn)
+        btn_layout.addWidget(self._add_storage_array_btn)
         btn_layout.addWidget(self._remove_storage_btn)
         btn_layout.addWidget(self._load_storage_btn)
+        btn_layout.addWidget(self._dispatch_btn)
         btn_layout.addWidget(self._add_vehicle_btn)
         btn_layout.addWidget(self._remove_vehicle_btn)
         btn_layout.addWidget(self._add_path_btn)
+        btn_layout.addWidget(self._import_routes_btn)
+        btn_layout.addWidget(self._telemetry_btn)
 
         self._data_viewer = dtv.WarehouseInfoView()
 
@@ -90,18 +131,80 @@ class WarehouseMonitorWidget(QWidget):
         self._timer = QTimer()
         self._timer.start(1000)
         self._timer.timeout.connect(self.timer_out)
+        # Drawing runs on its own timer (the artists are updated in place, see WarehouseRenderer)
+        self._render_timer = QTimer()
+        self._render_timer.start(RENDER_INTERVAL)
+        self._render_timer.timeout.connect(self.render_frame)
+        if not self.warehouse_obj.layout == None:
+            self._data_viewer.update_storage()
+            self._data_viewer.update_vehicle()
+            self._announcement.add_event("Recovered the Warehouse from the autosave journal", 1)
+
+    def _recover_journal(self) -> Warehouse:
+        """
+        Offer to recover the warehouse of the journal if the monitor was not closed properly
+        Return the recovered warehouse or an empty one
+        """
+        if not WarehouseJournal.need_recovery(self._journal.directory):
+            return Warehouse()
+        ret = QMessageBox.question(self, "Recover Warehouse", "The monitor was not closed properly.\nDo you want to recover the Warehouse from the autosave journal?")
+        if ret == QMessageBox.Yes:
+            try:
+                return WarehouseJournal.recover(self._journal.directory)
+            except Exception as e:
+                QMessageBox.critical(self, "Recover Warehouse Error", f"Unable to recover the Warehouse!!!\n{e}")
+        return Warehouse()
         
+    def get_warehouse(self):
+        return self._warehouse_obj
+    def set_warehouse(self, warehouse : Warehouse):
+        warehouse.vehicles.trip_logger = self._trip_logger
+        if not self._telemetry == None:
+            self._telemetry.vehicles = warehouse.vehicles
+        with self._fleet_lock:
+            self._warehouse_obj = warehouse
+        self._journal.attach(warehouse)
+    warehouse_obj = property(fget = get_warehouse, fset = set_warehouse)
+
     def timer_out(self):
         self.operation_view_layout.update()
-        self._plot.clear_drawing()
-        collision_msg = self.warehouse_obj.collision_check()
-        if not collision_msg == "":
-            self._announcement.add_event("COLLISION DETECTED: " + collision_msg  + "\nRemove path entity of Collided vehile(s)!!!", severity = 2)
-        self.move_vehicle()
-        if self.warehouse_obj.layout != None:
-            self.warehouse_obj.show(ax = self._plot.ax, heat_display = self._options.get("heat_map"), path_display = self._options.get("vehicle_path"))
+        with self._fleet_lock:
+            warehouse = self.warehouse_obj
+            version = (warehouse, warehouse.storage.index_version, warehouse.vehicles.index_version, warehouse.vehicles.fleet.pos_clock)
+            if not version == self._collision_version: # nothing moved since the last check: no new collision
+                collision_msg = warehouse.collision_check()
+                if not collision_msg == "":
+                    self._announcement.add_event("COLLISION DETECTED: " + collision_msg  + "\nRemove path entity of Collided vehile(s)!!!", severity = 2)
+                self._collision_version = version
+            self.move_vehicle()
+
+    def render_frame(self):
+        """
+        Draw the changes of the warehouse since the last frame (render timer), nothing is drawn if it did not change
+        """
+        with self._fleet_lock:
+            self._plot.render(self.warehouse_obj, heat_display = self._options.get("heat_map"), path_display = self._options.get("vehicle_path"))
+
+    def _order_file_running(self) -> bool:
+        """
+        True (and warn) if an order file is still being applied to the storage
+        """
+        if not self._order_task == None and self._order_task.isRunning():
+            QMessageBox.warning(self, "Warning", "An order file is still being applied to the storage units!!!")
+            return True
+        return False
+
+    def _set_storage_buttons(self, enabled : bool):
+        """
+        Enable/disable the actions changing or replacing the storage (disabled while an order file is applied)
+        """
+        for btn in (self._setup_layout_btn, self._load_warehouse, self._add_storage_btn, self._add_storage_array_btn,
+                    self._remove_storage_btn, self._load_storage_btn):
+            btn.setDisabled(not enabled)
 
     def set_layout(self):
+        if self._order_file_running():
+            return None
         form = diag.SetLayoutForm()
         try:
             if form.exec() == QDialog.Accepted:
@@ -115,9 +218,10 @@ class WarehouseMonitorWidget(QWidget):
                     msg_box.setIcon(QMessageBox.Warning)
                     ret = msg_box.exec()
                     if ret == QMessageBox.Yes:                        
-                        self.warehouse_obj.layout = form.out
-                        self.warehouse_obj.storage.clear_all()
-                        self.warehouse_obj.vehicles.clear_all()
+                        with self._fleet_lock:
+                            self.warehouse_obj.layout = form.out
+                            self.warehouse_obj.storage.clear_all()
+                            self.warehouse_obj.vehicles.clear_all()
                         self._data_viewer.update()
                         self._announcement.add_event(f"Erase current Warehouse and Setup a new layout\nStorage and Vehicle Data is wiped out!", 1)
                     elif ret == QMessageBox.No:
@@ -125,7 +229,8 @@ class WarehouseMonitorWidget(QWidget):
                     elif ret == QMessageBox.Cancel:
                         pass
                 else:
-                    self.warehouse_obj.layout = form.out
+                    with self._fleet_lock:
+                        self.warehouse_obj.layout = form.out
                     self._announcement.add_event(f"New Storage Layout is setup", 0)
         except geometry.GeometryException as e:
             QMessageBox.critical(self, "Setup error", e.__str__())
@@ -134,24 +239,43 @@ class WarehouseMonitorWidget(QWidget):
         """
         Method open a data file of existing warehouse data
         """
+        if self._order_file_running():
+            return None
         file_diag = diag.LoadFileForm()
         filename = file_diag.getOpenFileName()[0]
         # name == "" (empty string if no file is selected) (name == "" -> True)
         if not filename == "":
             try:
-                self.warehouse_obj = Warehouse().load_info(filename)
+                self.warehouse_obj = Warehouse().load_info(filename, lazy = True)
             except Exception:
                 QMessageBox.critical(self, "Load Warehouse Error", "Corrupted Warehouse Records or No record availble" + "\nUnable to load data of the Warehouse!!!")
                 self._announcement.add_event(f"Failed attempt to Load data of a Warehouse", 1)
             else:
                 self._data_viewer.update_storage()
                 self._data_viewer.update_vehicle()
-                self._announcement.add_event(f"Successfully Load a Warehouse\n  \u2022 Number of storage units: {len(self.warehouse_obj.storage.unit_list)}\n  \u2022 Number of vehicle unit: {len(self.warehouse_obj.vehicles.unit_list)}")
+                self._announce_load()
+
+    def _announce_load(self):
+        """
+        Announce the result of loading a warehouse (including the rejected records)
+        """
+        msg = f"Successfully Load a Warehouse\n  \u2022 Number of storage units: {len(self.warehouse_obj.storage)}\n  \u2022 Number of vehicle unit: {len(self.warehouse_obj.vehicles.unit_list)}"
+        report = self.warehouse_obj.load_report
+        n_reject = len(report["storage"]) + len(report["vehicle"])
+        if n_reject > 0:
+            msg += f"\n  \u2022 Number of rejected records: {n_reject}"
+            for _, unit_id, errors in (report["storage"] + report["vehicle"])[:10]:
+                msg += f"\n    - ID# {unit_id}: {' '.join(errors)}"
+            self._announcement.add_event(msg, 1)
+        else:
+            self._announcement.add_event(msg)
 
     def quick_load_warehouse(self):
         """
         Quickly load from autosave. Rasie error if the file not found
         """
+        if self._order_file_running():
+            return None
         # Fail-safe when try to load on working warehouse
         if not self.warehouse_obj.layout == None:
             msg_box = QMessageBox()
@@ -171,7 +295,7 @@ class WarehouseMonitorWidget(QWidget):
             elif ret == QMessageBox.Cancel:
                 return None
         try:
-            self.warehouse_obj = Warehouse().load_info(DEFAULT_WAREHOUSE_PATH + "\\autosave.json")
+            self.warehouse_obj = Warehouse().load_info(DEFAULT_WAREHOUSE_PATH + "\\autosave.json", lazy = True)
         except FileNotFoundError:
             QMessageBox.critical(self, "File not found", "No autosaved file found. Cannot perform quick load")
         except Exception:
@@ -180,19 +304,22 @@ class WarehouseMonitorWidget(QWidget):
         else:
             self._data_viewer.update_storage()
             self._data_viewer.update_vehicle()
-            self._announcement.add_event(f"Successfully Load a Warehouse\n  \u2022 Number of storage units: {len(self.warehouse_obj.storage.unit_list)}\n  \u2022 Number of vehicle unit: {len(self.warehouse_obj.vehicles.unit_list)}")
+            self._announce_load()
 
     def add_storage(self):
         """
         Method for placing an individual unit of storage
         """
+        if self._order_file_running():
+            return None
         if self.warehouse_obj.layout == None:
             QMessageBox.warning(self, "Warning", "Warehouse has no layout!!!")
             return None
         form = diag.AddStorageFrom()
         if form.exec() == QDialog.Accepted:
             new_storage_unit = form.out
-            ret, error = self.warehouse_obj.add_storage_unit(new_storage_unit)
+            with self._fleet_lock:
+                ret, error = self.warehouse_obj.add_storage_unit(new_storage_unit)
             if ret == True:
                 if len(error) > 0:
                     error_msg = "Unable to add a new storage due to the following error(s):"
@@ -204,10 +331,44 @@ class WarehouseMonitorWidget(QWidget):
                     self._data_viewer.update_storage()
                     self._announcement.add_event(f"A new Storage Unit ID#{new_storage_unit.id} is added", 0)
 
+    def add_storage_array(self):
+        """
+        Method for placing an array (rows x columns) of storage units in one action
+        """
+        if self._order_file_running():
+            return None
+        if self.warehouse_obj.layout == None:
+            QMessageBox.warning(self, "Warning", "Warehouse has no layout!!!")
+            return None
+        form = diag.AddStorageArrayForm()
+        if form.exec() == QDialog.Accepted:
+            params = form.out
+            with self._fleet_lock:
+                ret, error = self.warehouse_obj.add_storage_array(**params)
+            if not ret:
+                QMessageBox.critical(self, "Error in adding a storage array", error)
+                return None
+            n_unit = params["rows"] * params["cols"]
+            n_added = n_unit - len(error)
+            if n_added > 0:
+                self._data_viewer.update_storage()
+            if len(error) > 0:
+                error_msg = f"{len(error)} of {n_unit} storage unit(s) cannot be added due to the following error(s):"
+                for _, unit_id, errors in error[:10]:
+                    error_msg += f"\n \u2022 ID# {unit_id}: {' '.join(errors)}"
+                if len(error) > 10:
+                    error_msg += f"\n \u2022 ..."
+                QMessageBox.warning(self, "Error in adding a storage array", error_msg)
+                self._announcement.add_event(f"{n_added} of {n_unit} Storage Units of the array ({params['id_prefix']}) are added", 1)
+            else:
+                self._announcement.add_event(f"A new Storage Array of {n_unit} units ({params['id_prefix']}) is added", 0)
+
     def remove_storage(self):
         """
         Method for removing an existing storage unit
         """
+        if self._order_file_running():
+            return None
         if self.warehouse_obj.layout == None:
             QMessageBox.warning(self, "Warning", "Warehouse has no layout!!!")
             return None
@@ -218,7 +379,8 @@ class WarehouseMonitorWidget(QWidget):
         if form.exec() == QDialog.Accepted:
             _shelf_id = form.out
             try:
-                self.warehouse_obj.remove_storage_unit(_shelf_id)
+                with self._fleet_lock:
+                    self.warehouse_obj.remove_storage_unit(_shelf_id)
             except ValueError as e:
                 QMessageBox.critical(self, "ID does not match", e.__str__())
             else:
@@ -228,21 +390,108 @@ class WarehouseMonitorWidget(QWidget):
         """
         Method for loading/unloading good into an existing storage unit (input diaglogue)
         """
+        if self._order_file_running():
+            return None
         if self.warehouse_obj.layout == None:
             QMessageBox.warning(self, "Warning", "Warehouse has no layout!!!")
             return None
         if self.warehouse_obj.storage.empty:
             QMessageBox.warning(self, "Warning", "Warehouse does not contain any storage unit!!!")
-        form = diag.StorageLoadForm(self, self.warehouse_obj.storage.unit_list.index.to_list())
+        form = diag.StorageLoadForm(self, self.warehouse_obj.storage.ids())
         if form.exec() == QDialog.Accepted:
+            if not form.order_file == None:
+                self.stream_order_file(form.order_file, form.commit_policy)
+                return None
             lines = form.out
-            success, error, changes = self.warehouse_obj.storage_load_change(lines)
+            with self._fleet_lock:
+                success, error, changes = self.warehouse_obj.storage_load_change(lines)
             if not success:
                 QMessageBox.warning(self, "Invalid operation", error)
             if len(changes) > 0:
                 changes.insert(0, "Storage Unit Load Changes:")
                 self._announcement.add_event("\n".join(changes))
 
+    def import_routes(self):
+        """
+        Assign the paths of the whole fleet at once: a route table (vehicle_id, seq, x, y[, t]) or one path file per vehicle (i.e., path1_Veh1.csv)
+        """
+        if self.warehouse_obj.vehicles.empty:
+            QMessageBox.warning(self, "Warning", "Warehouse needs vehicles to import routes!!!")
+            return None
+        filenames = QFileDialog(self).getOpenFileNames(self, "Select a route table or the path files", diag.DEFAULT_DATA_PATH)[0]
+        if len(filenames) == 0:
+            return None
+        try:
+            if len(filenames) == 1 and is_route_table(filenames[0]):
+                ids, points, offsets = read_route_file(filenames[0])
+            else:
+                ids, points, offsets = read_route_files(filenames, self._path_cache)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Route File Error", f"Invalid route file! {e}")
+            return None
+        with self._fleet_lock:
+            n_path, errors = self.warehouse_obj.set_vehicle_paths(ids, points, offsets)
+        msg = f"{n_path} vehicle path(s) imported"
+        if len(errors) > 0:
+            msg += f"\n{len(errors)} path(s) rejected:\n" + "\n".join(errors[:10])
+        self._announcement.add_event(msg, 1 if len(errors) > 0 else 0)
+
+    def dispatch_orders(self):
+        """
+        Queue the orders of a file as transport tasks, the vehicles carry them and the storage load changes on arrival
+        """
+        if self.warehouse_obj.storage.empty or self.warehouse_obj.vehicles.empty:
+            QMessageBox.warning(self, "Warning", "Warehouse needs storage units and vehicles to dispatch orders!!!")
+            return None
+        filename = QFileDialog(self).getOpenFileName()[0]
+        if filename == "":
+            return None
+        try:
+            n_task, errors = self.warehouse_obj.dispatch_order_file(filename)
+        except (FileNotFoundError, ValueError) as e:
+            QMessageBox.critical(self, "Order File Error", f"Invalid order file! {e}")
+            return None
+        msg = f"{n_task} order(s) queued for the vehicles"
+        if len(errors) > 0:
+            msg += f"\n{len(errors)} order(s) rejected:\n" + "\n".join(errors[:10])
+        self._announcement.add_event(msg, 1 if len(errors) > 0 else 0)
+
+    def stream_order_file(self, filename, commit_policy = "chunk"):
+        """
+        Apply an order file to the storage units on a background thread
+        """
+        self._set_storage_buttons(False) # one order file at a time, the storage is not changed or replaced meanwhile
+        self._order_progress = QProgressDialog("Loading order file...", None, 0, 100, self)
+        self._order_progress.setWindowTitle("Load/Unload Storage")
+        self._order_progress.setMinimumDuration(500)
+        # the chunks are applied under the lock of the simulation and the drawing (they change the same loads)
+        self._order_task = BackgroundTask(self.warehouse_obj.storage_load_stream, filename, commit_policy, lock = self._fleet_lock,
+                                          report_progress = True, parent = self)
+        self._order_task.progress.connect(self._order_progress.setValue)
+        self._order_task.done.connect(self._order_file_done)
+        self._order_task.failed.connect(self._order_file_failed)
+        self._order_task.start()
+
+    @Slot(object)
+    def _order_file_done(self, result):
+        success, error, changes, n_change = result
+        self._order_progress.reset()
+        self._set_storage_buttons(True)
+        if not success:
+            QMessageBox.warning(self, "Invalid operation", error)
+        if n_change > 0:
+            changes.insert(0, f"Storage Unit Load Changes ({n_change} orders from file):")
+            if n_change > len(changes) - 1:
+                changes.append(f"  \u2022 ... and {n_change - len(changes) + 1} other change(s)")
+            self._announcement.add_event("\n".join(changes))
+
+    @Slot(str)
+    def _order_file_failed(self, error):
+        self._order_progress.reset()
+        self._set_storage_buttons(True)
+        QMessageBox.critical(self, "Order File Error", error)
+        self._announcement.add_event("Failed attempt to Load an Order File", 1)
+
     def add_vehicle(self):
         """
         Method for placing an individual unit of vehicle
@@ -253,7 +502,8 @@ class WarehouseMonitorWidget(QWidget):
         form = diag.AddVehicleFrom()
         if form.exec() == QDialog.Accepted:
             new_vehicle = form.out
-            ret, error = self.warehouse_obj.add_vehicle_unit(new_vehicle)
+            with self._fleet_lock:
+                ret, error = self.warehouse_obj.add_vehicle_unit(new_vehicle)
             if ret == True:
                 if len(error) > 0:
                     error_msg = "Unable to add a new vehicle due to the following error(s):"
@@ -276,7 +526,8 @@ class WarehouseMonitorWidget(QWidget):
         if form.exec() == QDialog.Accepted:
             _shelf_id = form.out
             try:
-                self.warehouse_obj.remove_vehicle_unit(_shelf_id)
+                with self._fleet_lock:
+                    self.warehouse_obj.remove_vehicle_unit(_shelf_id)
             except ValueError as e:
                 QMessageBox.critical(self, "ID does not match", e.__str__())
             else:
@@ -290,39 +541,110 @@ class WarehouseMonitorWidget(QWidget):
         form = diag.AddVehiclePath(self.warehouse_obj.vehicles.unit_list["id"].to_list())
         if form.exec() == QDialog.Accepted:
             vehicle_id, filename = form.out
-            vehicle_unit = self.warehouse_obj.vehicles.unit_list["unit"][vehicle_id]
             try:
-                path_data = pd.read_csv(filename, header = None)
-                pos_list = path_data.apply(lambda x : (float(x[0]), float(x[1])), axis = 1).to_list()
+                pos_list = self._path_cache.get(filename) # parsed once per file version
             except:
                 QMessageBox.critical(self, "File not found", f"The requested file does exist!!!")
                 pos_list = []
             else:
-                result = vehicle_unit.set_path(pos_list)
+                result = self.warehouse_obj.set_vehicle_path(vehicle_id, pos_list)
                 if not result[0]: # If the path is not successfully import, show error:
                     QMessageBox.warning(self, "Failed operation", result[1])
     
     def move_vehicle(self):
-        self.warehouse_obj.vehicles.unit_list["unit"].apply(lambda unit : unit.move())
+        events = self.warehouse_obj.step(elapsed = self._timer.interval() / 1000)
+        for _, order, status, error_msg in events["tasks"]:
+            if status == "done":
+                self._announcement.add_event(f"Order delivered: {order[1]} {order[2]} at storage unit ID# {order[0]}")
+            else:
+                self._announcement.add_event(f"Order failed: {order[1]} {order[2]} at storage unit ID# {order[0]}\n{error_msg}", severity = 1)
+        if len(events["tasks"]) > 0:
+            self._data_viewer.update_storage()
+        for vehicle, event, value in events["energy"]:
+            if event == "threshold" and value <= 0:
+                self._announcement.add_event(f"{vehicle} ran out of battery and stopped!!!", severity = 2)
+            elif event == "threshold":
+                self._announcement.add_event(f"Low battery: {vehicle} is below {value:.0f}%", severity = 1)
+            else:
+                self._announcement.add_event(f"{vehicle} cannot finish its path with the remaining battery (needs {value:.1f}%)", severity = 1)
+        for vehicle, event, station_id in events["charging"]:
+            if event == "charge":
+                self._announcement.add_event(f"{vehicle} is sent to charge at charging station ID# {station_id}")
+            elif event == "home":
+                self._announcement.add_event(f"{vehicle} is sent home to charge (no charging station)")
+            elif event == "release":
+                self._announcement.add_event(f"{vehicle} is charged and back to service")
+            elif event == "stranded":
+                self._announcement.add_event(f"{vehicle} ran out of battery before reaching a charger!!!", severity = 2)
     
+    def toggle_telemetry(self):
+        """
+        Connect the vehicles to a live telemetry feed (tcp://host:port, unix://path or a file path), or disconnect the current feed
+        """
+        if not self._telemetry == None:
+            stats = self._telemetry.stats
+            self._telemetry.stop()
+            self._telemetry = None
+            self._telemetry_btn.setText("Connect Live Telemetry")
+            self._announcement.add_event(f"Telemetry disconnected ({stats['applied']} updates applied, {stats['rejected']} rejected lines)")
+            return
+        source, ok = QInputDialog.getText(self, "Live Telemetry", "Telemetry source (tcp://host:port, unix://path or file path):")
+        if not ok or source.strip() == "":
+            return
+        file_format, ok = QInputDialog.getItem(self, "Live Telemetry", "Line format:", ["ndjson", "csv"], 0, False)
+        if not ok:
+            return
+        try:
+            self._telemetry = TelemetryService(self.warehouse_obj.vehicles, source.strip(), file_format, lock = self._fleet_lock)
+        except ValueError as e:
+            QMessageBox.warning(self, "Failed operation", str(e))
+            return
+        self._telemetry.start()
+        self._telemetry_btn.setText("Disconnect Live Telemetry")
+        self._announcement.add_event(f"Telemetry connected to {source.strip()}")
+
     @Slot(None) # call before erase the current widget
     def manual_load(self):
         self.load_warehouse()
 
     @Slot(None) # call before erase the current widget
     def about_to_close(self):
+        if not self._save_task == None:
+            self._save_task.wait()
         if not self.warehouse_obj.layout == None:
             self.warehouse_obj.save_data()
+        self._journal.close() # saved: nothing to recover on the next start
+        if not self._telemetry == None:
+            self._telemetry.stop()
+        self._trip_logger.close()
 
     @Slot(str)
     def manual_save(self):
         if not self.warehouse_obj.layout == None:
+            if not self._save_task == None and self._save_task.isRunning():
+                QMessageBox.warning(self, "Warning", "The Warehouse is still being saved!!!")
+                return
             form = diag.ManualSaveForm()
             if form.exec() == QDialog.Accepted:
                 filename = form.out
-                self.warehouse_obj.save_data(filename)
+                # Captured on the GUI thread (consistent with the simulation), serialized and written on a worker thread
+                with self._fleet_lock:
+                    capture = self.warehouse_obj.capture_data()
+                self._save_task = BackgroundTask(Warehouse.write_data, capture, filename, parent = self)
+                self._save_task.done.connect(self._save_done)
+                self._save_task.failed.connect(self._save_failed)
+                self._save_task.start()
+                self._announcement.add_event(f"Saving the Warehouse to {filename}...")
         else:
             QMessageBox.critical(self, "Error", "No warehouse layout to save!!!")
+
+    @Slot(object)
+    def _save_done(self, target):
+        self._announcement.add_event(f"Warehouse saved to {target}")
+
+    @Slot(str)
+    def _save_failed(self, error):
+        QMessageBox.critical(self, "Save Warehouse Error", f"Unable to save the Warehouse!!!\n{error}")
     
     @Slot(None)
     def _toggle_hm(self):
@@ -346,6 +668,15 @@ class WarehouseMonitorWidget(QWidget):
         else:
             QMessageBox.warning(self, "Summary's unavailable", "Cannot summarize an empty warehouse!")
 
+    @Slot(None)
+    def _shift_analytics_view(self):
+        try:
+            view = diag.ShiftAnalyticsView(self._shift_analytics, self)
+        except (OSError, ValueError) as e: # unreadable shift records
+            QMessageBox.critical(self, "Shift Analytics Error", f"Unable to read the shift records!!!\n{e}")
+            return None
+        view.exec()
+
 class ManagerMode(WarehouseMonitorWidget):
     """
     Manager Mode allow full access to all the functions
@@ -363,6 +694,7 @@ class TechnicianMode(WarehouseMonitorWidget):
         self._setup_layout_btn.setDisabled(True)
         self._load_warehouse.setDisabled(False)
         self._add_storage_btn.setDisabled(True)
+        self._add_storage_array_btn.setDisabled(True)
         self._remove_storage_btn.setDisabled(True)
         self._load_storage_btn.setDisabled(False)
         self._add_vehicle_btn.setDisabled(True)
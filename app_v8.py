@@ -56,6 +56,9 @@ class MainWindow(QMainWindow):
         warehouse_info = QAction(QIcon(ICON_PATH + "information-balloon.png"),"&Warehouse Summary", self)
         warehouse_info.setShortcut("F1")
         warehouse_info.triggered.connect(self.show_summary)
+        shift_info = QAction(QIcon(ICON_PATH + "system-monitor.png"), "S&hift Analytics", self)
+        shift_info.setShortcut("F2")
+        shift_info.triggered.connect(self.show_shift_analytics)
         show_heatmap = QAction("&Toogle Heatmap", self)
         show_heatmap.setCheckable(True)
         show_heatmap.setChecked(True)
@@ -65,6 +68,7 @@ class MainWindow(QMainWindow):
         show_vehicle_path.setChecked(True)
         show_vehicle_path.toggled.connect(self.toggle_path)
         info_menu.addAction(warehouse_info)
+        info_menu.addAction(shift_info)
         info_menu.addAction(show_heatmap)
         info_menu.addAction(show_vehicle_path)
 
@@ -77,6 +81,8 @@ class MainWindow(QMainWindow):
         self._main_func.to_save.emit()
     def show_summary(self):
         self._main_func.warehouse_summary.emit()
+    def show_shift_analytics(self):
+        self._main_func.shift_analytics.emit()
     def toggle_heatmap(self):
         self._main_func.toggle_heatmap.emit()
     def toggle_path(self):
@@ -0,0 +1,160 @@
+"""
+Replay of vehicle telemetry standing in for the fleet manager (i.e., to test the live telemetry of the monitor)
+    python telemetry_replay.py --tcp 127.0.0.1:9100 Metadata\\Miscellaneous\\path1_Veh1.csv Metadata\\Miscellaneous\\path1_Veh2.csv
+    python telemetry_replay.py --file telemetry.ndjson --rate 20 --loop recorded.ndjson
+The inputs are vehicle path files (x, y per line, the vehicle id is the file name part after the last "_")
+or recorded telemetry (ndjson/csv, replayed with the original timing if the lines have a time)
+"""
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from os import path as os_path
+from app_module.warehouse_essential.telemetry import parse_update, TELEMETRY_FIELDS
+
+def path_frames(filenames : list, battery_drain : float = 0.0):
+    """
+    Frames (list of lines) of vehicles following path files, one waypoint per vehicle and frame
+    """
+    paths = {}
+    for filename in filenames:
+        name = os_path.splitext(os_path.basename(filename))[0]
+        paths[name.rsplit("_", 1)[-1]] = np.loadtxt(filename, delimiter = ",", ndmin = 2)
+    for k in range(max(len(path) for path in paths.values())):
+        frame = []
+        for id, path in paths.items():
+            point = path[min(k, len(path) - 1)]
+            delta = path[min(k + 1, len(path) - 1)] - path[max(0, min(k, len(path) - 1) - 1)]
+            record = {"id": id, "x": point[0], "y": point[1], "ort": float(np.arctan2(delta[1], delta[0]))}
+            if battery_drain > 0:
+                record["battery"] = max(0.0, 100 - battery_drain * k)
+            frame.append(record)
+        yield frame
+
+def recorded_frames(filename : str):
+    """
+    Frames of a recorded telemetry file: lines with the same time are grouped (one line per frame without time)
+    """
+    file_format = "csv" if filename.endswith(".csv") else "ndjson"
+    frame, frame_time = [], None
+    with open(filename, mode = "r") as file:
+        for line in file:
+            if line.strip() == "":
+                continue
+            id, values = parse_update(line, file_format)
+            record = {"id": id}
+            record.update({field: value for field, value in zip(TELEMETRY_FIELDS[1:], values) if not np.isnan(value)})
+            if len(frame) > 0 and (frame_time == None or not record.get("time", None) == frame_time):
+                yield frame
+                frame = []
+            frame.append(record)
+            frame_time = record.get("time", None)
+    if len(frame) > 0:
+        yield frame
+
+def is_path_file(filename : str) -> bool:
+    """
+    Path files start with a numerical x, recorded csv telemetry with the vehicle id
+    """
+    if filename.endswith(".ndjson"):
+        return False
+    with open(filename, mode = "r") as file:
+        first = file.readline().split(",")[0]
+    try:
+        float(first)
+    except ValueError:
+        return False
+    return True
+
+def format_record(record : dict, file_format : str) -> str:
+    if file_format == "ndjson":
+        return json.dumps(record)
+    values = [record.get(field, "") for field in TELEMETRY_FIELDS]
+    return ",".join(str(value) for value in values)
+
+async def replay(frames : list, emit, rate : float, speed : float, repeat : bool, file_format : str):
+    """
+    Emit the frames (emit receives the encoded lines of a frame) at rate frames per second,
+    or following their time stamps (scaled by speed) when they have one
+    """
+    while True:
+        last_time = None
+        for frame in frames:
+            frame_time = frame[0].get("time", None)
+            if not frame_time == None and not last_time == None:
+                await asyncio.sleep(max(0.0, frame_time - last_time) / speed)
+            elif frame_time == None:
+                await asyncio.sleep(1 / rate)
+            last_time = frame_time
+            now = time.time()
+            lines = []
+            for record in frame:
+                record = dict(record)
+                record["time"] = now # re-stamped (a looped replay must not go back in time)
+                lines.append(format_record(record, file_format) + "\n")
+            await emit("".join(lines).encode("utf-8"))
+        if not repeat:
+            return
+
+async def serve(frames : list, args):
+    clients = set()
+    async def on_connect(reader, writer):
+        clients.add(writer)
+        try:
+            await reader.read() # until the monitor disconnects
+        except (asyncio.CancelledError, OSError): # replay over
+            pass
+        finally:
+            clients.discard(writer)
+            writer.close()
+    async def emit(data : bytes):
+        for writer in list(clients):
+            try:
+                writer.write(data)
+                await writer.drain()
+            except OSError:
+                clients.discard(writer)
+    if args.tcp:
+        host, _, port = args.tcp.rpartition(":")
+        server = await asyncio.start_server(on_connect, host or "127.0.0.1", int(port))
+    else:
+        server = await asyncio.start_unix_server(on_connect, args.unix)
+    async with server:
+        print(f"Waiting for the monitor on {args.tcp or args.unix}...")
+        while len(clients) == 0:
+            await asyncio.sleep(0.1)
+        await replay(frames, emit, args.rate, args.speed, args.loop, args.format)
+
+async def append(frames : list, args):
+    with open(args.file, mode = "ab") as file:
+        async def emit(data : bytes):
+            file.write(data)
+            file.flush()
+        await replay(frames, emit, args.rate, args.speed, args.loop, args.format)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Replay vehicle telemetry to a socket or a file")
+    output = parser.add_mutually_exclusive_group(required = True)
+    output.add_argument("--tcp", help = "serve on host:port")
+    output.add_argument("--unix", help = "serve on a unix socket path")
+    output.add_argument("--file", help = "append to a file (tailed by the monitor)")
+    parser.add_argument("--format", choices = ("ndjson", "csv"), default = "ndjson")
+    parser.add_argument("--rate", type = float, default = 10.0, help = "frames per second (inputs without time)")
+    parser.add_argument("--speed", type = float, default = 1.0, help = "time scale of the recorded inputs")
+    parser.add_argument("--battery-drain", type = float, default = 0.0, help = "battery drop (%%) per frame of the path inputs")
+    parser.add_argument("--loop", action = "store_true", help = "replay forever")
+    parser.add_argument("inputs", nargs = "+", help = "path files (x, y) or recorded telemetry (.ndjson/.csv with id)")
+    args = parser.parse_args()
+    recorded = [filename for filename in args.inputs if not is_path_file(filename)]
+    if len(recorded) > 0:
+        frames = [frame for filename in recorded for frame in recorded_frames(filename)]
+    else:
+        frames = list(path_frames(args.inputs, args.battery_drain))
+    try:
+        asyncio.run(append(frames, args) if args.file else serve(frames, args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
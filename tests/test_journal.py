@@ -0,0 +1,19 @@
+from os import path as os_path
+from app_module.warehouse_essential.warehouse import Warehouse
+from app_module.warehouse_essential.journal import WarehouseJournal
+
+WAREHOUSE_FILE = os_path.join(os_path.dirname(__file__), "..", "Metadata", "WarehouseData", "warehouse_final_v1.json")
+
+def test_recover_after_back_to_back_attach(tmp_path):
+    large = Warehouse(2000, 2000)
+    large.add_storage_array((5, 5), 10, 100, 100, 4, 10)
+    small = Warehouse.load_info(WAREHOUSE_FILE)
+    journal = WarehouseJournal(str(tmp_path))
+    journal.attach(large)
+    journal.attach(small) # the compaction of the large warehouse may still be running
+    removed = small.storage.ids()[0]
+    small.remove_storage_unit(removed)
+    journal.close() # waits for the snapshot of the small warehouse
+    recovered = WarehouseJournal.recover(str(tmp_path))
+    assert len(recovered.storage) == len(small.storage)
+    assert not removed in recovered.storage
@@ -0,0 +1,24 @@
+import numpy as np
+from app_module.warehouse_essential.warehouse import Warehouse
+
+def _warehouse():
+    warehouse = Warehouse(100, 100)
+    warehouse.add_storage_array((10, 10), 10, 1, 2, 4, 100, id_prefix = "F")
+    warehouse.storage_load_change([("F1-1", "Load", 20)])
+    return warehouse
+
+def test_stream_rejects_missing_amount(tmp_path):
+    warehouse = _warehouse()
+    order_file = tmp_path / "orders.csv"
+    order_file.write_text("F1-2,Load,5\nF1-1,Load,\n")
+    success, error_msg, _, n_change = warehouse.storage_load_stream(str(order_file))
+    assert not success and "line 2" in error_msg
+    assert n_change == 0
+    assert warehouse.storage.get_unit("F1-1").load == 20
+    assert warehouse.storage.get_unit("F1-2").load == 0
+
+def test_change_rejects_nan_amount():
+    warehouse = _warehouse()
+    success, error_msg, _ = warehouse.storage_load_change([("F1-1", "Load", np.nan)])
+    assert not success and error_msg == "Invalid load amount!!!"
+    assert warehouse.storage.get_unit("F1-1").load == 20